@@ -1,105 +1,66 @@
 import polars as pl
-import re
-import yaml
+from pathlib import Path
+from typing import Union
 from cleanerpl import CleanerPipeline
-from operations import ValidateCommand
+from compiler import compile_script
 
 class DSLInterpreter:
-    def __init__(self, df: pl.DataFrame):
-        self.dsl_engine = CleanerPipeline(df)
-        ValidateCommand.set_schema(df.schema)
+    def __init__(self, df: Union[pl.DataFrame, pl.LazyFrame, CleanerPipeline, str, Path], **pipeline_options):
+        # a path is scanned, so filters and column selection reach the reader
+        if isinstance(df, (str, Path)):
+            df = CleanerPipeline.scan(df, **pipeline_options)
+        self.dsl_engine = df if isinstance(df, CleanerPipeline) else CleanerPipeline(df, **pipeline_options)
+        self.schema = self.dsl_engine.df.collect_schema()
 
-        self.rules = [
-            (r"DROP ALL NULL ROWS", self._handle_drop_all_na),
-            (r"DROP ANY NULL ROWS", self._handle_drop_any_na),
-            (r"DROP ROWS WHERE (.+) IS (NULL|NAN)?", self._handle_drop_na_for_cols),
-            (r"DROP NULL AND NAN ROWS", self._handle_drop_nan_na),
-            (r"DROP ANY NAN ROWS", self._handle_drop_nan),
-            (r'FILTER WHERE\s+(.+)', self._handle_filter),
-            (r"NORMALISE COLUMNS (.+) USING ([\w-]+)", self._handle_normalise),
-            (r"TRANSFORM COLUMNS (.+) USING (\w+)( INPLACE)?", self._handle_transform), 
-            (r"FILL NULL IN COLUMN (.+) USING (\w+)", self._handle_col_impute),
-            (r"FILL NULL USING (\w+)", self._handle_all_col_impute),
-            (r"RENAME (.+) TO (.+)", self._handle_rename)
-        ]
+    @classmethod
+    def from_path(cls, path, **pipeline_options):
+        return cls(CleanerPipeline.scan(path, **pipeline_options))
 
-    def _handle_drop_all_na(self, match):
-        self.dsl_engine.drop_na(strategy = "drop-null-row") 
-    
-    def _handle_drop_any_na(self, match):
-        self.dsl_engine.drop_na()
+    def compile(self, yml):
+        return compile_script(yml, self.schema)
 
-    def _handle_drop_na_for_cols(self, match):
-        cols = [c.strip() for c in match.group(1).split(",")]
-        ValidateCommand(columns = cols)
-        isNull = match.group(2)
-        if isNull not in {'NULL', 'NAN'}:
-            raise RuntimeError(f"{isNull}: This drop condition is not defined")
-        self.dsl_engine.drop_na(columns = cols, strategy = f"drop-{isNull.lower()}")
+    def load(self, yml):
+        for command in self.compile(yml):
+            command.apply(self.dsl_engine)
 
-    def _handle_drop_nan_na(self, match):
-        self.dsl_engine.drop_na(strategy = "drop-null-nan")
-
-    def _handle_drop_nan(self, match):
-        self.dsl_engine.drop_na(strategy = "drop-nan")
-
-    def _handle_filter(self, match):
-        expr = match.group(1).strip()
-        self.dsl_engine.filter(expression = expr)
+    def run(self, yml):
+        try:
+            self.load(yml)
+            return self.dsl_engine.execute()
+        except Exception as e:
+            print(f"Failed to run the cleaning script: {e}")
+            return None
 
-    def _handle_normalise(self, match):
-        std_strats = {'z-score', 'min-max', 'robust'}
-        norm_strats = {'lower', 'upper', 'strip', 'label encoding'}
-        
-        cols = [c.strip() for c in match.group(1).split(",")]
-        ValidateCommand(columns = cols)
-        strategy = match.group(2).lower()
-        if strategy in std_strats:
-            self.dsl_engine.standardize(cols, strategy)
-        elif strategy in norm_strats:
-            self.dsl_engine.string_normalize(cols, strategy)
+    async def run_async(self, yml):
+        # compiling is cached and cheap, it stays on the event loop
+        try:
+            self.load(yml)
+            return await self.dsl_engine.execute_async()
+        except Exception as e:
+            print(f"Failed to run the cleaning script: {e}")
+            return None
 
-    def _handle_transform(self, match):
-        groups = match.groups()
-        cols = [c.strip() for c in match.group(1).split(",")]
-        ValidateCommand(columns = cols)
-        strategy = match.group(2).lower()
-        inplace = groups[2] is not None
-        self.dsl_engine.transform(cols, f"{strategy}-transform", inplace)
+    async def stream_async(self, yml, rows = None):
+        self.load(yml)
+        async for batch in self.dsl_engine.stream_async(rows):
+            yield batch
 
-    def _handle_all_col_impute(self, match):
-        strats = {'forward', 'backward', 'mean', 'median', 'mode'}
-        group_2 = match.group(1)
-        strategy = group_2.lower() if group_2.lower() in strats else "default"
-        self.dsl_engine.impute_na(value = group_2, strategy = strategy) 
+    async def sink_async(self, yml, output):
+        self.load(yml)
+        return await self.dsl_engine.sink_async(output)
 
-    def _handle_col_impute(self, match):
-        cols = [c.strip() for c in match.group(1).split(",")]
-        ValidateCommand(columns = cols)
-        strats = {'forward', 'backward', 'mean', 'median', 'mode'}
-        group_2 = match.group(2)
-        strategy = group_2.lower() if group_2.lower() in strats else "default"
-        self.dsl_engine.impute_na(columns = cols, value = group_2, strategy = strategy)
+    def preview(self, yml, **options):
+        self.load(yml)
+        return self.dsl_engine.preview(**options)
 
-    def _handle_rename(self, match):
-        old_cols = [c.strip() for c in match.group(1).split(",")]
-        ValidateCommand(columns = old_cols)
-        new_cols = [c.strip() for c in match.group(2).split(",")]
-        self.dsl_engine.rename(**dict(zip(old_cols, new_cols)))
+    def explain(self, yml):
+        self.load(yml)
+        return self.dsl_engine.explain()
 
-    def run(self, yml):
-        result = pl.DataFrame() 
-        commands = yaml.safe_load(yml)
-        for cmd in commands:
-            found = False
-            for pattern, handler in self.rules:
-                match = re.match(pattern, cmd, re.IGNORECASE)
-                if match:
-                    handler(match)
-                    found = True
-                    break
-            if not found:
-                raise ValueError(f"{cmd} is invalid")
-        result = self.dsl_engine.execute()
-        return result
+    def fit(self, yml, path = None):
+        self.load(yml)
+        return self.dsl_engine.fit(path)
 
+    def sink(self, yml, output):
+        self.load(yml)
+        return self.dsl_engine.sink(output)
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import polars as pl
+from cleanerpl import CleanerPipeline
+from compiler import compile_script
+from operations import LabelDictionary
+
+def expand_inputs(inputs: Union[str, Path, Iterable[Union[str, Path]]]) -> List[Path]:
+    if isinstance(inputs, (str, Path)):
+        inputs = [inputs]
+    paths = []
+    for pattern in map(str, inputs):
+        matches = sorted(glob.glob(pattern, recursive = True)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(Path(match) for match in matches)
+    return list(dict.fromkeys(paths))
+
+def output_path(source: Path, output_dir: Optional[Union[str, Path]] = None,
+                suffix: str = "_cleaned", file_format: Optional[str] = None) -> Path:
+    extension = file_format or source.suffix.lstrip(".") or "csv"
+    return Path(output_dir or source.parent) / f"{source.stem}{suffix}.{extension}"
+
+def _pipeline(script: str, source: Path, artifact: Optional[dict] = None,
+              dictionary: Optional[LabelDictionary] = None) -> CleanerPipeline:
+    pipeline = CleanerPipeline.scan(source, dictionary = dictionary)
+    for command in compile_script(script, pipeline.df.collect_schema()):
+        command.apply(pipeline)
+    if artifact is not None:
+        pipeline.apply(artifact)
+    return pipeline
+
+def fit_global(script: str, sources: List[Path]) -> dict:
+    # the inputs are fitted as one dataset, every file is then cleaned with
+    # the same statistics instead of its own
+    union = pl.concat([CleanerPipeline.scan(source).df for source in sources], how = "vertical_relaxed")
+    pipeline = CleanerPipeline(union)
+    for command in compile_script(script, union.collect_schema()):
+        command.apply(pipeline)
+    return pipeline.fit()
+
+def fit_dictionary(script: str, sources: List[Path], dictionary: LabelDictionary) -> LabelDictionary:
+    # learns the label encoded columns over all inputs as one dataset, so the
+    # files (and the processes they run in) all encode with the same codes;
+    # values new to a saved dictionary are appended after the known ones
+    union = pl.concat([CleanerPipeline.scan(source).df for source in sources], how = "vertical_relaxed")
+    pipeline = CleanerPipeline(union, dictionary = dictionary, extend_dictionary = True)
+    for command in compile_script(script, union.collect_schema()):
+        command.apply(pipeline)
+    pipeline.plan()
+    return dictionary
+
+def _run_file(script: str, source: Path, output: Path, artifact: Optional[dict] = None,
+              file_format: Optional[str] = None, dictionary: Optional[LabelDictionary] = None) -> dict:
+    _pipeline(script, source, artifact, dictionary).sink(output, file_format)
+    return {"input": str(source), "output": str(output), "status": "ok"}
+
+def _failed(source: Path, output: Path, error: Exception) -> dict:
+    return {"input": str(source), "output": str(output), "status": "error", "error": str(error)}
+
+def _sink_file(query: pl.LazyFrame, source: Path, output: Path) -> dict:
+    try:
+        query.collect(engine = "streaming")
+        return {"input": str(source), "output": str(output), "status": "ok"}
+    except Exception as e:
+        return _failed(source, output, e)
+
+def _run_collect_all(script: str, jobs: List[tuple], concurrency: Optional[int],
+                     artifact: Optional[dict], file_format: Optional[str],
+                     dictionary: Optional[LabelDictionary]) -> List[dict]:
+    results = []
+    size = concurrency or len(jobs) or 1
+    for start in range(0, len(jobs), size):
+        pipelines, pending = [], []
+        for source, output in jobs[start:start + size]:
+            try:
+                pipelines.append(_pipeline(script, source, artifact, dictionary))
+                pending.append((source, output))
+            except Exception as e:
+                results.append(_failed(source, output, e))
+        try:
+            # the statistics passes of the group run in one pl.collect_all
+            plans = CleanerPipeline.plan_all(pipelines)
+        except Exception:
+            plans = [None] * len(pipelines)
+        queries = []
+        for pipeline, plan, (source, output) in zip(pipelines, plans, pending):
+            try:
+                queries.append((pipeline.sink(output, file_format, lazy = True, operations = plan), source, output))
+            except Exception as e:
+                results.append(_failed(source, output, e))
+        # one thread per sink, polars runs them concurrently and a failing
+        # file fails alone instead of taking the group with it
+        with ThreadPoolExecutor(max_workers = max(len(queries), 1)) as pool:
+            results.extend(pool.map(lambda query: _sink_file(*query), queries))
+    return results
+
+def _run_processes(script: str, jobs: List[tuple], concurrency: Optional[int],
+                   artifact: Optional[dict], file_format: Optional[str],
+                   dictionary: Optional[LabelDictionary]) -> List[dict]:
+    # polars' thread pool does not survive fork, always start fresh interpreters
+    with ProcessPoolExecutor(max_workers = concurrency,
+                             mp_context = multiprocessing.get_context("spawn")) as pool:
+        futures = [(source, output, pool.submit(_run_file, script, source, output, artifact, file_format, dictionary))
+                   for source, output in jobs]
+        results = []
+        for source, output, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(_failed(source, output, e))
+    return results
+
+# Applies one DSL script to every input. The script compiles once (files
+# sharing a schema hit the compiled-script cache) and the files run either
+# in groups of `concurrency` in this process, their statistics passes in one
+# pl.collect_all and their sinks as concurrent streaming queries, or in a
+# pool of `concurrency` processes.
+def run_batch(script: str, inputs, output_dir: Optional[Union[str, Path]] = None,
+              suffix: str = "_cleaned", concurrency: Optional[int] = None,
+              mode: str = "collect_all", global_stats: bool = False,
+              file_format: Optional[str] = None,
+              dictionary: Optional[Union[str, Path]] = None) -> dict:
+    started = time.perf_counter()
+    sources = [source for source in expand_inputs(inputs)
+               if output_dir is not None or not source.stem.endswith(suffix)]
+    if output_dir is not None:
+        Path(output_dir).mkdir(parents = True, exist_ok = True)
+    jobs = [(source, output_path(source, output_dir, suffix, file_format)) for source in sources]
+
+    artifact = fit_global(script, sources) if global_stats and sources else None
+    labels = None
+    if dictionary is not None and sources:
+        labels = LabelDictionary.load(dictionary) if Path(dictionary).exists() else LabelDictionary()
+        fit_dictionary(script, sources, labels).save(dictionary)
+    match mode:
+        case "collect_all":
+            results = _run_collect_all(script, jobs, concurrency, artifact, file_format, labels)
+        case "processes":
+            results = _run_processes(script, jobs, concurrency, artifact, file_format, labels)
+        case _:
+            raise ValueError(f"Unknown batch mode: {mode}")
+
+    order = {str(source): idx for idx, source in enumerate(sources)}
+    results.sort(key = lambda result: order[result["input"]])
+    return {
+        "files": results,
+        "failed": sum(result["status"] != "ok" for result in results),
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Apply one cleaning script to many files")
+    parser.add_argument("script", help = "YAML script to apply")
+    parser.add_argument("inputs", nargs = "+", help = "input files or glob patterns")
+    parser.add_argument("--output-dir", default = None, help = "defaults to next to each input")
+    parser.add_argument("--suffix", default = "_cleaned")
+    parser.add_argument("--concurrency", type = int, default = None)
+    parser.add_argument("--mode", choices = ["collect_all", "processes"], default = "collect_all")
+    parser.add_argument("--global-stats", action = "store_true",
+                        help = "compute statistics over all inputs as one dataset")
+    parser.add_argument("--format", choices = ["csv", "parquet"], default = None)
+    parser.add_argument("--dictionary", default = None,
+                        help = "label dictionary JSON, created or extended with the columns of this batch")
+    args = parser.parse_args(argv)
+
+    report = run_batch(Path(args.script).read_text(), args.inputs, args.output_dir, args.suffix,
+                       args.concurrency, args.mode, args.global_stats, args.format, args.dictionary)
+    print(json.dumps(report, indent = 2))
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# kind is "command" (one DSL command), "script" (several DSL commands run
+# end to end) or "pipeline" (a CleanerPipeline builder called directly).
+@dataclass(frozen = True)
+class Case:
+    name: str
+    kind: str
+    commands: Tuple[str, ...] = ()
+    method: str = ""
+    kwargs: dict = field(default_factory = dict, hash = False)
+
+COMMANDS = [
+    "drop all null rows",
+    "drop any null rows",
+    "drop rows where num_0, str_0 is null",
+    "drop null and nan rows",
+    "drop any nan rows",
+    "filter where num_1 gt 50 and str_0 contains 1",
+    "normalise columns num_0, num_1 using z-score",
+    "normalise columns num_1 using robust",
+    "normalise columns str_0 using lower",
+    "normalise columns str_1 using label encoding",
+    "transform columns num_0 using log",
+    "transform columns num_0 using yeojohnson inplace",
+    "fill null in column num_0 using mean",
+    "fill null using forward",
+    "rename num_0, str_0 to amount, label",
+    "cast columns num_1 to float32",
+    "optimise dtypes",
+    "keep referenced columns",
+    "approximate statistics",
+    "handle outliers in columns num_0, num_1 using cap",
+    "handle outliers in column num_1 using null replace by z-score",
+    "optimize dtypes",
+    "explain",
+    "profile",
+]
+
+PIPELINE = [
+    ("drop_na", {"strategy": "drop-null-nan"}),
+    ("impute_na", {"columns": ["num_0", "num_1"], "strategy": "median"}),
+    ("handle_outlier", {"columns": ["num_1"], "strategy": "cap"}),
+    ("handle_outlier", {"columns": ["num_0", "num_1"], "strategy": "remove", "method": "mad"}),
+    ("rename", {"num_0": "amount"}),
+    ("transform", {"columns": ["num_0"], "strategy": "sqrt-transform"}),
+    ("transform", {"columns": ["num_0"], "strategy": "boxcox-transform", "sample_size": 100_000}),
+    ("filter", {"expression": "num_1 between 20 and 80"}),
+    ("standardize", {"columns": ["num_0", "num_1"], "strategy": "min-max"}),
+    ("string_normalize", {"columns": ["str_0", "str_1"], "strategy": "strip"}),
+]
+
+SCRIPTS = {
+    "typical": (
+        "drop rows where num_0 is null",
+        "fill null in column num_1 using median",
+        "normalise columns str_0 using strip",
+        "normalise columns str_0 using lower",
+        "filter where num_1 gt 20",
+        "normalise columns num_1 using z-score",
+    ),
+    "heavy": (
+        "fill null using forward",
+        "transform columns num_0 using yeojohnson inplace",
+        "normalise columns num_0, num_1 using robust",
+        "normalise columns str_1 using label encoding",
+        "filter where str_0 in ('item 1', 'ITEM 2', 'Item 3') or num_1 between 40 and 60",
+        "rename num_0 to amount",
+    ),
+}
+
+def all_cases() -> List[Case]:
+    cases = [Case(f"command:{cmd}", "command", (cmd,)) for cmd in COMMANDS]
+    cases += [
+        Case(f"pipeline:{method}:{','.join(f'{k}={v}' for k, v in kwargs.items())}", "pipeline",
+             method = method, kwargs = kwargs)
+        for method, kwargs in PIPELINE
+    ]
+    cases += [Case(f"script:{name}", "script", commands) for name, commands in SCRIPTS.items()]
+    return cases
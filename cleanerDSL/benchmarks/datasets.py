@@ -0,0 +1,92 @@
+import numpy as np
+import polars as pl
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+from polars.io.plugins import register_io_source
+
+# rows generated and written at a time, so a dataset of any size is built
+# in the memory of one batch
+BATCH_ROWS = 1_000_000
+DATASET_VERSION = 2
+
+# Every shape has at least num_0, num_1, str_0 and str_1 so the benchmark
+# commands can be written once and run against all of them.
+@dataclass(frozen = True)
+class Shape:
+    numeric: int
+    strings: int
+    null_rate: float = 0.0
+    nan_rate: float = 0.0
+    vocabulary: int = 1000
+
+SHAPES: Dict[str, Shape] = {
+    "long": Shape(numeric = 4, strings = 2, null_rate = 0.01),
+    "wide": Shape(numeric = 100, strings = 10, null_rate = 0.01),
+    "strings": Shape(numeric = 2, strings = 12, null_rate = 0.01, vocabulary = 50_000),
+    "nulls": Shape(numeric = 6, strings = 4, null_rate = 0.4, nan_rate = 0.05),
+}
+
+def _vocabulary(size: int, rng: np.random.Generator) -> pl.Series:
+    # mixed case and stray whitespace so the string normalisers have work to do
+    words = [f"item {idx}" for idx in range(size)]
+    styles = rng.integers(0, 4, size)
+    return pl.Series([
+        word.upper() if style == 0 else word.title() if style == 1 else f"  {word} " if style == 2 else word
+        for word, style in zip(words, styles)
+    ])
+
+def _with_nulls(series: pl.Series, rate: float, rng: np.random.Generator) -> pl.Series:
+    if not rate:
+        return series
+    return series.set(pl.Series(rng.random(len(series)) < rate), None)
+
+def _schema(spec: Shape) -> Dict[str, pl.DataType]:
+    return {**{f"num_{idx}": pl.Float64 for idx in range(spec.numeric)},
+            **{f"str_{idx}": pl.String for idx in range(spec.strings)}}
+
+def generate_batches(shape: Union[str, Shape], rows: int, seed: int = 0,
+                     batch_rows: int = BATCH_ROWS) -> Iterator[pl.DataFrame]:
+    # each batch has its own stream seeded by (seed, batch), the vocabulary is shared
+    spec = SHAPES[shape] if isinstance(shape, str) else shape
+    vocabulary = _vocabulary(spec.vocabulary, np.random.default_rng(seed))
+    for batch, start in enumerate(range(0, rows, batch_rows)):
+        rng = np.random.default_rng([seed, batch])
+        count = min(batch_rows, rows - start)
+        columns = {}
+        for idx in range(spec.numeric):
+            # alternate a skewed and a symmetric distribution, shifted positive for log / boxcox
+            values = rng.lognormal(3, 1, count) if idx % 2 == 0 else rng.normal(50, 15, count)
+            if spec.nan_rate:
+                values[rng.random(count) < spec.nan_rate] = np.nan
+            columns[f"num_{idx}"] = _with_nulls(pl.Series(values), spec.null_rate, rng)
+        for idx in range(spec.strings):
+            picks = pl.Series(rng.integers(0, spec.vocabulary, count), dtype = pl.UInt32)
+            columns[f"str_{idx}"] = _with_nulls(vocabulary.gather(picks), spec.null_rate, rng)
+        yield pl.DataFrame(columns)
+
+def generate(shape: Union[str, Shape], rows: int, seed: int = 0) -> pl.DataFrame:
+    spec = SHAPES[shape] if isinstance(shape, str) else shape
+    batches = list(generate_batches(spec, rows, seed))
+    return pl.concat(batches) if batches else pl.DataFrame(schema = _schema(spec))
+
+def scan_generated(shape: Union[str, Shape], rows: int, seed: int = 0) -> pl.LazyFrame:
+    # the generator as a lazy source, sinks pull one batch at a time
+    spec = SHAPES[shape] if isinstance(shape, str) else shape
+    def source(with_columns, predicate, n_rows, batch_size):
+        for batch in generate_batches(spec, rows if n_rows is None else min(rows, n_rows), seed):
+            batch = batch.select(with_columns) if with_columns is not None else batch
+            yield batch.filter(predicate) if predicate is not None else batch
+    return register_io_source(io_source = source, schema = _schema(spec))
+
+def dataset_path(shape: str, rows: int, seed: int = 0,
+                 cache_dir: Optional[Union[str, Path]] = None) -> Path:
+    # generated once per (shape, rows, seed) and reused by every case
+    cache_dir = Path(cache_dir or Path.home() / ".cache" / "dolphy-benchmarks")
+    cache_dir.mkdir(parents = True, exist_ok = True)
+    path = cache_dir / f"{shape}-{rows}-{seed}-v{DATASET_VERSION}.parquet"
+    if not path.exists():
+        partial = path.with_suffix(".tmp")
+        scan_generated(shape, rows, seed).sink_parquet(partial, row_group_size = BATCH_ROWS)
+        partial.rename(path)
+    return path
@@ -0,0 +1,179 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import polars as pl
+import yaml
+
+from benchmarks.cases import Case, all_cases
+from benchmarks.datasets import SHAPES, dataset_path
+from governor import RssMonitor, current_rss
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def _prepare(case: Case, source: pl.LazyFrame):
+    # returns the pipeline ready to run and the DSL compile time
+    from cleanerpl import CleanerPipeline
+    if case.kind == "pipeline":
+        return getattr(CleanerPipeline(source), case.method)(**case.kwargs), None
+
+    import compiler
+    from DSLInterpreter import DSLInterpreter
+    from operations.filterparser import FilterParser
+    compiler.clear_cache()
+    FilterParser.clear_cache()
+    interpreter = DSLInterpreter(source)
+    start = time.perf_counter()
+    program = interpreter.compile(yaml.dump(list(case.commands)))
+    compile_ms = (time.perf_counter() - start) * 1000
+    for command in program:
+        command.apply(interpreter.dsl_engine)
+    return interpreter.dsl_engine, compile_ms
+
+def measure(case: Case, path: Path, repeat: int = 3) -> dict:
+    # the dataset is scanned and the result sunk next to it, as a job does,
+    # so neither has to fit in memory; peak RSS is sampled during each run
+    source = pl.scan_parquet(path)
+    rows = source.select(pl.len()).collect().item()
+    baseline = current_rss()
+    result = {"case": case.name, "kind": case.kind, "rows": rows,
+              "baseline_rss_mb": round(baseline / 1024 ** 2, 1) if baseline is not None else None}
+    peaks = []
+    try:
+        timings, compiles = [], []
+        with tempfile.TemporaryDirectory(dir = path.parent) as scratch:
+            out = Path(scratch) / "out.parquet"
+            for _ in range(repeat):
+                pipeline, compile_ms = _prepare(case, source)
+                with RssMonitor() as monitor:
+                    start = time.perf_counter()
+                    pipeline.sink(out)
+                    timings.append(time.perf_counter() - start)
+                peaks.append(monitor.peak_mb)
+                if compile_ms is not None:
+                    compiles.append(compile_ms)
+            rows_out = pl.scan_parquet(out).select(pl.len()).collect().item()
+        execute_s = statistics.median(timings)
+        result.update(
+            compile_ms = round(statistics.median(compiles), 3) if compiles else None,
+            execute_ms = round(execute_s * 1000, 3),
+            execute_min_ms = round(min(timings) * 1000, 3),
+            rows_per_s = round(rows / execute_s) if execute_s else None,
+            rows_out = rows_out,
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_mb"] = round(max(peaks), 1) if peaks else None
+    return result
+
+def _measure_isolated(index: int, path: Path, repeat: int) -> dict:
+    # a fresh interpreter per case keeps one case's allocations out of the next
+    probe = subprocess.run([sys.executable, "-m", "benchmarks.run", "--case-index", str(index),
+                            "--dataset", str(path), "--repeat", str(repeat)],
+                           cwd = ROOT, capture_output = True, text = True)
+    if probe.returncode != 0:
+        return {"case": all_cases()[index].name, "error": probe.stderr.strip().splitlines()[-1:]}
+    return json.loads(probe.stdout.strip().splitlines()[-1])
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd = ROOT, capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except Exception:
+        return None
+
+def run(rows: List[int], shapes: List[str], selected: Optional[List[str]] = None,
+        repeat: int = 3, seed: int = 0, isolated: bool = True, cache_dir = None) -> dict:
+    cases = [(idx, case) for idx, case in enumerate(all_cases())
+             if not selected or any(name in case.name for name in selected)]
+    results = []
+    for shape in shapes:
+        for count in rows:
+            path = dataset_path(shape, count, seed, cache_dir)
+            for idx, case in cases:
+                result = _measure_isolated(idx, path, repeat) if isolated else measure(case, path, repeat)
+                result["shape"] = shape
+                results.append(result)
+                print(f"{shape:8} {count:>12,} {case.name:70} "
+                      f"{result.get('rows_per_s') or 0:>14,} rows/s", file = sys.stderr)
+    return {
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "polars": pl.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "isolated": isolated,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> List[str]:
+    # throughput drops and memory growth beyond the threshold, per (shape, rows, case)
+    key = lambda r: (r.get("shape"), r.get("rows"), r.get("case"))
+    before = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        if "error" in result and "error" not in old:
+            regressions.append(f"{key(result)}: now fails with {result['error']}")
+            continue
+        if old.get("rows_per_s") and result.get("rows_per_s"):
+            change = result["rows_per_s"] / old["rows_per_s"] - 1
+            if change < -threshold:
+                regressions.append(f"{key(result)}: throughput {change:+.1%}")
+        if old.get("peak_rss_mb") and result.get("peak_rss_mb"):
+            change = result["peak_rss_mb"] / old["peak_rss_mb"] - 1
+            if change > threshold:
+                regressions.append(f"{key(result)}: peak RSS {change:+.1%}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Throughput benchmarks for the cleaner DSL")
+    parser.add_argument("--rows", nargs = "+", type = lambda v: int(float(v)), default = [1_000_000],
+                        help = "dataset sizes, e.g. 1e6 1e7 1e8")
+    parser.add_argument("--shapes", nargs = "+", choices = sorted(SHAPES), default = sorted(SHAPES))
+    parser.add_argument("--cases", nargs = "*", help = "only run cases whose name contains one of these")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--in-process", action = "store_true", help = "skip the per-case subprocess")
+    parser.add_argument("--cache-dir", default = None, help = "where generated datasets are kept")
+    parser.add_argument("--out", default = None, help = "write the JSON report here")
+    parser.add_argument("--compare", default = None, help = "baseline report to check for regressions")
+    parser.add_argument("--threshold", type = float, default = 0.1)
+    parser.add_argument("--case-index", type = int, help = argparse.SUPPRESS)
+    parser.add_argument("--dataset", help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case_index is not None:
+        print(json.dumps(measure(all_cases()[args.case_index], Path(args.dataset), args.repeat)))
+        return 0
+
+    report = run(args.rows, args.shapes, args.cases, args.repeat, args.seed,
+                 not args.in_process, args.cache_dir)
+    output = json.dumps(report, indent = 2)
+    if args.out:
+        Path(args.out).write_text(output)
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file = sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGET_MS = float(os.environ.get("DOLPHY_STARTUP_BUDGET_MS", 600))
+ENTRY_POINT = "DSLInterpreter"
+# none of these are needed before a command asks for them
+DEFERRED = ["pydantic", "scipy", "numpy"]
+
+def import_times(module: str = ENTRY_POINT) -> Dict[str, int]:
+    # cumulative microseconds per module as reported by -X importtime
+    probe = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                           cwd = ROOT, capture_output = True, text = True, check = True)
+    times = {}
+    for line in probe.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def loaded_modules(module: str = ENTRY_POINT) -> List[str]:
+    probe = subprocess.run([sys.executable, "-c", f"import sys, {module}; print('\\n'.join(sys.modules))"],
+                           cwd = ROOT, capture_output = True, text = True, check = True)
+    return probe.stdout.split()
+
+def measure(module: str = ENTRY_POINT, repeat: int = 5) -> dict:
+    runs = [import_times(module) for _ in range(repeat)]
+    modules = loaded_modules(module)
+    return {
+        "module": module,
+        "median_ms": statistics.median(run[module] for run in runs) / 1000,
+        "heaviest": sorted(runs[-1].items(), key = lambda item: -item[1])[:10],
+        "deferred_loaded": [name for name in DEFERRED if name in modules],
+    }
+
+def check(report: dict, budget_ms: float = DEFAULT_BUDGET_MS) -> List[str]:
+    failures = []
+    if report["median_ms"] > budget_ms:
+        failures.append(f"import {report['module']} took {report['median_ms']:.1f}ms, budget is {budget_ms:.1f}ms")
+    failures.extend(f"import {report['module']} loaded {name} eagerly" for name in report["deferred_loaded"])
+    return failures
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Interpreter cold-start budget")
+    parser.add_argument("--budget-ms", type = float, default = DEFAULT_BUDGET_MS)
+    parser.add_argument("--module", default = ENTRY_POINT)
+    parser.add_argument("--repeat", type = int, default = 5)
+    args = parser.parse_args(argv)
+
+    report = measure(args.module, args.repeat)
+    print(f"import {report['module']}: {report['median_ms']:.1f}ms (median of {args.repeat}, budget {args.budget_ms:.1f}ms)")
+    for name, micros in report["heaviest"]:
+        print(f"  {micros / 1000:8.1f}ms  {name}")
+
+    failures = check(report, args.budget_ms)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Union
+
+import polars as pl
+
+CHECKPOINT_VERSION = 1
+
+def input_identity(df: Union[pl.DataFrame, pl.LazyFrame], source: Optional[Union[str, Path]] = None,
+                   scan_options: Optional[dict] = None) -> Optional[str]:
+    # files are identified by path, size, modification time and scan options,
+    # frames by their content; a lazy frame of unknown origin may be a scan of
+    # a file that changes underneath it, so it gets no identity
+    if source is not None:
+        stat = Path(source).stat()
+        return f"file:{Path(source).resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{sorted((scan_options or {}).items())}"
+    if isinstance(df, pl.DataFrame):
+        return f"frame:{df.shape}:{df.schema}:{df.hash_rows(seed = 0).sum()}"
+    return None
+
+def prefix_keys(identity: str, operations: List) -> List[str]:
+    # keys[k] fingerprints the input after the first k operations, each key
+    # chains the previous one so editing operation k changes keys k and later
+    digest = hashlib.sha256(f"v{CHECKPOINT_VERSION}:{pl.__version__}:{identity}".encode())
+    keys = [digest.hexdigest()]
+    for op in operations:
+        digest.update(b"\x00" + repr(op).encode())
+        if op.stats is not None:
+            digest.update(repr(op.stats.to_list()).encode())
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+class MemoryCheckpoints:
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str) -> Optional[pl.DataFrame]:
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key: str, df: pl.DataFrame):
+        size = df.estimated_size()
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key).estimated_size()
+            self.entries[key] = df
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last = False)
+                self.size -= evicted.estimated_size()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+_clock = 0
+_clock_lock = threading.Lock()
+
+def touch(path: Path):
+    # stamps path as the most recently used file. The stamps strictly
+    # increase within the process, so files used one after the other never
+    # tie on a filesystem with coarse timestamps
+    global _clock
+    with _clock_lock:
+        _clock = max(time.time_ns(), _clock + 1)
+        stamp = _clock
+    try:
+        os.utime(path, ns = (stamp, stamp))
+    except FileNotFoundError:
+        pass
+
+def evict_lru(directory: Path, pattern: str, max_bytes: int, keep: Optional[Path] = None):
+    # removes the least recently used files (oldest modification time) until
+    # the ones matching pattern fit in max_bytes, never the one in use (keep)
+    files = []
+    for path in directory.glob(pattern):
+        try:
+            stat = path.stat()
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        except FileNotFoundError:
+            continue
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok = True)
+        total -= size
+
+# Arrow IPC files named by prefix key. Reads memory-map the file, writes and
+# reads touch it, so the modification time orders the files for LRU eviction.
+class DiskCheckpoints:
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 4 * 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents = True, exist_ok = True)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.arrow"
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key: str) -> Optional[pl.DataFrame]:
+        path = self._path(key)
+        try:
+            touch(path)
+            return pl.read_ipc(path, memory_map = True)
+        except (FileNotFoundError, OSError):
+            return None
+
+    def put(self, key: str, df: pl.DataFrame):
+        if df.estimated_size() > self.max_bytes:
+            return
+        path = self._path(key)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        df.write_ipc(partial)
+        os.replace(partial, path)
+        touch(path)
+        evict_lru(self.directory, "*.arrow", self.max_bytes, keep = path)
+
+    def clear(self):
+        for path in self.directory.glob("*.arrow"):
+            path.unlink(missing_ok = True)
@@ -0,0 +1,46 @@
+import json
+import os
+import socket
+import sys
+import uuid
+
+# Drop-in replacement for `python3 cleanerscript.py <csv> <instructions> <output>`:
+# hands the job to a running worker.py over its unix socket and only falls
+# back to cleaning in this process when no worker is listening.
+
+SOCKET_PATH = os.environ.get("DOLPHY_CLEANER_SOCKET", "/tmp/dolphy-cleaner.sock")
+
+def submit(csv_path, instruction_path, output_path, socket_path = SOCKET_PATH):
+    request = {
+        "id": str(uuid.uuid4()),
+        "csv": os.path.abspath(csv_path),
+        "instructions": os.path.abspath(instruction_path),
+        "output": os.path.abspath(output_path),
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + "\n").encode())
+        with client.makefile("r") as reader:
+            return json.loads(reader.readline())
+
+def main(argv):
+    if len(argv) != 3:
+        print("usage: cleanerclient.py <csv> <instructions> <output>", file = sys.stderr)
+        return 2
+    try:
+        response = submit(*argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        from jobs import run_job
+        try:
+            response = {"status": "ok", **run_job(*argv)}
+        except Exception as e:
+            response = {"status": "error", "error": str(e)}
+
+    print(json.dumps(response))
+    if response.get("status") != "ok":
+        print(response.get("error", "cleaning failed"), file = sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,5 +1,9 @@
+import asyncio
+import tempfile
+import time
 import polars as pl
-from typing import Optional, List, Any
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional, List, Any, Tuple, Union
 from operations import (
     Drop, 
     ImputeNa,
@@ -8,13 +12,103 @@ from operations import (
     Transformation, 
     Filter,
     Standardize,
-    StringNormalize
+    StringNormalize,
+    bind_statistics,
+    bind_statistics_async,
+    bind_statistics_all,
+    collect_async,
+    collect_batches,
+    fit_artifact,
+    apply_artifact,
+    save_artifact,
+    load_artifact,
+    LabelDictionary,
+    bind_dictionary,
+    learn_dictionary,
+    Cast,
+    cast_expr,
+    infer_dtypes
 ) 
+from optimizer import PlanOptimizer, referenced_columns
+from checkpoints import input_identity, prefix_keys
+from profiling import plan_report, profile_plan
+from validation import validate_plan
+from governor import RssMonitor, carries_forward, choose_mode, chunk_rows, estimate_input_bytes, parse_bytes
+from preview import PREVIEW_BUDGET_MS, PREVIEW_ROWS, SAMPLING_SHARE, estimated_operations, sample_frame
+
+if TYPE_CHECKING:
+    # the sketches load numpy, so they are only imported once asked for
+    from operations import SketchOptions
 
 class CleanerPipeline:
-    def __init__(self, df:pl.DataFrame):
+    def __init__(self, df: Union[pl.DataFrame, pl.LazyFrame], 
+                 optimize: bool = True, 
+                 shared_stats: bool = True,
+                 artifact: Optional[Union[dict, str, Path]] = None,
+                 debug: bool = False,
+                 profile: bool = False,
+                 checkpoints = None,
+                 checkpoint_every: bool = False,
+                 dictionary: Optional[Union[LabelDictionary, dict, str, Path]] = None,
+                 extend_dictionary: bool = False,
+                 optimize_dtypes: bool = False,
+                 keep: str = 'all',
+                 columnar_cache = None,
+                 approximate: Union[bool, "SketchOptions"] = False,
+                 memory_budget: Optional[Union[int, str]] = None):
         self.df = df
         self.operations = []
+        self.optimize = optimize
+        self.shared_stats = shared_stats
+        self.artifact = load_artifact(artifact) if artifact is not None else None
+        self.debug = debug
+        # label encodings read their codes from the dictionary and add the
+        # columns it does not know yet, with extend_dictionary also new values
+        self.dictionary = LabelDictionary.load(dictionary) if dictionary is not None else None
+        self.extend_dictionary = extend_dictionary
+        # load stage narrowing dtypes, inferred once on first use; columns
+        # named in a cast command keep the dtype the script gives them
+        self.optimizing_dtypes = optimize_dtypes
+        self.dtypes = None
+        # 'all' passes every input column through, 'referenced' only reads
+        # the columns the script uses so the scan skips the others
+        if keep not in {'all', 'referenced'}:
+            raise ValueError(f"Unknown column selection: {keep}")
+        self.keep = keep
+        # ColumnarCache, scan reads csv inputs from their columnar copy
+        self.columnar_cache = columnar_cache
+        # quantiles and modes from streaming sketches instead of exact sorts
+        self.sketch = None
+        # bytes (or "4GB") a run may use, execute and sink pick eager,
+        # streaming or chunked execution to stay within it
+        self.memory_budget = parse_bytes(memory_budget) if memory_budget is not None else None
+        self.profiling = profile
+        self.explaining = False
+        # MemoryCheckpoints / DiskCheckpoints, by default only the full
+        # script is materialized, checkpoint_every stores every prefix
+        self.checkpoints = checkpoints
+        self.checkpoint_every = checkpoint_every
+        self.source = None
+        self.scan_options = {}
+        # filled in by execute / sink / preview: "explain", "profile",
+        # "checkpoint", "preview" and "dtypes" when used
+        self.report = {}
+        if approximate:
+            self.with_approximate_statistics(None if approximate is True else approximate)
+
+    @classmethod
+    def scan(cls, path: Union[str, Path], **options):
+        scan_options = options.pop('scan_options', {})
+        cache = options.get('columnar_cache')
+        if Path(path).suffix.lower() == '.parquet':
+            pipeline = cls(pl.scan_parquet(path, **scan_options), **options)
+        elif cache is not None:
+            pipeline = cls(cache.scan(path, scan_options), **options)
+        else:
+            pipeline = cls(pl.scan_csv(path, **scan_options), **options)
+        pipeline.source = path
+        pipeline.scan_options = scan_options
+        return pipeline
 
     def drop_na(self, columns: Optional[List[str]] = None, 
                 strategy: str = 'drop-null'):
@@ -28,10 +122,14 @@ class CleanerPipeline:
         self.operations.append(ImputeNa(columns, value, strategy))
         return self
 
-    def handle_outlier(self, column: str, strategy: str = 'remove'):
-
-        self.operations.append(OutlierHandling(column = column, 
-                                               strategy = strategy))
+    def handle_outlier(self, columns: Union[str, List[str]], strategy: str = 'remove',
+                       method: str = 'iqr'):
+        # every column of one call shares an aggregate pass and a with_columns
+        if isinstance(columns, str):
+            columns = [columns]
+        self.operations.append(OutlierHandling(columns = list(columns), 
+                                               strategy = strategy,
+                                               method = method))
         return self
     
     def rename(self, **mapping):
@@ -40,8 +138,12 @@ class CleanerPipeline:
 
     def transform(self, columns: List[str], 
                   strategy: str = 'log-transform', 
-                  inplace: bool = False):
-        self.operations.append(Transformation(columns, strategy, inplace))
+                  inplace: bool = False,
+                  sample_size: Optional[int] = None):
+        # the DSL accepts both "log" and "log-transform"
+        if not strategy.endswith("-transform"):
+            strategy = f"{strategy}-transform"
+        self.operations.append(Transformation(columns, strategy, inplace, sample_size))
         return self
 
     def filter(self, expression: str):
@@ -56,9 +158,455 @@ class CleanerPipeline:
         self.operations.append(StringNormalize(columns, strategy))
         return self
     
-    def execute(self) -> pl.DataFrame:
-        result = self.df.lazy()
-        for op in self.operations:
+    def cast(self, **mapping):
+        self.operations.append(Cast(mapping))
+        return self
+
+    def keep_columns(self, keep: str = 'referenced'):
+        if keep not in {'all', 'referenced'}:
+            raise ValueError(f"Unknown column selection: {keep}")
+        self.keep = keep
+        return self
+
+    def validate(self) -> pl.Schema:
+        # raises PlanValidationError before any data is read, returns the
+        # schema of the result
+        return validate_plan(self.operations, self.df.collect_schema())
+
+    def referenced(self) -> dict:
+        return referenced_columns(self.operations, self.df.lazy().collect_schema())
+
+    def with_approximate_statistics(self, options: Optional["SketchOptions"] = None):
+        from operations import SketchOptions
+        self.sketch = options or SketchOptions()
+        self.report["approximate"] = {
+            "relative_error": self.sketch.relative_error,
+            "heavy_hitters": self.sketch.heavy_hitters,
+        }
+        return self
+
+    def with_memory_budget(self, budget: Union[int, str]):
+        self.memory_budget = parse_bytes(budget)
+        return self
+
+    def with_dtype_optimizer(self):
+        self.optimizing_dtypes = True
+        return self
+
+    def with_profile(self):
+        self.profiling = True
+        return self
+
+    def with_explain(self):
+        self.explaining = True
+        return self
+
+    def streaming_report(self, operations: Optional[List] = None) -> List[dict]:
+        if operations is None:
+            operations = self.operations
+            if self.artifact is not None:
+                operations = apply_artifact(operations, self.artifact)
+        report = []
+        for idx, op in enumerate(operations):
+            for reason in op.streaming_blockers():
+                report.append({
+                    "index": idx,
+                    "operation": repr(op),
+                    "reason": reason,
+                    "fallback": "in-memory",
+                })
+        return report
+
+    def fit(self, path: Optional[Union[str, Path]] = None) -> dict:
+        operations = self.operations
+        if self.dictionary is not None:
+            operations = bind_dictionary(operations, self._input().collect_schema(),
+                                         self.dictionary, self.extend_dictionary)
+        artifact = fit_artifact(operations, self._input(), self.sketch)
+        if path is not None:
+            save_artifact(artifact, path)
+        return artifact
+
+    def apply(self, artifact: Union[dict, str, Path]):
+        self.artifact = load_artifact(artifact)
+        return self
+
+    def _input(self) -> pl.LazyFrame:
+        source = self.df.lazy()
+        if self.keep == 'referenced':
+            columns = self.referenced()
+            self.report["columns"] = columns
+            source = source.select(columns["inputs"])
+        if not self.optimizing_dtypes:
+            return source
+        if self.dtypes is None:
+            pinned = [column for op in self.operations if isinstance(op, Cast) for column in op.mapping]
+            self.dtypes, self.report["dtypes"] = infer_dtypes(source, pinned)
+        schema = source.collect_schema()
+        return source.with_columns([cast_expr(column, schema[column], target, fmt).alias(column)
+                                    for column, (target, fmt) in self.dtypes.items()])
+
+    def _prepare(self, start: int, stop: Optional[int], source: pl.LazyFrame) -> Tuple[List, bool]:
+        # the operations to plan and whether their statistics get bound
+        operations = list(self.operations)
+        if self.artifact is not None:
+            return apply_artifact(operations, self.artifact)[start:stop], False
+        operations = operations[start:stop]
+        if self.dictionary is not None:
+            operations = bind_dictionary(operations, source.collect_schema(),
+                                         self.dictionary, self.extend_dictionary)
+        # learning the dictionary, sketching and running within a memory
+        # budget need the statistics bound, so they override shared_stats
+        return operations, (self.shared_stats or self.dictionary is not None or self.sketch is not None
+                            or self.memory_budget is not None)
+
+    def plan(self, start: int = 0, stop: Optional[int] = None,
+             source: Optional[pl.LazyFrame] = None, optimize: bool = True) -> List:
+        # plans operations[start:stop] on top of source, the input by default
+        source = self._input() if source is None else source
+        operations, binding = self._prepare(start, stop, source)
+        passes = None
+        if binding:
+            operations, passes = bind_statistics(operations, source, self.sketch)
+        return self._finish(operations, source, passes, optimize)
+
+    @staticmethod
+    def plan_all(pipelines: List["CleanerPipeline"]) -> List[List]:
+        # plan() for several pipelines, their statistics passes run together
+        # in one pl.collect_all per round instead of one collect each
+        sources = [pipeline._input() for pipeline in pipelines]
+        prepared = [pipeline._prepare(0, None, source) for pipeline, source in zip(pipelines, sources)]
+        binding = [idx for idx, (_, bind) in enumerate(prepared) if bind]
+        bound = dict(zip(binding, bind_statistics_all([(prepared[idx][0], sources[idx], pipelines[idx].sketch)
+                                                       for idx in binding])))
+        plans = []
+        for idx, (pipeline, source) in enumerate(zip(pipelines, sources)):
+            operations, passes = bound.get(idx, (prepared[idx][0], None))
+            plans.append(pipeline._finish(operations, source, passes))
+        return plans
+
+    async def plan_async(self, start: int = 0, stop: Optional[int] = None,
+                         source: Optional[pl.LazyFrame] = None) -> List:
+        # plan() with the statistics passes awaited instead of blocking the loop
+        if source is None:
+            if self.optimizing_dtypes and self.dtypes is None:
+                # dtype inference reads the input once, off the event loop
+                await asyncio.to_thread(self._input)
+            source = self._input()
+        operations, binding = self._prepare(start, stop, source)
+        passes = None
+        if binding:
+            operations, passes = await bind_statistics_async(operations, source, self.sketch)
+        return self._finish(operations, source, passes)
+
+    def _finish(self, operations: List, source: pl.LazyFrame, passes: Optional[int],
+                optimize: bool = True) -> List:
+        if passes is not None and self.debug:
+            print(f"Statistics computed in {passes} aggregate pass(es)")
+        if self.artifact is None and self.dictionary is not None:
+            operations = learn_dictionary(operations, self.dictionary)
+        if not (self.optimize and optimize):
+            return operations
+        return self._optimized(operations, source)
+
+    def _optimized(self, operations: List, source: pl.LazyFrame) -> List:
+        optimized = PlanOptimizer().optimize(operations, source.collect_schema())
+        if self.debug:
+            print("Plan before optimization:")
+            for idx, op in enumerate(self.operations):
+                print(f"  {idx}: {op}")
+            print("Plan after optimization:")
+            for idx, op in enumerate(optimized):
+                print(f"  {idx}: {op}")
+        return optimized
+
+    def _build(self, operations: Optional[List] = None, source: Optional[pl.LazyFrame] = None) -> pl.LazyFrame:
+        result = self._input() if source is None else source
+        for op in (self.plan() if operations is None else operations):
+            result = op.clean(result)
+        return result
+
+    def explain(self) -> dict:
+        operations = self.plan()
+        return plan_report(operations, self._build(operations))
+
+    def _run(self, operations: List, streaming: bool, source: Optional[pl.LazyFrame] = None) -> pl.DataFrame:
+        source = self._input() if source is None else source
+        if self.explaining:
+            self.report["explain"] = plan_report(operations, self._build(operations, source))
+        if self.profiling:
+            # profile() always runs on the in-memory engine
+            result, self.report["profile"] = profile_plan(source, operations)
+            return result
+        return self._build(operations, source).collect(engine = "streaming" if streaming else "auto")
+
+    def _prefix_keys(self) -> Optional[List[str]]:
+        identity = input_identity(self.df, self.source, self.scan_options)
+        if identity is None:
+            return None
+        if self.dictionary is not None:
+            identity += f":{self.dictionary.to_dict()}:{self.extend_dictionary}"
+        if self.optimizing_dtypes:
+            identity += ":optimized-dtypes"
+        identity += f":keep-{self.keep}:{self.sketch}"
+        if self.keep == 'referenced':
+            # a pruned prefix only serves scripts that read the same columns
+            identity += f":{sorted(self.referenced()['inputs'])}"
+        operations = self.operations
+        if self.artifact is not None:
+            operations = apply_artifact(operations, self.artifact)
+        return prefix_keys(identity, operations)
+
+    def _run_from_checkpoint(self, streaming: bool) -> pl.DataFrame:
+        # resumes from the longest prefix of the script that was materialized
+        # before, so appending or editing command k only reruns k onwards
+        keys = self._prefix_keys()
+        if keys is None:
+            print("Input has no stable identity (lazy frame without a source), running without checkpoints")
+            return self._run(self.plan(), streaming)
+
+        total = len(self.operations)
+        start, result = total, None
+        while start > 0 and (result := self.checkpoints.get(keys[start])) is None:
+            start -= 1
+        self.report["checkpoint"] = {"resumed_from": start, "operations": total}
+        if start == total and result is not None:
+            return result
+
+        source = self._input() if result is None else result.lazy()
+        if self.checkpoint_every:
+            for idx in range(start, total):
+                result = self._run(self.plan(idx, idx + 1, source), streaming, source)
+                self.checkpoints.put(keys[idx + 1], result)
+                source = result.lazy()
+            return result
+        result = self._run(self.plan(start, source = source), streaming, source)
+        self.checkpoints.put(keys[total], result)
+        return result
+
+    def _govern(self, operations: List) -> str:
+        estimate = estimate_input_bytes(self.df, self.source)
+        mode, reason, carried = choose_mode(estimate, self.memory_budget, operations)
+        if mode == "chunked" and self.profiling:
+            # a profile covers the whole plan, the streaming engine is the next best
+            mode, reason = "streaming", f"{reason}, profiling needs one run"
+        self.report["memory"] = {
+            "budget_mb": round(self.memory_budget / 1024 ** 2, 3),
+            "estimated_input_mb": round(estimate / 1024 ** 2, 3) if estimate is not None else None,
+            "mode": mode,
+            "reason": reason,
+        }
+        if mode == "chunked":
+            self.report["memory"]["carried"] = carried
+        return mode
+
+    def _governed_plan(self) -> Tuple[List, str]:
+        # chunked runs step through the operations to carry forward fills
+        # from chunk to chunk, so the plan is only fused for the other modes
+        source = self._input()
+        operations = self.plan(source = source, optimize = False)
+        mode = self._govern(operations)
+        if mode != "chunked" and self.optimize:
+            operations = self._optimized(operations, source)
+        return operations, mode
+
+    def _run_chunk(self, operations: List, chunk: pl.DataFrame, carry: dict) -> pl.DataFrame:
+        # carry holds, per forward fill, the last value it filled in so far;
+        # the nulls a chunk starts with are filled from it
+        result = chunk.lazy()
+        for idx, op in enumerate(operations):
             result = op.clean(result)
+            if not carries_forward(op):
+                continue
+            last = carry.get(idx, {})
+            result = result.with_columns([pl.col(column).fill_null(pl.lit(value.item(), dtype = value.dtype))
+                                          for column, value in last.items()]).collect()
+            if result.height:
+                last.update({column: result[column].tail(1) for column in (op.columns or result.columns)
+                             if result[column][-1] is not None})
+            carry[idx] = last
+            result = result.lazy()
         return result.collect()
 
+    def _chunks(self, operations: List):
+        source = self._input()
+        rows = chunk_rows(source, self.memory_budget)
+        self.report["memory"]["chunk_rows"] = rows
+        empty, carry = True, {}
+        for batch in collect_batches(source, rows):
+            empty = False
+            yield self._run_chunk(operations, batch, carry)
+        if empty:
+            yield self._run_chunk(operations, source.head(0).collect(), carry)
+
+    def _run_governed(self) -> pl.DataFrame:
+        operations, mode = self._governed_plan()
+        with RssMonitor() as monitor:
+            match mode:
+                case "eager":
+                    result = self._run(operations, streaming = False)
+                case "streaming":
+                    result = self._run(operations, streaming = True)
+                case "chunked":
+                    result = pl.concat(list(self._chunks(operations)), how = "vertical_relaxed")
+        self.report["memory"]["peak_rss_mb"] = monitor.peak_mb
+        return result
+
+    def _sink_chunked(self, operations: List, path: Union[str, Path], file_format: str):
+        # csv chunks are appended to the file, parquet ones are spilled to
+        # Arrow IPC next to it and streamed into one parquet file
+        match file_format:
+            case 'csv':
+                with open(path, "wb") as f:
+                    for idx, chunk in enumerate(self._chunks(operations)):
+                        chunk.write_csv(f, include_header = idx == 0)
+            case 'parquet':
+                with tempfile.TemporaryDirectory(dir = Path(path).parent) as spill:
+                    parts = []
+                    for idx, chunk in enumerate(self._chunks(operations)):
+                        parts.append(Path(spill) / f"{idx}.arrow")
+                        chunk.write_ipc(parts[-1])
+                    pl.scan_ipc(parts).sink_parquet(path)
+
+    def execute(self, streaming: bool = False) -> pl.DataFrame:
+        if self.checkpoints is not None:
+            return self._run_from_checkpoint(streaming)
+        if self.memory_budget is not None:
+            return self._run_governed()
+        return self._run(self.plan(), streaming)
+
+    def preview(self, rows: int = PREVIEW_ROWS, method: str = 'head',
+                stratify_by: Optional[str] = None,
+                budget_ms: Optional[float] = PREVIEW_BUDGET_MS,
+                seed: int = 0) -> pl.DataFrame:
+        # runs the script on a bounded sample of the input, statistics are
+        # computed on the sample unless an artifact was applied. The dtype
+        # load stage needs a pass over the whole input, so it is skipped
+        started = time.perf_counter()
+        sample, info = sample_frame(self.df.lazy(), rows, method, stratify_by,
+                                    budget_ms * SAMPLING_SHARE if budget_ms is not None else None, seed)
+        operations = list(self.operations)
+        if self.artifact is not None:
+            operations = apply_artifact(operations, self.artifact)
+        whole = info["complete"] and info["rows"] == info["rows_scanned"]
+        estimates = [] if whole else estimated_operations(operations, self.df.lazy().collect_schema())
+        source = sample.lazy()
+        result = self._build(self.plan(source = source), source).collect()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.report["preview"] = {
+            "sample": info,
+            "estimates": estimates,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "budget_ms": budget_ms,
+            "within_budget": budget_ms is None or elapsed_ms <= budget_ms,
+        }
+        return result
+
+    @staticmethod
+    def _sink_format(path: Union[str, Path], file_format: Optional[str]) -> str:
+        file_format = file_format or Path(path).suffix.lstrip('.').lower() or 'csv'
+        if file_format not in {'csv', 'parquet'}:
+            raise ValueError(f"Unknown output format: {file_format}")
+        return file_format
+
+    @staticmethod
+    def _sink_query(result: pl.LazyFrame, path: Union[str, Path], file_format: str) -> pl.LazyFrame:
+        match file_format:
+            case 'csv':
+                return result.sink_csv(path, lazy = True)
+            case 'parquet':
+                return result.sink_parquet(path, lazy = True)
+
+    def _streaming_plan(self, operations: List):
+        for blocker in self.streaming_report(operations):
+            print(f"Streaming fallback for {blocker['operation']}: {blocker['reason']}")
+
+    def sink(self, path: Union[str, Path], file_format: Optional[str] = None, lazy: bool = False,
+             operations: Optional[List] = None):
+        # with lazy the sink query is returned instead of run; operations is
+        # a plan from plan_all, used instead of planning again
+        file_format = self._sink_format(path, file_format)
+        if self.checkpoints is not None:
+            # the result is materialized for the checkpoint anyway
+            result = self._run_from_checkpoint(streaming = True).lazy()
+        elif self.memory_budget is not None and not lazy and not (self.profiling or self.explaining):
+            # the sink streams already, only plans that can not stream are cut into chunks
+            operations, mode = self._governed_plan()
+            if mode == "chunked":
+                with RssMonitor() as monitor:
+                    self._sink_chunked(operations, path, file_format)
+                self.report["memory"]["peak_rss_mb"] = monitor.peak_mb
+                return path
+            self.report["memory"]["mode"] = "streaming"
+            result = self._build(operations)
+        else:
+            operations = self.plan() if operations is None else operations
+            self._streaming_plan(operations)
+            if self.profiling or self.explaining:
+                # the report needs the collected plan, so write from memory
+                result = self._run(operations, streaming = True).lazy()
+            else:
+                result = self._build(operations)
+        query = self._sink_query(result, path, file_format)
+        if lazy:
+            return query
+        with RssMonitor() as monitor:
+            query.collect(engine = "streaming")
+        if "memory" in self.report:
+            self.report["memory"]["peak_rss_mb"] = monitor.peak_mb
+        return path
+
+    # Asyncio API. Plans are built on the event loop with the statistics
+    # passes awaited, queries run on the polars thread pool through
+    # collect_async, so one loop can drive many jobs. Paths that work in
+    # python between passes (checkpoints, profiling, a memory budget) run
+    # on a worker thread instead.
+    def _runs_in_thread(self) -> bool:
+        return self.checkpoints is not None or self.profiling or self.memory_budget is not None
+
+    async def execute_async(self, streaming: bool = False) -> pl.DataFrame:
+        if self._runs_in_thread():
+            return await asyncio.to_thread(self.execute, streaming)
+        operations = await self.plan_async()
+        query = self._build(operations)
+        if self.explaining:
+            self.report["explain"] = plan_report(operations, query)
+        return await collect_async(query, "streaming" if streaming else "auto")
+
+    async def stream_async(self, rows: Optional[int] = None) -> AsyncIterator[pl.DataFrame]:
+        # the result in batches of about rows rows, on the streaming engine;
+        # closing or cancelling the consumer drops the query after the
+        # batch in flight
+        operations = await self.plan_async()
+        self._streaming_plan(operations)
+        batches = collect_batches(self._build(operations), rows)
+        pending = None
+        try:
+            while True:
+                # shielded, so a cancelled consumer does not lose track of
+                # the next() still running on its thread
+                pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                batch = await asyncio.shield(pending)
+                pending = None
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            # the generator can only be closed once no thread is inside it
+            def close(done):
+                if not done.cancelled():
+                    done.exception()
+                batches.close()
+            if pending is None:
+                batches.close()
+            else:
+                pending.add_done_callback(close)
+
+    async def sink_async(self, path: Union[str, Path], file_format: Optional[str] = None):
+        file_format = self._sink_format(path, file_format)
+        if self._runs_in_thread() or self.explaining:
+            return await asyncio.to_thread(self.sink, path, file_format)
+        operations = await self.plan_async()
+        self._streaming_plan(operations)
+        await collect_async(self._sink_query(self._build(operations), path, file_format), "streaming")
+        return path
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+import polars as pl
+from checkpoints import evict_lru, touch
+
+CACHE_VERSION = 1
+HASH_CHUNK = 8 * 1024 * 1024
+EXTENSIONS = {"ipc": "arrow", "parquet": "parquet"}
+# newest refs kept, a ref is a few bytes naming the hash of one csv version
+MAX_REFS = 10_000
+
+def content_hash(path: Union[str, Path]) -> str:
+    digest = hashlib.blake2b(digest_size = 20)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Uploaded csv files converted once to a columnar copy, named by the hash of
+# the csv content and the options it was parsed with. Uncompressed Arrow IPC
+# copies are memory-mapped, so later runs read the columns without parsing
+# or copying them. A small ref file per (path, size, mtime) remembers the
+# content hash, so an unchanged file is not hashed again and a changed one is.
+class ColumnarCache:
+    def __init__(self, directory: Union[str, Path],
+                 max_bytes: int = 8 * 1024 * 1024 * 1024,
+                 file_format: str = "ipc"):
+        if file_format not in EXTENSIONS:
+            raise ValueError(f"Unknown columnar cache format: {file_format}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents = True, exist_ok = True)
+        self.max_bytes = max_bytes
+        self.file_format = file_format
+        self.extension = EXTENSIONS[file_format]
+
+    def _ref(self, path: Path) -> Path:
+        stat = path.stat()
+        identity = f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+        return self.directory / f"{hashlib.blake2b(identity.encode(), digest_size = 20).hexdigest()}.ref"
+
+    def file_id(self, path: Union[str, Path]) -> str:
+        path = Path(path)
+        ref = self._ref(path)
+        try:
+            digest = ref.read_text()
+            touch(ref)
+            return digest
+        except FileNotFoundError:
+            digest = content_hash(path)
+            partial = ref.with_name(f"{ref.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            partial.write_text(digest)
+            os.replace(partial, ref)
+            touch(ref)
+            return digest
+
+    def _path(self, file_id: str, scan_options: Optional[dict]) -> Path:
+        options = f"v{CACHE_VERSION}:{pl.__version__}:{sorted((scan_options or {}).items())}"
+        suffix = hashlib.blake2b(options.encode(), digest_size = 8).hexdigest()
+        return self.directory / f"{file_id}-{suffix}.{self.extension}"
+
+    def __contains__(self, path: Union[str, Path]) -> bool:
+        return self._path(self.file_id(path), None).exists()
+
+    def _convert(self, source: Path, target: Path, scan_options: Optional[dict]):
+        partial = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        query = pl.scan_csv(source, **(scan_options or {}))
+        match self.file_format:
+            case "ipc":
+                query.sink_ipc(partial)
+            case "parquet":
+                query.sink_parquet(partial)
+        os.replace(partial, target)
+        touch(target)
+        evict_lru(self.directory, f"*.{self.extension}", self.max_bytes, keep = target)
+        refs = sorted(self.directory.glob("*.ref"), key = lambda ref: ref.stat().st_mtime_ns, reverse = True)
+        for ref in refs[MAX_REFS:]:
+            ref.unlink(missing_ok = True)
+
+    def scan(self, path: Union[str, Path], scan_options: Optional[dict] = None) -> pl.LazyFrame:
+        path = Path(path)
+        target = self._path(self.file_id(path), scan_options)
+        if target.exists():
+            touch(target)
+        else:
+            self._convert(path, target, scan_options)
+        if self.file_format == "ipc":
+            return pl.scan_ipc(target, memory_map = True)
+        return pl.scan_parquet(target)
+
+    def clear(self):
+        for pattern in (f"*.{self.extension}", "*.ref"):
+            for path in self.directory.glob(pattern):
+                path.unlink(missing_ok = True)
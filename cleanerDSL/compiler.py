@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+import yaml
+import polars as pl
+from typing import Callable, Dict, List, Optional, Tuple
+
+SchemaKey = Tuple[Tuple[str, pl.DataType], ...]
+
+STANDARDIZE_STRATEGIES = {'z-score', 'min-max', 'robust'}
+NORMALIZE_STRATEGIES = {'lower', 'upper', 'strip', 'label encoding'}
+IMPUTE_STRATEGIES = {'forward', 'backward', 'mean', 'median', 'mode'}
+OUTLIER_STRATEGIES = {'remove', 'cap', 'mean replace', 'median replace', 'null replace'}
+OUTLIER_METHODS = {'iqr', 'z-score', 'mad'}
+
+# One compiled DSL command: the CleanerPipeline builder to call and its
+# arguments. Lists are stored as tuples so compiled scripts can be cached
+# and shared, apply hands the pipeline fresh lists.
+@dataclass(frozen = True)
+class Command:
+    method: str
+    args: tuple = ()
+    kwargs: Tuple[Tuple[str, object], ...] = ()
+    columns: Tuple[str, ...] = ()
+
+    def apply(self, pipeline):
+        thaw = lambda value: list(value) if isinstance(value, tuple) else value
+        args = [thaw(arg) for arg in self.args]
+        kwargs = {name: thaw(value) for name, value in self.kwargs}
+        return getattr(pipeline, self.method)(*args, **kwargs)
+
+def _columns(text: str) -> Tuple[str, ...]:
+    return tuple(c.strip() for c in text.split(","))
+
+def _drop_for_columns(match) -> Command:
+    cols = _columns(match.group(1))
+    condition = match.group(2).upper()
+    if condition not in {'NULL', 'NAN'}:
+        raise RuntimeError(f"{match.group(2)}: This drop condition is not defined")
+    return Command("drop_na", kwargs = (("columns", cols), ("strategy", f"drop-{condition.lower()}")), columns = cols)
+
+def _normalise(match) -> Command:
+    cols = _columns(match.group(1))
+    strategy = " ".join(match.group(2).lower().split())
+    if strategy in STANDARDIZE_STRATEGIES:
+        return Command("standardize", (cols, strategy), columns = cols)
+    if strategy in NORMALIZE_STRATEGIES:
+        return Command("string_normalize", (cols, strategy), columns = cols)
+    raise ValueError(f"{match.group(2)}: This normalisation strategy is not defined")
+
+def _transform(match) -> Command:
+    cols = _columns(match.group(1))
+    return Command("transform", (cols, match.group(2).lower(), match.group(3) is not None), columns = cols)
+
+def _impute(value: str, cols: Tuple[str, ...] = ()) -> Command:
+    strategy = value.lower() if value.lower() in IMPUTE_STRATEGIES else "default"
+    kwargs = (("value", value), ("strategy", strategy))
+    if cols:
+        kwargs = (("columns", cols),) + kwargs
+    return Command("impute_na", kwargs = kwargs, columns = cols)
+
+def _rename(match) -> Command:
+    old_cols, new_cols = _columns(match.group(1)), _columns(match.group(2))
+    if len(old_cols) != len(new_cols):
+        raise ValueError(f"RENAME needs as many new names as columns, got {old_cols} and {new_cols}")
+    return Command("rename", kwargs = tuple(zip(old_cols, new_cols)), columns = old_cols)
+
+def _outliers(match) -> Command:
+    cols = _columns(match.group(1))
+    strategy = " ".join(match.group(2).lower().split())
+    method = (match.group(3) or "iqr").lower()
+    if strategy not in OUTLIER_STRATEGIES:
+        raise ValueError(f"{match.group(2)}: This outlier strategy is not defined")
+    return Command("handle_outlier", (cols, strategy, method), columns = cols)
+
+def _cast(match) -> Command:
+    from operations.casting import parse_dtype
+    cols = _columns(match.group(1))
+    parse_dtype(match.group(2))
+    return Command("cast", kwargs = tuple((col, match.group(2).lower()) for col in cols), columns = cols)
+
+def _rule(pattern: str, build: Callable) -> Tuple[re.Pattern, Callable]:
+    return re.compile(pattern, re.IGNORECASE), build
+
+# Rules are grouped by the leading keyword, so a command is only matched
+# against the handful of patterns that can apply to it.
+RULES: Dict[str, List[Tuple[re.Pattern, Callable]]] = {
+    "DROP": [
+        _rule(r"DROP ALL NULL ROWS", lambda m: Command("drop_na", kwargs = (("strategy", "drop-null-row"),))),
+        _rule(r"DROP ANY NULL ROWS", lambda m: Command("drop_na")),
+        _rule(r"DROP ROWS WHERE (.+) IS (\w+)", _drop_for_columns),
+        _rule(r"DROP NULL AND NAN ROWS", lambda m: Command("drop_na", kwargs = (("strategy", "drop-null-nan"),))),
+        _rule(r"DROP ANY NAN ROWS", lambda m: Command("drop_na", kwargs = (("strategy", "drop-nan"),))),
+    ],
+    "FILTER": [
+        _rule(r"FILTER WHERE\s+(.+)", lambda m: Command("filter", kwargs = (("expression", m.group(1).strip()),))),
+    ],
+    "NORMALISE": [
+        _rule(r"NORMALISE COLUMNS (.+) USING (.+)", _normalise),
+    ],
+    "TRANSFORM": [
+        _rule(r"TRANSFORM COLUMNS (.+) USING ([\w-]+)( INPLACE)?", _transform),
+    ],
+    "FILL": [
+        _rule(r"FILL NULL IN COLUMN (.+) USING (.+)", lambda m: _impute(m.group(2).strip(), _columns(m.group(1)))),
+        _rule(r"FILL NULL USING (.+)", lambda m: _impute(m.group(1).strip())),
+    ],
+    "RENAME": [
+        _rule(r"RENAME (.+) TO (.+)", _rename),
+    ],
+    "HANDLE": [
+        _rule(r"HANDLE OUTLIERS IN COLUMNS? (.+) USING (.+?)(?: BY (IQR|Z-SCORE|MAD))?", _outliers),
+    ],
+    "CAST": [
+        _rule(r"CAST COLUMNS? (.+) TO (\w+)", _cast),
+    ],
+    "APPROXIMATE": [
+        _rule(r"APPROXIMATE STATISTICS", lambda m: Command("with_approximate_statistics")),
+    ],
+    "KEEP": [
+        _rule(r"KEEP (REFERENCED|ALL) COLUMNS", lambda m: Command("keep_columns", (m.group(1).lower(),))),
+    ],
+    "OPTIMISE": [
+        _rule(r"OPTIMISE DTYPES", lambda m: Command("with_dtype_optimizer")),
+    ],
+    "OPTIMIZE": [
+        _rule(r"OPTIMIZE DTYPES", lambda m: Command("with_dtype_optimizer")),
+    ],
+    "EXPLAIN": [
+        _rule(r"EXPLAIN", lambda m: Command("with_explain")),
+    ],
+    "PROFILE": [
+        _rule(r"PROFILE", lambda m: Command("with_profile")),
+    ],
+}
+
+@lru_cache(maxsize = 1024)
+def compile_command(cmd: str) -> Command:
+    text = " ".join(str(cmd).split())
+    keyword = text.split(" ", 1)[0].upper()
+    for pattern, build in RULES.get(keyword, []):
+        match = pattern.fullmatch(text)
+        if match:
+            return build(match)
+    raise ValueError(f"{cmd} is invalid")
+
+def _validate(commands: List[Command], schema: SchemaKey):
+    # the script is built on an empty frame with the input schema and type
+    # checked step by step, so columns renamed or added earlier in the
+    # script are known and nothing is read
+    if not commands:
+        return
+    from cleanerpl import CleanerPipeline
+    from validation import validate_plan
+    pipeline = CleanerPipeline(pl.LazyFrame(schema = dict(schema)))
+    for command in commands:
+        command.apply(pipeline)
+    validate_plan(pipeline.operations, pipeline.df.collect_schema())
+
+@lru_cache(maxsize = 256)
+def _compile(text: str, schema: SchemaKey) -> Tuple[Command, ...]:
+    commands = [compile_command(cmd) for cmd in yaml.safe_load(text) or []]
+    _validate(commands, schema)
+    return tuple(commands)
+
+def schema_key(schema: Optional[pl.Schema]) -> SchemaKey:
+    return tuple((schema or {}).items())
+
+# Compiles a YAML script against an input schema. The result is cached on
+# (script text, schema) so a script that is submitted again skips parsing
+# and column validation entirely.
+def compile_script(yml: str, schema: Optional[pl.Schema] = None) -> Tuple[Command, ...]:
+    return _compile(yml.strip(), schema_key(schema))
+
+def cache_info():
+    return {"scripts": _compile.cache_info(), "commands": compile_command.cache_info()}
+
+def clear_cache():
+    _compile.cache_clear()
+    compile_command.cache_clear()
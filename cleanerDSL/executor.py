@@ -0,0 +1,93 @@
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+
+import polars as pl
+
+# Runs jobs on threads of this process. Polars releases the GIL while a query
+# runs, so concurrent jobs share one warm interpreter (imports, compiled
+# scripts, parsed filters) instead of one process each. Polars has a single
+# thread pool per process, sized by POLARS_MAX_THREADS before it is imported;
+# threads_per_job splits that pool, so at most pool size // threads_per_job
+# jobs run at once and each gets about threads_per_job threads of it.
+#
+# Queued jobs wait per client and clients are served round robin, so a
+# client submitting many jobs does not hold back the others. At most
+# max_pending jobs wait or run; submit blocks once the queue is full,
+# or raises queue.Full with block = False.
+class JobExecutor:
+    def __init__(self, threads_per_job: Optional[int] = None, max_pending: int = 64):
+        self.pool_threads = pl.thread_pool_size()
+        self.threads_per_job = min(threads_per_job or self.pool_threads, self.pool_threads)
+        self.concurrency = max(1, self.pool_threads // self.threads_per_job)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.queues = OrderedDict()
+        self.ready = threading.Condition()
+        self.running = 0
+        self.closed = False
+        self.threads = [threading.Thread(target = self._run, name = f"job-{idx}", daemon = True)
+                        for idx in range(self.concurrency)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, client: Hashable = None, block: bool = True, **kwargs) -> Future:
+        if self.closed:
+            raise RuntimeError("Executor is shut down")
+        if not self.slots.acquire(blocking = block):
+            raise queue.Full("Job queue is full")
+        job = Future()
+        with self.ready:
+            self.queues.setdefault(client, deque()).append((job, fn, args, kwargs))
+            self.ready.notify()
+        return job
+
+    def _next(self):
+        # the client served longest ago goes first and moves to the back
+        client, jobs = next(iter(self.queues.items()))
+        job = jobs.popleft()
+        if jobs:
+            self.queues.move_to_end(client)
+        else:
+            del self.queues[client]
+        return job
+
+    def _run(self):
+        while True:
+            with self.ready:
+                while not self.queues and not self.closed:
+                    self.ready.wait()
+                if not self.queues:
+                    return
+                job, fn, args, kwargs = self._next()
+                self.running += 1
+            try:
+                if job.set_running_or_notify_cancel():
+                    try:
+                        job.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        job.set_exception(e)
+            finally:
+                with self.ready:
+                    self.running -= 1
+                self.slots.release()
+
+    def status(self) -> dict:
+        with self.ready:
+            return {
+                "running": self.running,
+                "queued": sum(len(jobs) for jobs in self.queues.values()),
+                "clients": len(self.queues),
+                "concurrency": self.concurrency,
+                "threads_per_job": self.threads_per_job,
+            }
+
+    def shutdown(self, wait: bool = True):
+        # queued jobs still run, new ones are refused
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
@@ -0,0 +1,119 @@
+import os
+import re
+import resource
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import polars as pl
+
+from operations import ImputeNa
+
+UNITS = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+# in-memory size of an input relative to its file, parquet is compressed
+SIZE_FACTORS = {".csv": 1.0, ".tsv": 1.0, ".arrow": 1.0, ".ipc": 1.0, ".parquet": 4.0}
+# an eager run holds the input and the frame being built from it
+EAGER_OVERHEAD = 2.0
+# a chunk takes this share of the budget, the rest is left for its output
+CHUNK_SHARE = 0.25
+MIN_CHUNK_ROWS = 1_000
+SAMPLE_ROWS = 1_000
+RSS_INTERVAL_S = 0.05
+
+def parse_bytes(value: Union[int, float, str]) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kmgt]?b?)\s*", value.lower())
+    if match is None or match.group(2) not in UNITS:
+        raise ValueError(f"{value}: unknown memory size, expected e.g. 512MB or 4GB")
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+def estimate_input_bytes(df: Union[pl.DataFrame, pl.LazyFrame],
+                         source: Optional[Union[str, Path]] = None) -> Optional[int]:
+    # files by their size, frames by their buffers; a lazy frame of unknown
+    # origin has no estimate
+    if source is not None:
+        path = Path(source)
+        return int(path.stat().st_size * SIZE_FACTORS.get(path.suffix.lower(), 1.0))
+    if isinstance(df, pl.DataFrame):
+        return int(df.estimated_size())
+    return None
+
+# Forward fills run chunk by chunk with the last value the previous chunk
+# filled in carried over, so their result does not depend on where chunks end
+def carries_forward(op) -> bool:
+    return isinstance(op, ImputeNa) and op.strategy == 'forward'
+
+# Picks how a plan runs within budget bytes:
+#   eager      the input fits twice over, collect on the in-memory engine
+#   streaming  every operation is row-local once its statistics are bound,
+#              the streaming engine keeps a few batches in memory. Plans with
+#              an operation that sees rows across chunks (backward fill)
+#              stream too, chunks would change their result
+#   chunked    the only operations that are not row-local are forward fills,
+#              the input is cut into chunks sized to the budget, each runs
+#              through the plan with the fills carried from the last chunk
+def choose_mode(estimate: Optional[int], budget: int, operations: List) -> Tuple[str, str, List[str]]:
+    # fused operations (WithColumns, FilterRows) are reported by their sources
+    ordered = [source for op in operations for source in getattr(op, "sources", None) or [op]
+               if not source.is_row_local()]
+    if estimate is not None and estimate * EAGER_OVERHEAD <= budget:
+        return "eager", "input fits in the budget", []
+    size = "input size unknown" if estimate is None else f"input of about {estimate / UNITS['mb']:.0f} MB"
+    if not ordered:
+        return "streaming", f"{size}, every operation streams", []
+    if not all(carries_forward(op) for op in ordered):
+        blocking = sum(not carries_forward(op) for op in ordered)
+        return "streaming", f"{size}, {blocking} operation(s) can not run in chunks", []
+    return "chunked", f"{size}, {len(ordered)} forward fill(s) carried across chunks", [repr(op) for op in ordered]
+
+def chunk_rows(source: pl.LazyFrame, budget: int) -> int:
+    sample = source.head(SAMPLE_ROWS).collect()
+    if not sample.height:
+        return MIN_CHUNK_ROWS
+    row_bytes = max(sample.estimated_size() / sample.height, 1)
+    return max(MIN_CHUNK_ROWS, int(budget * CHUNK_SHARE / (row_bytes * EAGER_OVERHEAD)))
+
+def current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+# Peak resident memory of the process while the block runs, sampled from
+# /proc. Where that is missing, the lifetime peak from getrusage is used.
+class RssMonitor:
+    def __init__(self, interval: float = RSS_INTERVAL_S):
+        self.interval = interval
+        self.peak = 0
+        self.done = threading.Event()
+        self.thread = None
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss() or 0)
+            if self.done.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RssMonitor":
+        if current_rss() is not None:
+            self.thread = threading.Thread(target = self._sample, name = "rss-monitor", daemon = True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.peak = max(self.peak, current_rss() or 0)
+        else:
+            # kilobytes on linux, bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / UNITS["mb"], 3)
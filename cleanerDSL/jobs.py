@@ -0,0 +1,109 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+from DSLInterpreter import DSLInterpreter
+from operations import LabelDictionary
+from pageindex import index_path, write_index
+from preview import PREVIEW_BUDGET_MS, PREVIEW_ROWS
+
+# directory of the columnar copies of uploaded csv files, unset disables it
+COLUMNAR_CACHE_DIR = os.environ.get("DOLPHY_COLUMNAR_CACHE")
+# default memory budget of a job ("4GB"), read per job so the worker flag applies
+MEMORY_BUDGET_ENV = "DOLPHY_MEMORY_BUDGET"
+
+# jobs sharing a label dictionary in this process run one at a time, so
+# codes one of them hands out are saved before the next one reads the file
+_DICTIONARY_LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+
+def _dictionary_lock(path: Optional[Union[str, Path]]):
+    if path is None:
+        return contextlib.nullcontext()
+    with _LOCKS_LOCK:
+        return _DICTIONARY_LOCKS.setdefault(str(Path(path).resolve()), threading.Lock())
+
+def _pipeline_options() -> dict:
+    if not COLUMNAR_CACHE_DIR:
+        return {}
+    from columnar import ColumnarCache
+    return {"columnar_cache": ColumnarCache(COLUMNAR_CACHE_DIR)}
+
+def _memory_budget(budget: Optional[Union[int, str]]) -> Optional[Union[int, str]]:
+    return budget if budget is not None else os.environ.get(MEMORY_BUDGET_ENV) or None
+
+def validate_job(csv_path: Union[str, Path], instruction_path: Union[str, Path]) -> dict:
+    # compiles and type checks the script against the schema of the file,
+    # which only reads its first rows, so broken scripts never get queued
+    started = time.perf_counter()
+    DSLInterpreter.from_path(csv_path).compile(Path(instruction_path).read_text())
+    return {"validate_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+def run_job(csv_path: Union[str, Path], 
+            instruction_path: Union[str, Path], 
+            output_path: Union[str, Path],
+            index: bool = True,
+            dictionary: Optional[Union[str, Path]] = None,
+            memory_budget: Optional[Union[int, str]] = None) -> dict:
+    started = time.perf_counter()
+    script = Path(instruction_path).read_text()
+
+    with _dictionary_lock(dictionary):
+        # a label dictionary shared by the jobs of one dataset, created on first
+        # use and saved back with the columns this job added
+        options = _pipeline_options()
+        if (budget := _memory_budget(memory_budget)) is not None:
+            options["memory_budget"] = budget
+        if dictionary is not None:
+            options["dictionary"] = dictionary if Path(dictionary).exists() else LabelDictionary()
+        interpreter = DSLInterpreter.from_path(csv_path, **options)
+        interpreter.load(script)
+        loaded = time.perf_counter()
+
+        interpreter.dsl_engine.sink(output_path)
+        if dictionary is not None:
+            interpreter.dsl_engine.dictionary.save(dictionary)
+        executed = time.perf_counter()
+
+    # sidecar row index so the backend can page the output without rescanning it
+    page_index = None
+    if index and (Path(output_path).suffix.lstrip('.').lower() or 'csv') == 'csv':
+        page_index = write_index(output_path)
+    finished = time.perf_counter()
+
+    response = {
+        "output": str(output_path),
+        "timings": {
+            "load_ms": round((loaded - started) * 1000, 3),
+            "execute_ms": round((executed - loaded) * 1000, 3),
+            "index_ms": round((finished - executed) * 1000, 3),
+            "total_ms": round((finished - started) * 1000, 3),
+        },
+    }
+    if page_index is not None:
+        response["index"] = str(index_path(output_path))
+        response["total_rows"] = page_index.total_rows
+    if interpreter.dsl_engine.report:
+        response["report"] = interpreter.dsl_engine.report
+    return response
+
+def run_preview(csv_path: Union[str, Path],
+                instruction_path: Union[str, Path],
+                rows: int = PREVIEW_ROWS,
+                method: str = "head",
+                stratify_by: Optional[str] = None,
+                budget_ms: Optional[float] = PREVIEW_BUDGET_MS) -> dict:
+    started = time.perf_counter()
+    interpreter = DSLInterpreter.from_path(csv_path, **_pipeline_options())
+    result = interpreter.preview(Path(instruction_path).read_text(), rows = rows, method = method,
+                                 stratify_by = stratify_by, budget_ms = budget_ms)
+    return {
+        # through write_json so dates and other non-JSON types come out as strings
+        "data": json.loads(result.write_json()),
+        "columns": result.columns,
+        "report": interpreter.dsl_engine.report,
+        "timings": {"total_ms": round((time.perf_counter() - started) * 1000, 3)},
+    }
@@ -1,41 +1,60 @@
+from importlib import import_module
 from .base import Operations
 
-from .csvfilters import (
-    Filter,
-    Drop,
-)
-
-from .transformations import (
-    Transformation,
-    ImputeNa,
-    OutlierHandling,
-    Rename,
-)
-
-from .equalizers import (
-    Standardize,
-    StringNormalize,
-)
-
-from .validators import (
-    ValidateCommand
-)
+# Submodules are imported on first attribute access (PEP 562) so a job only
+# pays for the dependencies of the commands it actually runs.
+_EXPORTS = {
+    "Filter": ".csvfilters",
+    "Drop": ".csvfilters",
+
+    "Transformation": ".transformations",
+    "ImputeNa": ".transformations",
+    "OutlierHandling": ".transformations",
+    "Rename": ".transformations",
+
+    "Standardize": ".equalizers",
+    "StringNormalize": ".equalizers",
+
+    "StatsStore": ".statistics",
+    "bind_statistics": ".statistics",
+    "bind_statistics_async": ".statistics",
+    "bind_statistics_all": ".statistics",
+    "collect_async": ".statistics",
+    "collect_batches": ".statistics",
+    "compute_stats": ".statistics",
+    "compute_stats_all": ".statistics",
+    "fit_artifact": ".statistics",
+    "apply_artifact": ".statistics",
+    "save_artifact": ".statistics",
+    "load_artifact": ".statistics",
+
+    "Cast": ".casting",
+    "cast_expr": ".casting",
+    "infer_dtypes": ".casting",
+    "parse_dtype": ".casting",
+
+    "SketchOptions": ".sketches",
+    "QuantileSketch": ".sketches",
+    "HeavyHitters": ".sketches",
+
+    "LabelDictionary": ".dictionary",
+    "bind_dictionary": ".dictionary",
+    "learn_dictionary": ".dictionary",
+
+    "WithColumns": ".fused",
+    "FilterRows": ".fused",
+}
 
 __version__ = "0.1.0"
 
-__all__ = [
-    "Operations",
-
-    "Filter",
-    "Drop",
-    
-    "Transformation",
-    "ImputeNa",
-    "OutlierHandling",
-    "Rename",
+__all__ = ["Operations", *_EXPORTS]
 
-    "Standardize",
-    "StringNormalize",
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
 
-    "ValidateCommand",
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
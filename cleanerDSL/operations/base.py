@@ -1,10 +1,39 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
 import polars as pl
+from .statistics import StatsStore
 
 @dataclass
 class Operations(ABC):
+    # statistics precomputed by the pipeline, read back as literals
+    stats: Optional[StatsStore] = field(default = None, kw_only = True, 
+                                          repr = False, compare = False)
 
     @abstractmethod
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         pass
+
+    def streaming_blockers(self) -> List[str]:
+        return []
+
+    # Column-wise operations return the expressions they add through
+    # with_columns, row filters return their predicate. Operations that
+    # return neither are left untouched by the plan optimizer.
+    def expressions(self, schema: pl.Schema) -> Optional[List[pl.Expr]]:
+        return None
+
+    def predicate(self, schema: pl.Schema) -> Optional[pl.Expr]:
+        return None
+
+    def is_row_local(self) -> bool:
+        return False
+
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        return []
+
+    # Columns the operation reads and the kind of dtype each must have,
+    # "any", "numeric" or "string", checked by the plan validator before
+    # any data is read.
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {}
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+import polars as pl
+from typing import Dict, Iterable, List, Tuple
+from .base import Operations
+
+DTYPES = {
+    "int8": pl.Int8,
+    "int16": pl.Int16,
+    "int32": pl.Int32,
+    "int64": pl.Int64,
+    "uint8": pl.UInt8,
+    "uint16": pl.UInt16,
+    "uint32": pl.UInt32,
+    "uint64": pl.UInt64,
+    "float32": pl.Float32,
+    "float64": pl.Float64,
+    "string": pl.String,
+    "text": pl.String,
+    "category": pl.Categorical,
+    "categorical": pl.Categorical,
+    "bool": pl.Boolean,
+    "boolean": pl.Boolean,
+    "date": pl.Date,
+    "datetime": pl.Datetime,
+}
+
+SAMPLE_ROWS = 10_000
+# strings become categorical when they repeat: few distinct values overall
+# and at most one distinct value for every other row
+MAX_CATEGORIES = 1024
+CATEGORY_RATIO = 0.5
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y"]
+DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M"]
+# narrowest first, signed so arithmetic on the column keeps its sign
+INTEGER_RANGES = [(pl.Int8, 8), (pl.Int16, 16), (pl.Int32, 32)]
+INTEGER_BITS = {pl.Int8: 8, pl.Int16: 16, pl.Int32: 32, pl.Int64: 64,
+                pl.UInt8: 8, pl.UInt16: 16, pl.UInt32: 32, pl.UInt64: 64}
+
+def parse_dtype(name: str) -> pl.DataType:
+    try:
+        return DTYPES[name.lower()]
+    except KeyError:
+        raise ValueError(f"{name}: unknown dtype, expected one of {sorted(DTYPES)}") from None
+
+def cast_expr(column: str, source: pl.DataType, target, fmt: str = None) -> pl.Expr:
+    col = pl.col(column)
+    if source == pl.String and target == pl.Date:
+        return col.str.to_date(fmt)
+    if source == pl.String and target == pl.Datetime:
+        return col.str.to_datetime(fmt)
+    return col.cast(target)
+
+@dataclass
+class Cast(Operations):
+    # column -> dtype name, kept as text so the operation repr is stable
+    mapping: Dict[str, str]
+
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        expressions = []
+        for column, name in self.mapping.items():
+            if column not in schema:
+                raise ValueError(f"Column: {column} is not present in the CSV")
+            expressions.append(cast_expr(column, schema[column], parse_dtype(name)).alias(column))
+        return expressions
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "any" for column in self.mapping}
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
+        try:
+            return result.with_columns(self.expressions(result.collect_schema()))
+        except Exception as e:
+            print(f"Failed to cast columns due to the following error: {e}")
+        return result
+
+    def is_row_local(self) -> bool:
+        return True
+
+def _parses(values: pl.Expr, fmt: str, datetime: bool) -> pl.Expr:
+    parsed = values.str.to_datetime(fmt, strict = False) if datetime else values.str.to_date(fmt, strict = False)
+    return parsed.null_count() == values.null_count()
+
+def _string_candidate(sample: pl.Series) -> Tuple:
+    values = sample.drop_nulls()
+    if values.is_empty():
+        return None
+    for datetime, formats in ((False, DATE_FORMATS), (True, DATETIME_FORMATS)):
+        for fmt in formats:
+            if pl.select(_parses(pl.lit(values), fmt, datetime)).item():
+                return (pl.Datetime if datetime else pl.Date), fmt
+    distinct = values.n_unique()
+    if distinct <= MAX_CATEGORIES and distinct <= CATEGORY_RATIO * len(values):
+        return pl.Categorical, None
+    return None
+
+def _estimated_mb(sample: pl.DataFrame, rows: int) -> float:
+    if not sample.height:
+        return 0.0
+    return round(sample.estimated_size("mb") / sample.height * rows, 3)
+
+# Opt-in load stage. Candidates are picked on a sample and every one of them
+# is confirmed over the whole input in one aggregate pass, so a downcast never
+# truncates a value the sample did not contain: integers take the narrowest
+# width holding their range, floats go to Float32 only when that is lossless,
+# dates must parse on every row and categorical columns must stay repetitive.
+# Returns the casts and a report with the memory they are estimated to save.
+def infer_dtypes(source: pl.LazyFrame, pinned: Iterable[str] = (),
+                 sample_rows: int = SAMPLE_ROWS) -> Tuple[Dict[str, Tuple], dict]:
+    schema = source.collect_schema()
+    pinned = set(pinned)
+    sample = source.head(sample_rows).collect()
+    candidates, checks = {}, [pl.len().alias("__rows")]
+    for idx, (column, dtype) in enumerate(schema.items()):
+        if column in pinned:
+            continue
+        col = pl.col(column)
+        if dtype.is_integer() and dtype not in (pl.Int8, pl.UInt8):
+            candidates[column] = ("integer", None, None)
+            checks += [col.min().cast(pl.Int64, strict = False).alias(f"{idx}_min"),
+                       col.max().cast(pl.Int64, strict = False).alias(f"{idx}_max")]
+        elif dtype == pl.Float64:
+            candidates[column] = ("float", pl.Float32, None)
+            lossless = (col.cast(pl.Float32).cast(pl.Float64) == col) | col.is_null() | col.is_nan()
+            checks.append(lossless.all().alias(f"{idx}_ok"))
+        elif dtype == pl.String:
+            candidate = _string_candidate(sample[column])
+            if candidate is None:
+                continue
+            target, fmt = candidate
+            candidates[column] = ("string", target, fmt)
+            if target == pl.Categorical:
+                distinct = col.approx_n_unique()
+                check = (distinct <= MAX_CATEGORIES) & (distinct <= CATEGORY_RATIO * col.count())
+            else:
+                check = _parses(col, fmt, target == pl.Datetime)
+            checks.append(check.alias(f"{idx}_ok"))
+
+    totals = source.select(checks).collect().row(0, named = True)
+    dtypes = {}
+    for idx, (column, dtype) in enumerate(schema.items()):
+        if column not in candidates:
+            continue
+        kind, target, fmt = candidates[column]
+        if kind != "integer":
+            if totals[f"{idx}_ok"]:
+                dtypes[column] = (target, fmt)
+            continue
+        low, high = totals[f"{idx}_min"], totals[f"{idx}_max"]
+        if low is None or high is None:
+            continue
+        for width, bits in INTEGER_RANGES:
+            if bits >= INTEGER_BITS[dtype]:
+                break
+            if -2 ** (bits - 1) <= low and high < 2 ** (bits - 1):
+                dtypes[column] = (width, None)
+                break
+
+    rows = totals["__rows"]
+    cast = sample.with_columns([cast_expr(column, schema[column], target, fmt).alias(column)
+                                for column, (target, fmt) in dtypes.items()])
+    before, after = _estimated_mb(sample, rows), _estimated_mb(cast, rows)
+    return dtypes, {
+        "columns": {column: {"from": str(schema[column]), "to": str(cast.schema[column])} for column in dtypes},
+        "rows": rows,
+        "estimated_mb_before": before,
+        "estimated_mb_after": after,
+        "saved_mb": round(before - after, 3),
+    }
@@ -1,47 +1,62 @@
 from dataclasses import dataclass
 import polars as pl
 from .base import Operations
-from typing import Optional, List
+from typing import Dict, Optional, List
 from .filterparser import FilterParser
 
 @dataclass
 class Filter(Operations):
     expression: str
 
-    fp = FilterParser()
+    def predicate(self, schema: pl.Schema) -> pl.Expr:
+        return FilterParser().parse(self.expression, schema)
+
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
-        return result.filter(self.fp.parse(self.expression))
+        return result.filter(self.predicate(result.collect_schema()))
+
+    def is_row_local(self) -> bool:
+        return True
 
 @dataclass
 class Drop(Operations):
     columns: Optional[List[str]]
     strategy: str = "drop-null"
 
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "any" for column in self.columns or []}
+
+    def predicate(self, schema: pl.Schema) -> Optional[pl.Expr]:
+        if self.columns is not None:
+            for column in self.columns:
+                if column not in schema:
+                    raise ValueError("Column not in the table")
+
+        columns = self.columns if self.columns else None
+        match self.strategy: 
+            case "drop-null":
+                subset = self.columns if self.columns is not None else schema.keys()
+                if subset:
+                    return pl.all_horizontal([pl.col(col).is_not_null() for col in subset])
+            case "drop-nan":
+                if columns is not None:
+                    return pl.all_horizontal([pl.col(col).is_not_nan() for col in columns])
+            case "drop-null-row":
+                return ~pl.all_horizontal([pl.col(col).is_null() for col in schema.keys()])
+            case "drop-null-nan":
+                if columns is not None:
+                    return pl.all_horizontal([pl.col(col).is_finite() for col in columns])
+        return None
+
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         try:
-            if self.columns is not None:
-                for column in self.columns:
-                    if column not in result.schema:
-                        raise ValueError("Column not in the table")
-
-            match self.strategy: 
-                case "drop-null":
-                    if self.columns is None:
-                        return result.drop_nulls()
-                    else:
-                        return result.drop_nulls(subset=self.columns)
-                case "drop-nan":
-                    if self.columns is not None and len(self.columns) > 0:
-                        for col in self.columns:
-                            result = result.filter(pl.col(col).is_not_nan())
-                case "drop-null-row":
-                    result = result.filter(~pl.all_horizontal(pl.all().is_null()))
-                case "drop-null-nan":
-                    if self.columns is not None and len(self.columns) > 0:
-                        for col in self.columns:
-                            result = result.filter(pl.col(col).is_finite())
+            predicate = self.predicate(result.collect_schema())
+            if self.strategy == "drop-null":
+                return result.drop_nulls(subset=self.columns)
+            if predicate is not None:
+                return result.filter(predicate)
         except Exception as e:
             print(f"Failed to drop rows: {e}")
         return result 
 
-
+    def is_row_local(self) -> bool:
+        return True
@@ -0,0 +1,117 @@
+from dataclasses import dataclass, field, replace
+import json
+import os
+import threading
+import polars as pl
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+from .statistics import StatsStore
+
+DICTIONARY_VERSION = 1
+
+def label_keys(values: Iterable) -> List[str]:
+    # values are kept as polars renders them as text, whatever the column
+    # dtype, so a numeric column keys the same learned from data or from JSON
+    return pl.Series(list(values)).cast(pl.String).to_list()
+
+# Label codes are positions in a per-column list of values. A fresh
+# dictionary is sorted, so the codes only depend on the set of values and
+# not on the order rows arrive in; extending it appends the values it has
+# not seen yet, so codes handed out earlier never change. Values are stored
+# as text, in the order of the column's own dtype.
+@dataclass
+class LabelDictionary:
+    columns: Dict[str, List[str]] = field(default_factory = dict)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.columns
+
+    def __getitem__(self, column: str) -> List[str]:
+        return self.columns[column]
+
+    def enum(self, column: str) -> pl.Enum:
+        return pl.Enum(self.columns[column])
+
+    def encode(self, column: str) -> pl.Expr:
+        categories = self.columns[column]
+        return pl.col(column).cast(pl.String).replace_strict(categories, list(range(len(categories))),
+                                             default = None, return_dtype = pl.UInt32)
+
+    def decode(self, column: str) -> pl.Expr:
+        categories = self.columns[column]
+        return pl.col(column).replace_strict(list(range(len(categories))), categories,
+                                             default = None, return_dtype = pl.String)
+
+    def merge(self, column: str, values: Iterable) -> List[str]:
+        # values come sorted, the new ones are appended in that order
+        known = self.columns.setdefault(column, [])
+        seen = set(known)
+        known.extend(value for value in dict.fromkeys(label_keys(values)) if value not in seen)
+        return list(known)
+
+    def extend(self, result: pl.LazyFrame, columns: Iterable[str]) -> "LabelDictionary":
+        # one pass over the frame for every column at once
+        columns = list(dict.fromkeys(columns))
+        if columns:
+            row = result.select([
+                pl.col(column).drop_nulls().unique().sort().cast(pl.String).implode() for column in columns
+            ]).collect().row(0)
+            for column, values in zip(columns, row):
+                self.merge(column, values)
+        return self
+
+    def to_dict(self) -> dict:
+        return {"version": DICTIONARY_VERSION, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, entries: dict) -> "LabelDictionary":
+        if entries.get("version") != DICTIONARY_VERSION:
+            raise ValueError(f"Unsupported label dictionary version: {entries.get('version')}")
+        return cls({column: list(values) for column, values in entries["columns"].items()})
+
+    def save(self, path: Union[str, Path]):
+        partial = Path(f"{path}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(partial, "w") as f:
+            json.dump(self.to_dict(), f, indent = 2)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, source: Union["LabelDictionary", dict, str, Path]) -> "LabelDictionary":
+        if isinstance(source, LabelDictionary):
+            return source
+        if isinstance(source, dict):
+            return cls.from_dict(source)
+        with open(source) as f:
+            return cls.from_dict(json.load(f))
+
+def _is_label_encoding(op) -> bool:
+    return getattr(op, "strategy", None) == "label encoding"
+
+def bind_dictionary(operations: List, schema: pl.Schema, dictionary: LabelDictionary,
+                    extend: bool = False) -> List:
+    # label encodings read the categories of known columns from the
+    # dictionary instead of the data, so values it does not have encode to
+    # null. Columns it does not have yet, and every column with extend, are
+    # left for bind_statistics and merged back by learn_dictionary
+    if extend:
+        return operations
+    bound = []
+    for op in operations:
+        if _is_label_encoding(op):
+            known = [column for column, _ in op.required_stats(schema) if column in dictionary]
+            if known:
+                op = replace(op, stats = StatsStore({(column, "categories"): dictionary[column]
+                                                     for column in known}))
+        bound.append(op)
+    return bound
+
+def learn_dictionary(operations: List, dictionary: LabelDictionary) -> List:
+    learned = []
+    for op in operations:
+        if _is_label_encoding(op) and op.stats is not None:
+            op = replace(op, stats = StatsStore({
+                (column, stat): dictionary.merge(column, value)
+                for (column, stat), value in op.stats.values.items()
+            }))
+        learned.append(op)
+    return learned
@@ -1,7 +1,15 @@
 from dataclasses import dataclass
 import polars as pl
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from .base import Operations
+from .dictionary import label_keys
+from .statistics import stat_expr
+
+STANDARDIZE_STATS = {
+    "z-score": ("mean", "std"),
+    "min-max": ("min", "max"),
+    "robust": ("median", "q25", "q75"),
+}
 
 @dataclass
 class Standardize(Operations):
@@ -9,73 +17,116 @@ class Standardize(Operations):
     strategy: str = "z-score"
     inplace: bool = False
 
-    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
-        schema = result.collect_schema()
-        
+    def _columns(self, schema: pl.Schema) -> List[str]:
         if self.columns is None:
-            self.columns = []
-            for col in schema.keys():
-                if schema[col] != pl.String:
-                    self.columns.append(col)
+            return [col for col in schema.keys() if schema[col] != pl.String]
+        return self.columns
+
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        stats = STANDARDIZE_STATS.get(self.strategy, ())
+        return [(column, stat) for column in self._columns(schema) if column in schema 
+                for stat in stats]
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "numeric" for column in self._columns(schema)}
+
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        expressions = []
+        for column in self._columns(schema):
+            if column not in schema:
+                raise ValueError(f"Column: {column} is not present in the CSV")
+
+            # in Float64, narrowed integers (see the dtype optimizer) would
+            # overflow subtracting their own minimum
+            col = pl.col(column).cast(pl.Float64)
+            stat = lambda name: stat_expr(column, name, self.stats).cast(pl.Float64)
+            alias = column if self.inplace else f"{column}_{self.strategy}"
+            match self.strategy:
+                case "z-score":
+                    expression = ((col - stat("mean")) / stat("std")).alias(alias)
+                case "min-max":
+                    rng_min, rng_max = (0,1) 
+                    expression = (
+                        (col - stat("min")) / (stat("max") - stat("min")) * 
+                        (rng_max - rng_min) + rng_min
+                    ).alias(alias)
+                case "robust":
+                    q1 = stat("q25")
+                    q3 = stat("q75")
+
+                    expression = ((col - stat("median")) / (q3 - q1)).alias(alias)
+                case _:
+                    raise ValueError(f"Unknown Strategy: {self.strategy}")
+            expressions.append(expression)
+        return expressions
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         try:
-            for column in self.columns:
-                if column not in schema:
-                    raise ValueError(f"Column: {column} is not present in the CSV")
-
-                col = pl.col(column)
-                alias = column if self.inplace else f"{column}_{self.strategy}"
-                match self.strategy:
-                    case "z-score":
-                        expression = ((col - col.mean()) / col.std()).alias(alias)
-                    case "min-max":
-                        rng_min, rng_max = (0,1) 
-                        expression = (
-                            (col - col.min()) / (col.max() - col.min()) * 
-                            (rng_max - rng_min) + rng_min
-                        ).alias(alias)
-                    case "robust":
-                        q1 = col.quantile(0.25)
-                        q3 = col.quantile(0.75)
-
-                        expression = ((col - col.median()) / (q3 - q1)).alias(alias)
-                    case _:
-                        raise ValueError(f"Unknown Strategy: {self.strategy}")
-                result = result.with_columns(expression)
+            return result.with_columns(self.expressions(result.collect_schema()))
         except Exception as e:
             print(f"Failed to standardize due due to the following error: {e}")
         return result 
 
+    def is_row_local(self) -> bool:
+        return self.stats is not None
+
 @dataclass
 class StringNormalize(Operations):
     columns: Optional[List[str]]
     strategy: str = "lower"
 
-    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
-        schema = result.collect_schema()
+    def _columns(self, schema: pl.Schema) -> List[str]:
         if self.columns is None:
-            self.columns = []
-            for col in schema.keys():
-                if schema[col] == pl.String:
-                    self.columns.append(col) 
+            return [col for col in schema.keys() if schema[col] in (pl.String, pl.Categorical)]
+        return self.columns
+
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        if self.strategy != "label encoding":
+            return []
+        return [(column, "categories") for column in self._columns(schema) if column in schema]
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        kind = "any" if self.strategy == "label encoding" else "string"
+        return {column: kind for column in self._columns(schema)}
 
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        expressions = []
+        for column in self._columns(schema):
+            if column not in schema:
+                raise ValueError(f"Column: {column} is not present in the CSV")
+
+            # categorical columns go through their string values and come back categorical
+            categorical = schema[column] in (pl.Categorical, pl.Enum)
+            col = pl.col(column).cast(pl.String) if categorical else pl.col(column)
+            back = (lambda expr: expr.cast(pl.Categorical)) if categorical else (lambda expr: expr)
+            match self.strategy:
+                case "lower":
+                    expression = back(col.str.to_lowercase())
+                case "upper":
+                    expression = back(col.str.to_uppercase())
+                case "strip":
+                    expression = back(col.str.strip_chars())
+                case "label encoding" if self.stats is not None and (column, "categories") in self.stats:
+                    # keyed as text, the way a label dictionary stores them
+                    categories = label_keys(self.stats.get(column, "categories"))
+                    expression = col.cast(pl.String).replace_strict(categories, list(range(len(categories))),
+                                                                    default = None, return_dtype = pl.UInt32)
+                case "label encoding":
+                    # same codes as the sorted categories, computed in place
+                    expression = (col.rank("dense") - 1).cast(pl.UInt32)
+                case _:
+                    raise ValueError(f"Strategy {self.strategy} not found")
+            expressions.append(expression)
+        return expressions
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         try:
-            for column in self.columns:
-                if column not in schema:
-                    raise ValueError(f"Column: {column} is not present in the CSV")
-
-                col = pl.col(column)
-                match self.strategy:
-                    case "lower":
-                        expression = col.str.to_lowercase()
-                    case "upper":
-                        expression = col.str.to_uppercase()
-                    case "strip":
-                        expression = col.str.strip_chars()
-                    case "label encoding":
-                        expression = col.cast(pl.Categorical).to_physical()
-                    case _:
-                        raise ValueError(f"Strategy {self.strategy} not found")
-                result = result.with_columns(expression)
+            return result.with_columns(self.expressions(result.collect_schema()))
         except Exception as e:
             print(f"String Normalization failed due to : {e}")
         return result
+
+    def is_row_local(self) -> bool:
+        if self.strategy != "label encoding":
+            return True
+        return self.stats is not None and all((column, "categories") in self.stats for column in self.columns or [])
@@ -1,67 +1,256 @@
-import ast
+from datetime import date, datetime
+from functools import lru_cache
 import polars as pl
 import re
+from typing import List, NamedTuple, Optional, Tuple
 
-class FilterParser:
-    def __init__(self):
-        self.OPERATORS = {
-            ' gt ' : ' > ',
-            ' lt ' : ' < ',
-            ' gte ': ' >= ',
-            ' lte ': ' <= ',
-            ' eq ': ' == ',
-            ' neq ': ' != ',
-        }
-
-    def create_plr_expr(self, expr):
-        if isinstance(expr, ast.Compare):
-            left = self.create_plr_expr(expr.left)
-            op = expr.ops[0]
-            
-            right = self.create_plr_expr(expr.comparators[0])
-
-            if isinstance(op, ast.Gt): return left > right
-            if isinstance(op, ast.Lt): return left < right
-            if isinstance(op, ast.GtE): return left >= right
-            if isinstance(op, ast.LtE): return left <= right
-            if isinstance(op, ast.Eq): return left == right
-            if isinstance(op, ast.NotEq): return left != right
-
-        elif isinstance(expr, ast.BinOp):
-            left = self.create_plr_expr(expr.left)
-            right = self.create_plr_expr(expr.right)
-            if isinstance(expr.op, ast.BitAnd): return left & right
-            if isinstance(expr.op, ast.BitOr): return left | right
-
-        elif isinstance(expr, ast.Name):
-            return pl.col(expr.id)
-
-        elif isinstance(expr, ast.Constant):
-            return pl.lit(expr.value)
-
-        elif isinstance(expr, ast.Expression):
-            return self.create_plr_expr(expr.body)
-
-        raise ValueError(f"Invalid operation: {type(expr)}")
-
-    def map_operators(self, query_str):
-        for word, symbol in self.OPERATORS.items():
-            query_str = query_str.replace(word, symbol)
-        return query_str
-
-    def parse(self,query_str):
-        query_str = self.map_operators(query_str)
-        query_str = re.sub(
-            r'(==|!=)\s*([A-Za-z][A-Za-z0-9_]*)',
-            lambda m: f'{m.group(1)} \'{m.group(2)}\'',
-            query_str
-        )
-
-        if '(' not in query_str:
-            query = re.sub(r'(\w+\s*(?:==|!=|>=|<=|>|<)\s*(?:\'[^\']*?\'|"[^"]*?"|\d+\.\d+|\d+|\w+))', r'(\1)', query_str)
+TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<date>\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2})?)?)(?![\w.])
+      | (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)(?![\w.])
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<column>`[^`]+`)
+      | (?P<op>>=|<=|==|!=|<>|>|<|=|&|\||!)
+      | (?P<punct>[(),\[\]])
+      | (?P<word>[^\W\d][\w.\-]*|\w[\w.\-]*)
+    )""", re.VERBOSE)
+
+COMPARISONS = {
+    'gt': '>', '>': '>',
+    'lt': '<', '<': '<',
+    'gte': '>=', '>=': '>=',
+    'lte': '<=', '<=': '<=',
+    'eq': '==', '==': '==', '=': '==',
+    'neq': '!=', '!=': '!=', '<>': '!=',
+}
+
+COMPARE = {
+    '>': lambda left, right: left > right,
+    '<': lambda left, right: left < right,
+    '>=': lambda left, right: left >= right,
+    '<=': lambda left, right: left <= right,
+    '==': lambda left, right: left == right,
+    '!=': lambda left, right: left != right,
+}
+
+# connective -> (precedence, combine), higher binds tighter
+CONNECTIVES = {
+    'or': (1, lambda left, right: left | right),
+    '|': (1, lambda left, right: left | right),
+    'and': (2, lambda left, right: left & right),
+    '&': (2, lambda left, right: left & right),
+}
+
+# the cast is free on String columns and lets categorical ones match too
+STRING_PREDICATES = {
+    'contains': lambda col, value: col.cast(pl.String).str.contains(value, literal = True),
+    'startswith': lambda col, value: col.cast(pl.String).str.starts_with(value),
+    'endswith': lambda col, value: col.cast(pl.String).str.ends_with(value),
+}
+
+LITERALS = {'true': True, 'false': False, 'null': None}
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    pos: int
+
+    @property
+    def key(self) -> str:
+        return self.text.lower() if self.kind in {'word', 'op', 'punct'} else self.text
+
+def tokenize(query_str: str) -> List[Token]:
+    tokens, pos = [], 0
+    query_str = query_str.rstrip()
+    while pos < len(query_str):
+        match = TOKEN.match(query_str, pos)
+        if match is None or match.lastgroup is None:
+            raise ValueError(f"Unexpected character {query_str[pos:].strip()[:1]!r} at position {pos} in filter: {query_str}")
+        tokens.append(Token(match.lastgroup, match.group(match.lastgroup), match.start(match.lastgroup)))
+        pos = match.end()
+    return tokens
+
+def _unquote(text: str) -> str:
+    return re.sub(r"\\(.)", r"\1", text[1:-1])
+
+# Precedence climbing over the connectives, each operand being a single
+# predicate: a comparison, in / between / is null / string match, a bare
+# boolean column or a bracketed sub-expression, optionally negated with not.
+class _Parser:
+    def __init__(self, query_str: str, schema: Optional[dict]):
+        self.query_str = query_str
+        self.tokens = tokenize(query_str)
+        self.schema = schema
+        self.pos = 0
+        # dtype of the column on the left of the predicate being parsed
+        self.left_dtype = None
+
+    def error(self, message: str) -> ValueError:
+        token = self.peek()
+        where = f"at {token.text!r} (position {token.pos})" if token else "at end of input"
+        return ValueError(f"{message} {where} in filter: {self.query_str}")
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise self.error("Unexpected end of filter")
+        self.pos += 1
+        return token
+
+    def accept(self, *keys: str) -> Optional[Token]:
+        token = self.peek()
+        if token is not None and token.kind != 'string' and token.key in keys:
+            self.pos += 1
+            return token
+        return None
+
+    def expect(self, *keys: str) -> Token:
+        token = self.accept(*keys)
+        if token is None:
+            raise self.error(f"Expected {' or '.join(keys)}")
+        return token
+
+    def parse(self) -> pl.Expr:
+        if not self.tokens:
+            raise ValueError("Empty filter expression")
+        expr = self.expression()
+        if self.peek() is not None:
+            raise self.error("Unexpected token")
+        return expr
+
+    def expression(self, min_prec: int = 1) -> pl.Expr:
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token.kind == 'string' or token.key not in CONNECTIVES:
+                return left
+            prec, combine = CONNECTIVES[token.key]
+            if prec < min_prec:
+                return left
+            self.advance()
+            left = combine(left, self.expression(prec + 1))
+
+    def unary(self) -> pl.Expr:
+        if self.accept('not', '!'):
+            return ~self.unary()
+        if self.accept('('):
+            expr = self.expression()
+            self.expect(')')
+            return expr
+        return self.predicate()
+
+    def predicate(self) -> pl.Expr:
+        self.left_dtype = None
+        left = self.operand()
+        token = self.peek()
+        if token is not None and token.kind != 'string' and token.key in COMPARISONS:
+            self.advance()
+            op = COMPARISONS[token.key]
+            return COMPARE[op](left, self.right_operand(op))
+
+        negate = self.accept('not') is not None
+        if self.accept('in'):
+            expr = left.is_in([self.typed(value) for value in self.value_list()])
+        elif self.accept('between'):
+            low = self.typed(self.value())
+            self.expect('and')
+            expr = left.is_between(pl.lit(low), pl.lit(self.typed(self.value())))
+        elif self.accept('is'):
+            negate ^= self.accept('not') is not None
+            kind = self.expect('null', 'nan').key
+            expr = left.is_null() if kind == 'null' else left.is_nan()
+        elif match := self.accept(*STRING_PREDICATES):
+            value = self.value()
+            expr = STRING_PREDICATES[match.key](left, str(value))
+        elif negate:
+            raise self.error("Expected in, between, contains, startswith or endswith after not")
         else:
-            query = query_str
-        query = query.replace(" and ", " & ").replace(" or ", " | ")
-        tree = ast.parse(query, mode='eval')
-        return self.create_plr_expr(tree)
+            return left
+        return ~expr if negate else expr
+
+    def column(self, name: str) -> pl.Expr:
+        if self.schema is not None and name not in self.schema:
+            raise ValueError(f"Column {name!r} in filter is not present in the table: {self.query_str}")
+        if self.schema is not None and self.left_dtype is None:
+            self.left_dtype = self.schema[name]
+        return pl.col(name)
+
+    def typed(self, value):
+        # text compared with a date column (parsed by the dtype optimizer or
+        # cast in the script) is read as an ISO date
+        if isinstance(value, str) and self.left_dtype == pl.Date:
+            return date.fromisoformat(value)
+        if isinstance(value, str) and isinstance(self.left_dtype, pl.Datetime):
+            return datetime.fromisoformat(value)
+        return value
+
+    def operand(self) -> pl.Expr:
+        token = self.advance()
+        match token.kind:
+            case 'column':
+                return self.column(token.text[1:-1])
+            case 'word' if token.key in LITERALS:
+                return pl.lit(LITERALS[token.key])
+            case 'word':
+                return self.column(token.text)
+            case 'number' | 'string' | 'date':
+                self.pos -= 1
+                return pl.lit(self.value())
+        self.pos -= 1
+        raise self.error("Expected a column or value")
+
+    def right_operand(self, op: str) -> pl.Expr:
+        # a bare word compared for equality is a string value (name eq charlie),
+        # in an ordering comparison it is a column when the table has one
+        token = self.peek()
+        if token is not None and token.kind == 'word' and token.key not in LITERALS:
+            if op not in {'==', '!='} and (self.schema is None or token.text in self.schema):
+                return self.operand()
+        if token is not None and token.kind == 'column':
+            return self.operand()
+        return pl.lit(self.typed(self.value()))
+
+    def value(self):
+        token = self.advance()
+        match token.kind:
+            case 'number':
+                return float(token.text) if any(c in token.text for c in '.eE') else int(token.text)
+            case 'string':
+                return _unquote(token.text)
+            case 'date':
+                return token.text
+            case 'word':
+                return LITERALS.get(token.key, token.text)
+        self.pos -= 1
+        raise self.error("Expected a value")
+
+    def value_list(self) -> list:
+        closing = ')' if self.expect('(', '[').key == '(' else ']'
+        values = [self.value()]
+        while self.accept(','):
+            values.append(self.value())
+        self.expect(closing)
+        return values
+
+@lru_cache(maxsize = 512)
+def _parse(query_str: str, schema: Optional[Tuple[Tuple[str, pl.DataType], ...]]) -> pl.Expr:
+    return _Parser(query_str, dict(schema) if schema is not None else None).parse()
+
+class FilterParser:
+    OPERATORS = COMPARISONS
+
+    # Parsed expressions are cached on (expression, schema) so a filter is
+    # parsed once however often the plan gets rebuilt.
+    def parse(self, query_str: str, schema: Optional[pl.Schema] = None) -> pl.Expr:
+        return _parse(query_str.strip(), tuple(schema.items()) if schema is not None else None)
+
+    @staticmethod
+    def cache_info():
+        return _parse.cache_info()
 
+    @staticmethod
+    def clear_cache():
+        _parse.cache_clear()
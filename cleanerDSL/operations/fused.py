@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+import polars as pl
+from typing import List
+from .base import Operations
+
+@dataclass
+class WithColumns(Operations):
+    exprs: List[pl.Expr] = field(repr = False)
+    sources: List[Operations] = field(default_factory = list)
+
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        return self.exprs
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
+        return result.with_columns(self.exprs)
+
+    def streaming_blockers(self) -> List[str]:
+        return [reason for op in self.sources for reason in op.streaming_blockers()]
+
+    def is_row_local(self) -> bool:
+        return all(op.is_row_local() for op in self.sources)
+
+@dataclass
+class FilterRows(Operations):
+    condition: pl.Expr = field(repr = False)
+    sources: List[Operations] = field(default_factory = list)
+
+    def predicate(self, schema: pl.Schema) -> pl.Expr:
+        return self.condition
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
+        return result.filter(self.condition)
+
+    def streaming_blockers(self) -> List[str]:
+        return [reason for op in self.sources for reason in op.streaming_blockers()]
+
+    def is_row_local(self) -> bool:
+        return all(op.is_row_local() for op in self.sources)
@@ -0,0 +1,148 @@
+import math
+import polars as pl
+from typing import Optional
+
+EPS = 2.220446049250313e-16
+GRID_POINTS = 17
+TOLERANCE = 1.48e-08
+MAX_EXPANSIONS = 8
+
+def yeojohnson_expr(col: pl.Expr, lmbda: float) -> pl.Expr:
+    col = col.cast(pl.Float64)
+    if abs(lmbda) < EPS:
+        positive = col.log1p()
+    else:
+        positive = ((col + 1) ** lmbda - 1) / lmbda
+    if abs(lmbda - 2) < EPS:
+        negative = -(-col).log1p()
+    else:
+        negative = -((1 - col) ** (2 - lmbda) - 1) / (2 - lmbda)
+    return pl.when(col >= 0).then(positive).otherwise(negative)
+
+def boxcox_expr(col: pl.Expr, lmbda: float) -> pl.Expr:
+    col = col.cast(pl.Float64)
+    if abs(lmbda) < EPS:
+        transformed = col.log()
+    else:
+        transformed = (col ** lmbda - 1) / lmbda
+    return pl.when(col > 0).then(transformed)
+
+TRANSFORMS = {
+    "yeojohnson": yeojohnson_expr,
+    "boxcox": boxcox_expr,
+}
+
+# The transform shifted by 1 / lambda, which leaves the variance alone. For a
+# strongly negative lambda the powers are tiny and subtracting 1 from them
+# would round every value to the same number.
+def _shifted_expr(method: str, col: pl.Expr, lmbda: float) -> pl.Expr:
+    if abs(lmbda) < EPS:
+        return TRANSFORMS[method](col, lmbda)
+    col = col.cast(pl.Float64)
+    if method == "yeojohnson":
+        return pl.when(col >= 0).then((col + 1) ** lmbda / lmbda).otherwise(yeojohnson_expr(col, lmbda) + 1 / lmbda)
+    return col ** lmbda / lmbda
+
+def _log_likelihood(method: str, lmbda: float, n: int) -> pl.Expr:
+    x = pl.col("x")
+    variance = _shifted_expr(method, x, lmbda).var(ddof = 0)
+    if method == "yeojohnson":
+        jacobian = (x.sign() * x.abs().log1p()).sum()
+    else:
+        jacobian = x.log().sum()
+    return -n / 2 * variance.log() + (lmbda - 1) * jacobian
+
+def _score(frame: pl.DataFrame, method: str, lambdas) -> list:
+    row = frame.select([
+        _log_likelihood(method, lmbda, frame.height).alias(f"{idx}") 
+        for idx, lmbda in enumerate(lambdas)
+    ]).row(0)
+    # a variance that underflowed to zero scores +inf, not a better fit
+    return [score if score is not None and math.isfinite(score) else float("-inf") for score in row]
+
+def _bracket(frame: pl.DataFrame, method: str):
+    lo, hi = -2.0, 2.0
+    for _ in range(MAX_EXPANSIONS):
+        step = (hi - lo) / (GRID_POINTS - 1)
+        grid = [lo + step * idx for idx in range(GRID_POINTS)]
+        scores = _score(frame, method, grid)
+        best = max(range(GRID_POINTS), key = lambda idx: scores[idx])
+        if best == 0:
+            lo, hi = lo - (hi - lo), lo + step
+        elif best == GRID_POINTS - 1:
+            lo, hi = hi - step, hi + (hi - lo)
+        else:
+            return grid[best - 1], grid[best], grid[best + 1]
+    return grid[best - 1 if best else 0], grid[best], grid[best + 1 if best < GRID_POINTS - 1 else best]
+
+def _brent(f, a: float, x: float, b: float, tol: float = TOLERANCE, max_iter: int = 100) -> float:
+    golden = 0.3819660
+    w = v = x
+    fw = fv = fx = f(x)
+    d = e = 0.0
+    for _ in range(max_iter):
+        mid = (a + b) / 2
+        tol1 = tol * abs(x) + 1e-11
+        tol2 = 2 * tol1
+        if abs(x - mid) <= tol2 - (b - a) / 2:
+            break
+        if abs(e) > tol1:
+            r = (x - w) * (fx - fv)
+            q = (x - v) * (fx - fw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            if abs(p) >= abs(q * e / 2) or p <= q * (a - x) or p >= q * (b - x):
+                e = (a if x >= mid else b) - x
+                d = golden * e
+            else:
+                e, d = d, p / q
+                if (x + d) - a < tol2 or b - (x + d) < tol2:
+                    d = tol1 if mid >= x else -tol1
+        else:
+            e = (a if x >= mid else b) - x
+            d = golden * e
+        u = x + (d if abs(d) >= tol1 else (tol1 if d > 0 else -tol1))
+        fu = f(u)
+        if fu <= fx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            v, w, x = w, x, u
+            fv, fw, fx = fw, fx, fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v, w = w, u
+                fv, fw = fw, fu
+            elif fu <= fv or v == x or v == w:
+                v, fv = u, fu
+    return x
+
+# Maximum likelihood estimate of the power transform lambda. A grid of
+# candidates is scored in a single select to bracket the optimum (widening
+# the interval while it sits on an edge), then Brent's method refines it.
+def estimate_lambda(values: pl.Series, method: str = "yeojohnson",
+                    sample_size: Optional[int] = None, seed: int = 0) -> float:
+    values = values.cast(pl.Float64).drop_nulls().drop_nans()
+    if sample_size is not None and len(values) > sample_size:
+        values = values.sample(sample_size, seed = seed)
+    if len(values) == 0:
+        raise ValueError("Cannot estimate lambda of an empty column")
+    if method == "boxcox" and values.min() <= 0:
+        raise ValueError("Box-Cox transformation requires strictly positive data")
+
+    frame = values.to_frame("x")
+    lo, best, hi = _bracket(frame, method)
+    return _brent(lambda lmbda: -_score(frame, method, [lmbda])[0], lo, best, hi)
+
+def power_transform(values: pl.Series, method: str = "yeojohnson",
+                    sample_size: Optional[int] = None) -> pl.Series:
+    lmbda = estimate_lambda(values, method, sample_size)
+    return values.to_frame("x").select(TRANSFORMS[method](pl.col("x"), lmbda)).to_series()
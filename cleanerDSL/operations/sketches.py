@@ -0,0 +1,137 @@
+from dataclasses import dataclass, field
+import math
+import numpy as np
+import polars as pl
+from typing import Dict, Iterable, Tuple
+from .statistics import collect_batches
+
+# statistics the sketches can stand in for, with the quantile they estimate
+QUANTILES = {"median": 0.5, "q25": 0.25, "q75": 0.75}
+SKETCHED = set(QUANTILES) | {"mode"}
+
+@dataclass(frozen = True)
+class SketchOptions:
+    # quantiles are within relative_error of a true value at that rank
+    relative_error: float = 0.01
+    # the mode is exact when its count exceeds rows / (heavy_hitters + 1)
+    heavy_hitters: int = 1024
+    # values closer to zero than this are counted as zero
+    min_value: float = 1e-9
+
+# Log-bucketed quantile sketch (the DDSketch construction): a value x lands
+# in bucket ceil(log_gamma |x|), so every value in a bucket is within
+# relative_error of the bucket's representative. Buckets are plain counters,
+# sketches of different chunks merge by adding them.
+@dataclass
+class QuantileSketch:
+    options: SketchOptions = field(default_factory = SketchOptions)
+    positive: Dict[int, int] = field(default_factory = dict)
+    negative: Dict[int, int] = field(default_factory = dict)
+    zeros: int = 0
+    count: int = 0
+
+    @property
+    def gamma(self) -> float:
+        return (1 + self.options.relative_error) / (1 - self.options.relative_error)
+
+    def _bucket(self, store: Dict[int, int], values: np.ndarray):
+        indices = np.ceil(np.log(values) / math.log(self.gamma)).astype(np.int64)
+        for index, count in zip(*np.unique(indices, return_counts = True)):
+            store[int(index)] = store.get(int(index), 0) + int(count)
+
+    def add(self, values: np.ndarray) -> "QuantileSketch":
+        values = np.asarray(values, dtype = np.float64)
+        values = values[~np.isnan(values)]
+        tiny = np.abs(values) < self.options.min_value
+        self.zeros += int(tiny.sum())
+        self._bucket(self.positive, values[~tiny & (values > 0)])
+        self._bucket(self.negative, -values[~tiny & (values < 0)])
+        self.count += len(values)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for store, incoming in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in incoming.items():
+                store[index] = store.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = round(q * (self.count - 1))
+        seen = 0
+        for index in sorted(self.negative, reverse = True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+# Misra-Gries heavy hitters: at most `heavy_hitters` counters, each chunk is
+# counted exactly and the counters are then cut back by the count of the
+# first one that does not fit. Counts are underestimated by at most
+# rows / (heavy_hitters + 1), so a value more frequent than that is kept.
+@dataclass
+class HeavyHitters:
+    options: SketchOptions = field(default_factory = SketchOptions)
+    counters: Dict[object, int] = field(default_factory = dict)
+    count: int = 0
+
+    def _reduce(self):
+        if len(self.counters) <= self.options.heavy_hitters:
+            return
+        cut = sorted(self.counters.values(), reverse = True)[self.options.heavy_hitters]
+        self.counters = {value: count - cut for value, count in self.counters.items() if count > cut}
+
+    def add(self, values: pl.Series) -> "HeavyHitters":
+        values = values.drop_nulls()
+        for value, count in values.value_counts().iter_rows():
+            self.counters[value] = self.counters.get(value, 0) + count
+        self.count += len(values)
+        self._reduce()
+        return self
+
+    def merge(self, other: "HeavyHitters") -> "HeavyHitters":
+        for value, count in other.counters.items():
+            self.counters[value] = self.counters.get(value, 0) + count
+        self.count += other.count
+        self._reduce()
+        return self
+
+    def mode(self):
+        if not self.counters:
+            return None
+        return max(self.counters.items(), key = lambda item: item[1])[0]
+
+    def error_bound(self) -> int:
+        return self.count // (self.options.heavy_hitters + 1)
+
+# One streaming pass over the columns the requests need: every batch feeds
+# the sketches of its columns, so memory stays at one batch plus the sketches
+# whatever the number of rows.
+def sketch_stats(result: pl.LazyFrame, requests: Iterable[Tuple[str, str]],
+                 options: SketchOptions) -> Dict[Tuple[str, str], object]:
+    requests = list(requests)
+    columns = list(dict.fromkeys(column for column, _ in requests))
+    quantiles = {column: QuantileSketch(options) for column, stat in requests if stat in QUANTILES}
+    modes = {column: HeavyHitters(options) for column, stat in requests if stat == "mode"}
+    for batch in collect_batches(result.select(columns)):
+        for column, sketch in quantiles.items():
+            sketch.add(batch[column].drop_nulls().cast(pl.Float64).to_numpy())
+        for column, sketch in modes.items():
+            sketch.add(batch[column])
+    return {
+        (column, stat): modes[column].mode() if stat == "mode" else quantiles[column].quantile(QUANTILES[stat])
+        for column, stat in requests
+    }
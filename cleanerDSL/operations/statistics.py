@@ -0,0 +1,338 @@
+import ast
+import asyncio
+from dataclasses import replace
+import json
+import polars as pl
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .powertransform import estimate_lambda
+
+ARTIFACT_VERSION = 1
+
+# power transform lambdas are requested as "<method>" or "<method>:<sample size>"
+def _lambda_stat(method: str, sample_size: str):
+    sample_size = int(sample_size) if sample_size else None
+    estimate = lambda values: pl.Series([estimate_lambda(values, method, sample_size)])
+    return lambda col: col.map_batches(estimate, returns_scalar = True, return_dtype = pl.Float64)
+
+STATISTICS = {
+    "mean": lambda col: col.mean(),
+    "std": lambda col: col.std(),
+    "min": lambda col: col.min(),
+    "max": lambda col: col.max(),
+    "median": lambda col: col.median(),
+    "q25": lambda col: col.quantile(0.25),
+    "q75": lambda col: col.quantile(0.75),
+    "mode": lambda col: col.mode().first(),
+    # median absolute deviation
+    "mad": lambda col: (col - col.median()).abs().median(),
+    # sorted, so label codes do not depend on the order rows are read in
+    "categories": lambda col: col.drop_nulls().unique().sort().implode(),
+}
+
+def _statistic(stat: str):
+    name, _, arg = stat.partition(":")
+    if name in {"yeojohnson", "boxcox"}:
+        return _lambda_stat(name, arg)
+    return STATISTICS[stat]
+
+def _temporal(dtype: pl.DataType) -> bool:
+    return dtype.is_temporal() or (isinstance(dtype, pl.List) and _temporal(dtype.inner))
+
+def _parse_dtype(node) -> pl.DataType:
+    # a dtype as polars prints it, e.g. Datetime(time_unit='us', time_zone='UTC')
+    # or List(Date), rebuilt from polars' own classes without eval
+    if isinstance(node, str):
+        node = ast.parse(node, mode = "eval").body
+    name = node.func if isinstance(node, ast.Call) else node
+    dtype = getattr(pl, name.id, None) if isinstance(name, ast.Name) else None
+    if not (isinstance(dtype, type) and issubclass(dtype, pl.DataType)):
+        raise ValueError(f"Unknown dtype in statistics artifact: {ast.unparse(node)}")
+    if not isinstance(node, ast.Call):
+        return dtype
+    return dtype(*[_parse_dtype(arg) for arg in node.args],
+                 **{keyword.arg: ast.literal_eval(keyword.value) for keyword in node.keywords})
+
+def _encode(value) -> list:
+    # dates, times and durations are kept as their physical integers with
+    # the dtype next to them, JSON would otherwise turn them into text
+    try:
+        series = pl.Series([value])
+    except Exception:
+        return [value]
+    if not _temporal(series.dtype):
+        return [value]
+    return [series.to_physical().to_list()[0], str(series.dtype)]
+
+def _decode(value, dtype: Optional[str] = None):
+    if dtype is None:
+        return value
+    return pl.Series([value]).cast(_parse_dtype(dtype)).to_list()[0]
+
+class StatsStore:
+    def __init__(self, values: Optional[Dict[Tuple[str, str], object]] = None):
+        self.values = dict(values or {})
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self.values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, column: str, stat: str):
+        return self.values[(column, stat)]
+
+    def lit(self, column: str, stat: str) -> pl.Expr:
+        return pl.lit(self.get(column, stat))
+
+    def subset(self, keys: Iterable[Tuple[str, str]]) -> "StatsStore":
+        return StatsStore({key: self.values[key] for key in keys})
+
+    def to_list(self) -> List[list]:
+        # [column, stat, value] or, for temporal values, [column, stat, value, dtype]
+        return [[column, stat, *_encode(value)] for (column, stat), value in self.values.items()]
+
+    @classmethod
+    def from_list(cls, entries: List[list]) -> "StatsStore":
+        return cls({(column, stat): _decode(*value) for column, stat, *value in entries})
+
+def stat_expr(column: str, stat: str, stats: Optional[StatsStore] = None) -> pl.Expr:
+    if stats is not None and (column, stat) in stats:
+        return stats.lit(column, stat)
+    return _statistic(stat)(pl.col(column))
+
+def _split(requests: Iterable[Tuple[str, str]], sketch) -> Tuple[List, List]:
+    # with SketchOptions, quantiles and modes come from mergeable sketches
+    # built in a streaming pass instead of a sort or hash of the column
+    requests = list(dict.fromkeys(requests))
+    if sketch is None:
+        return requests, []
+    from .sketches import SKETCHED
+    return ([request for request in requests if request[1] not in SKETCHED],
+            [request for request in requests if request[1] in SKETCHED])
+
+def _aggregate(result: pl.LazyFrame, requests: List[Tuple[str, str]]) -> pl.LazyFrame:
+    return result.select([
+        _statistic(stat)(pl.col(column)).alias(f"{idx}")
+        for idx, (column, stat) in enumerate(requests)
+    ])
+
+def _values(requests: List[Tuple[str, str]], row: tuple) -> Dict[Tuple[str, str], object]:
+    return {
+        key: value.to_list() if isinstance(value, pl.Series) else value
+        for key, value in zip(requests, row)
+    }
+
+def compute_stats(result: pl.LazyFrame, requests: Iterable[Tuple[str, str]], sketch = None) -> StatsStore:
+    exact, approximate = _split(requests, sketch)
+    values = _values(exact, _aggregate(result, exact).collect().row(0)) if exact else {}
+    if approximate:
+        from .sketches import sketch_stats
+        values.update(sketch_stats(result, approximate, sketch))
+    return StatsStore(values)
+
+def compute_stats_all(steps: List[Tuple[pl.LazyFrame, List[Tuple[str, str]], object]]) -> List:
+    # compute_stats for several (frame, requests, sketch) at once: the exact
+    # aggregates run together in one pl.collect_all, a failure there reruns
+    # them one by one so each step gets its store or its own exception
+    splits = [_split(requests, sketch) for _, requests, sketch in steps]
+    queries = {idx: _aggregate(result, exact)
+               for idx, ((result, _, _), (exact, _)) in enumerate(zip(steps, splits)) if exact}
+    try:
+        frames = dict(zip(queries, pl.collect_all(list(queries.values()))))
+    except Exception:
+        frames = {}
+        for idx, query in queries.items():
+            try:
+                frames[idx] = query.collect()
+            except Exception as e:
+                frames[idx] = e
+    stores = []
+    for idx, ((result, _, sketch), (exact, approximate)) in enumerate(zip(steps, splits)):
+        try:
+            if isinstance(frames.get(idx), Exception):
+                raise frames[idx]
+            values = _values(exact, frames[idx].row(0)) if exact else {}
+            if approximate:
+                from .sketches import sketch_stats
+                values.update(sketch_stats(result, approximate, sketch))
+            stores.append(StatsStore(values))
+        except Exception as e:
+            stores.append(e)
+    return stores
+
+def collect_batches(result: pl.LazyFrame, rows: Optional[int] = None) -> Iterator[pl.DataFrame]:
+    # the result in batches on the streaming engine, or in one frame where
+    # polars has no collect_batches. Closing the generator drops the batch
+    # iterator, which stops the query
+    if not hasattr(result, "collect_batches"):
+        yield result.collect()
+        return
+    batches = result.collect_batches(chunk_size = rows)
+    try:
+        yield from batches
+    finally:
+        del batches
+
+async def collect_async(query: pl.LazyFrame, engine: str = "auto") -> pl.DataFrame:
+    # a running polars query can not be interrupted: a cancelled caller
+    # returns at once and the result is dropped when the query finishes
+    running = asyncio.ensure_future(query.collect_async(engine = engine))
+    running.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return await asyncio.shield(running)
+
+async def compute_stats_async(result: pl.LazyFrame, requests: Iterable[Tuple[str, str]], sketch = None) -> StatsStore:
+    exact, approximate = _split(requests, sketch)
+    values = _values(exact, (await collect_async(_aggregate(result, exact))).row(0)) if exact else {}
+    if approximate:
+        # the sketches are fed from python, off the event loop
+        from .sketches import sketch_stats
+        values.update(await asyncio.to_thread(sketch_stats, result, approximate, sketch))
+    return StatsStore(values)
+
+def _bind(operations: List, result: pl.LazyFrame):
+    # Splits the operations into segments whose statistics can all be read
+    # from the frame at the start of the segment: a segment ends when an
+    # operation needs a column rewritten earlier in the segment or when rows
+    # were dropped or renamed in between. Each segment costs one aggregate pass.
+    # Yields (frame, requests) per pass and is sent the StatsStore back, so
+    # the same walk serves bind_statistics and bind_statistics_async.
+    bound = []
+    passes = 0
+    idx = 0
+    schema = result.collect_schema()
+    while idx < len(operations):
+        segment, requests = [], []
+        dirty, barrier = set(), False
+        while idx < len(operations):
+            op = operations[idx]
+            try:
+                # statistics bound earlier (from a label dictionary) are kept
+                wanted = [request for request in op.required_stats(schema)
+                          if op.stats is None or request not in op.stats]
+            except Exception:
+                wanted = []
+            if segment and wanted and (barrier or any(column in dirty for column, _ in wanted)):
+                break
+            segment.append((op, wanted))
+            requests.extend(wanted)
+            idx += 1
+
+            try:
+                exprs = op.expressions(schema)
+                if exprs is not None:
+                    dirty |= {e.meta.output_name() for e in exprs}
+                    schema = pl.LazyFrame(schema = schema).with_columns(exprs).collect_schema()
+                    continue
+                if op.predicate(schema) is None:
+                    schema = op.clean(pl.LazyFrame(schema = schema)).collect_schema()
+            except Exception:
+                pass
+            barrier = True
+
+        store = None
+        if requests:
+            try:
+                store = yield result, requests
+                passes += 1
+            except Exception as e:
+                print(f"Failed to precompute statistics, computing them inline: {e}")
+
+        for op, wanted in segment:
+            if store is not None and wanted:
+                earlier = op.stats.values if op.stats is not None else {}
+                op = replace(op, stats = StatsStore({**earlier, **store.subset(wanted).values}))
+            bound.append(op)
+            result = op.clean(result)
+    return bound, passes
+
+def bind_statistics(operations: List, result: pl.LazyFrame, sketch = None) -> Tuple[List, int]:
+    walk = _bind(operations, result)
+    try:
+        step = next(walk)
+        while True:
+            try:
+                store = compute_stats(*step, sketch)
+            except Exception as e:
+                step = walk.throw(e)
+                continue
+            step = walk.send(store)
+    except StopIteration as done:
+        return done.value
+
+async def bind_statistics_async(operations: List, result: pl.LazyFrame, sketch = None) -> Tuple[List, int]:
+    walk = _bind(operations, result)
+    try:
+        step = next(walk)
+        while True:
+            try:
+                store = await compute_stats_async(*step, sketch)
+            except Exception as e:
+                step = walk.throw(e)
+                continue
+            step = walk.send(store)
+    except StopIteration as done:
+        return done.value
+
+def bind_statistics_all(plans: List[Tuple[List, pl.LazyFrame, object]]) -> List[Tuple[List, int]]:
+    # bind_statistics for several (operations, frame, sketch) at once, the
+    # walks advance together so each round of passes is one compute_stats_all
+    walks = [_bind(operations, result) for operations, result, _ in plans]
+    sketches = [sketch for _, _, sketch in plans]
+    bound, pending = [None] * len(walks), {}
+
+    def advance(idx: int, store = None):
+        try:
+            if isinstance(store, Exception):
+                pending[idx] = walks[idx].throw(store)
+            else:
+                pending[idx] = walks[idx].send(store)
+        except StopIteration as done:
+            pending.pop(idx, None)
+            bound[idx] = done.value
+
+    for idx in range(len(walks)):
+        advance(idx)
+    while pending:
+        steps = dict(pending)
+        stores = compute_stats_all([(*steps[idx], sketches[idx]) for idx in steps])
+        for idx, store in zip(steps, stores):
+            advance(idx, store)
+    return bound
+
+def fit_artifact(operations: List, result: pl.LazyFrame, sketch = None) -> dict:
+    bound, _ = bind_statistics(operations, result, sketch)
+    return {
+        "version": ARTIFACT_VERSION,
+        "operations": [
+            {
+                "operation": repr(op),
+                "stats": op.stats.to_list() if op.stats is not None else [],
+            }
+            for op in bound
+        ],
+    }
+
+def save_artifact(artifact: dict, path: Union[str, Path]):
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent = 2, default = str)
+
+def load_artifact(source: Union[dict, str, Path]) -> dict:
+    if isinstance(source, dict):
+        return source
+    with open(source) as f:
+        return json.load(f)
+
+def apply_artifact(operations: List, artifact: Union[dict, str, Path]) -> List:
+    artifact = load_artifact(artifact)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported statistics artifact version: {artifact.get('version')}")
+
+    fitted = artifact["operations"]
+    if [entry["operation"] for entry in fitted] != [repr(op) for op in operations]:
+        raise ValueError("Statistics artifact was fitted on a different script")
+
+    return [
+        replace(op, stats = StatsStore.from_list(entry["stats"])) if entry["stats"] else op
+        for op, entry in zip(operations, fitted)
+    ]
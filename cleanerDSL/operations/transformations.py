@@ -1,133 +1,239 @@
 from dataclasses import dataclass
 import polars as pl
-from typing import Optional, Any, List
-from scipy import stats
+from typing import Dict, Optional, Any, List, Tuple
 from .base import Operations
+from .statistics import stat_expr
+from .powertransform import TRANSFORMS, power_transform
+
+POWER_TRANSFORMS = {
+    'yeojohnson-transform': 'yeojohnson',
+    'boxcox-transform': 'boxcox',
+}
 
 @dataclass
 class Transformation(Operations):
     columns: List[str]
     strategy: str = 'log-transform'
     inplace: bool = False
+    sample_size: Optional[int] = None
+
+    def _lambda_stat(self) -> str:
+        method = POWER_TRANSFORMS[self.strategy]
+        return method if self.sample_size is None else f"{method}:{self.sample_size}"
+
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        if self.strategy not in POWER_TRANSFORMS:
+            return []
+        return [(column, self._lambda_stat()) for column in self.columns 
+                if column in schema and schema[column] != pl.String]
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "numeric" for column in self.columns}
+
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        expressions = []
+        for column in self.columns:
+            if schema[column] == pl.String:
+                raise TypeError("Transformation strategy is not compatible with a String column => cast it or do something else")
+            expression = None
+            alias = column if self.inplace else f"{column}_t"
+            match self.strategy:
+                case 'log-transform':
+                    expression = pl.col(column).log1p()
+                case 'sqrt-transform':
+                    expression = pl.col(column).sqrt()
+                case 'reciprocal-transform':
+                    expression = 1/pl.col(column).cast(pl.Float64)
+                case 'yeojohnson-transform' | 'boxcox-transform' if self.stats is not None:
+                    lmbda = self.stats.get(column, self._lambda_stat())
+                    expression = TRANSFORMS[POWER_TRANSFORMS[self.strategy]](pl.col(column), lmbda)
+                case 'yeojohnson-transform' | 'boxcox-transform':
+                    method, sample_size = POWER_TRANSFORMS[self.strategy], self.sample_size
+                    transform_func = lambda x: power_transform(x, method, sample_size)
+                    expression = pl.col(column).map_batches(transform_func, return_dtype = pl.Float64)
+                case 'square-transform':
+                    # narrow integers (see the dtype optimizer) would wrap around
+                    col = pl.col(column)
+                    if schema[column].is_integer() and schema[column] not in (pl.Int64, pl.UInt64):
+                        col = col.cast(pl.Int64)
+                    expression = col**2
+            if expression is not None:
+                expressions.append(expression.alias(alias))
+        return expressions
 
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         try:
-            schema = result.collect_schema()
-            for column in self.columns:
-                if schema[column] == pl.String:
-                    raise TypeError("Transformation strategy is not compatible with a String column => cast it or do something else")
-                expression = None
-                alias = column if self.inplace else f"{column}_t"
-                match self.strategy:
-                    case 'log-transform':
-                        expression = pl.col(column).log1p()
-                    case 'sqrt-transform':
-                        expression = pl.col(column).sqrt()
-                    case 'reciprocal-transform':
-                        expression = 1/pl.col(column)
-                    case 'yeojohnson-transform':
-                        transform_func = lambda x: pl.Series(stats.yeojohnson(x.to_numpy())[0])
-                        expression = pl.col(column).map_batches(transform_func)
-                    case 'square-transform':
-                        expression = pl.col(column)**2
-                if expression is not None:
-                    result = result.with_columns(expression.alias(alias))
+            return result.with_columns(self.expressions(result.collect_schema()))
         except Exception as e:
             print(f"Failed to perform transformation due to the following error: {e}")
         return result 
 
+    def streaming_blockers(self) -> List[str]:
+        if self.strategy in POWER_TRANSFORMS and self.stats is None:
+            return [f"{self.strategy} estimates lambda through map_batches on the whole column"]
+        return []
+
+    def is_row_local(self) -> bool:
+        return self.strategy not in POWER_TRANSFORMS or self.stats is not None
+
 @dataclass
 class ImputeNa(Operations):
     columns: Optional[List[str]] = None
     value: Any = None
     strategy: str = 'default'
 
+    def _columns(self, schema: pl.Schema) -> List[str]:
+        # without columns every column is filled that the strategy can fill,
+        # a mean or median only the numeric ones
+        if self.columns:
+            return self.columns
+        if self.strategy in {'mean', 'median'}:
+            return [column for column, dtype in schema.items() if dtype.is_numeric()]
+        return list(schema.keys())
+
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        if self.strategy not in {'mean', 'median', 'mode'}:
+            return []
+        return [(column, self.strategy) for column in self._columns(schema)]
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        kind = "numeric" if self.strategy in {'mean', 'median'} else "any"
+        return {column: kind for column in self._columns(schema)}
+
+    def expressions(self, schema: pl.Schema) -> List[pl.Expr]:
+        expressions = []
+        for column in self._columns(schema):
+            match self.strategy:
+                case 'default':
+                    expression = pl.col(column).fill_null(self.value)
+                case 'forward':
+                    expression = pl.col(column).fill_null(strategy = self.strategy)  
+                case 'backward':
+                    expression = pl.col(column).fill_null(strategy = self.strategy)
+                case 'mean' | 'median' | 'mode':
+                    expression = pl.col(column).fill_null(stat_expr(column, self.strategy, self.stats))
+                case _:
+                    raise ValueError("Strategy not found")
+            expressions.append(expression)
+        return expressions
+
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
-        if not self.columns:
-            self.columns = list(result.schema.keys())
         try:
-            for column in self.columns:
-                expression = None
-                match self.strategy:
-                    case 'default':
-                        expression = pl.col(column).fill_null(self.value)
-                    case 'forward':
-                        expression = pl.col(column).fill_null(strategy = self.strategy)  
-                    case 'backward':
-                        expression = pl.col(column).fill_null(strategy = self.strategy)
-                    case 'mean':
-                        expression = pl.col(column).fill_null(pl.col(column).mean())
-                    case 'median':
-                        expression = pl.col(column).fill_null(pl.col(column).median())
-                    case 'mode':
-                        expression = pl.col(column).fill_null(pl.col(column).mode().first())
-                    case _:
-                        raise ValueError("Strategy not found")
-                result = result.with_columns(expression)
+            return result.with_columns(self.expressions(result.collect_schema()))
         except Exception as e:
             print(f"Failure in null value imputation: {e}")
         return result
 
+    def streaming_blockers(self) -> List[str]:
+        if self.strategy == 'mode' and self.stats is None:
+            return ["mode() hashes the whole column before the first row is written"]
+        return []
+
+    def is_row_local(self) -> bool:
+        if self.strategy in {'mean', 'median', 'mode'}:
+            return self.stats is not None
+        return self.strategy == 'default'
+
+# method -> (statistics the bounds are built from, bounds from those statistics)
+OUTLIER_METHODS = {
+    "iqr": (("q25", "q75"), lambda q1, q3: (q1 - 1.5*(q3 - q1), q3 + 1.5*(q3 - q1))),
+    "z-score": (("mean", "std"), lambda mean, std: (mean - 3*std, mean + 3*std)),
+    # modified z-score above 3.5, 0.6745 scales the MAD to a standard deviation
+    "mad": (("median", "mad"), lambda median, mad: (median - 3.5*mad/0.6745, median + 3.5*mad/0.6745)),
+}
+OUTLIER_STRATEGIES = {"remove", "cap", "mean replace", "median replace", "null replace"}
+
 @dataclass
 class OutlierHandling(Operations):
-    column: str
+    columns: List[str]
     strategy: str = 'remove'
+    method: str = 'iqr'
 
-    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
-        try:
-            if self.column not in result.schema:
-                raise ValueError("Column is not present in the dataframe")
-
-            q1 = pl.col(self.column).quantile(0.25)
-            q3 = pl.col(self.column).quantile(0.75)
-            iqr = q3 - q1
-
-            upper_bound = q3 + 1.5*iqr
-            lower_bound = q1 - 1.5*iqr
-            
-            column = pl.col(self.column)
-            match self.strategy: 
-                case "remove":
-                    return result.filter((column >= lower_bound) & 
-                                         (column <= upper_bound))
+    def required_stats(self, schema: pl.Schema) -> List[Tuple[str, str]]:
+        # an unknown method is reported by _check when the operation runs
+        if self.method not in OUTLIER_METHODS:
+            return []
+        wanted = list(OUTLIER_METHODS[self.method][0])
+        if self.strategy == "mean replace":
+            wanted.append("mean")
+        if self.strategy == "median replace":
+            wanted.append("median")
+        return [(column, stat) for column in self.columns if column in schema
+                for stat in dict.fromkeys(wanted)]
+
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "numeric" for column in self.columns}
+
+    def _bounds(self, column: str):
+        stats, bounds = OUTLIER_METHODS[self.method]
+        return bounds(*[stat_expr(column, stat, self.stats) for stat in stats])
+
+    def _check(self, schema: pl.Schema):
+        if self.method not in OUTLIER_METHODS:
+            raise ValueError(f"Unknown outlier method: {self.method}")
+        for column in self.columns:
+            if column not in schema:
+                raise ValueError(f"Column: {column} is not present in the dataframe")
+
+    def predicate(self, schema: pl.Schema) -> Optional[pl.Expr]:
+        if self.strategy != "remove" or any(column not in schema for column in self.columns):
+            return None
+        self._check(schema)
+        kept = []
+        for column in self.columns:
+            lower_bound, upper_bound = self._bounds(column)
+            kept.append((pl.col(column) >= lower_bound) & (pl.col(column) <= upper_bound))
+        return pl.all_horizontal(kept)
+
+    def expressions(self, schema: pl.Schema) -> Optional[List[pl.Expr]]:
+        if self.strategy == "remove":
+            return None
+        self._check(schema)
+
+        expressions = []
+        for name in self.columns:
+            lower_bound, upper_bound = self._bounds(name)
+            column = pl.col(name)
+            outside = (column < lower_bound) | (column > upper_bound)
+            match self.strategy:
                 case "cap":
-                    return result.with_columns(
-                            column.clip(lower_bound, upper_bound).alias(self.column)
-                    )
+                    expression = column.clip(lower_bound, upper_bound)
                 case "mean replace":
-                    mean_val = column.mean()
-                    return result.with_columns(
-                        pl.when((column < lower_bound) | (column > upper_bound))
-                        .then(mean_val)
-                        .otherwise(column)
-                        .alias(self.column)
-                    )
+                    expression = pl.when(outside).then(stat_expr(name, "mean", self.stats)).otherwise(column)
                 case "median replace":
-                    median_val = column.median()
-                    return result.with_columns(
-                        pl.when((column < lower_bound) | (column > upper_bound))
-                        .then(median_val)
-                        .otherwise(column)
-                        .alias(self.column)
-                    )
+                    expression = pl.when(outside).then(stat_expr(name, "median", self.stats)).otherwise(column)
                 case "null replace":
-                    return result.with_columns(
-                        pl.when((column < lower_bound) | (column > upper_bound))
-                        .then(None)
-                        .otherwise(column)
-                        .alias(self.column)
-                    )
+                    expression = pl.when(outside).then(None).otherwise(column)
                 case _:
                     raise ValueError(f"Unknown Strategy: {self.strategy}")
+            expressions.append(expression.alias(name))
+        return expressions
+
+    def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
+        try:
+            schema = result.collect_schema()
+            self._check(schema)
+
+            if self.strategy == "remove":
+                return result.filter(self.predicate(schema))
+            return result.with_columns(self.expressions(schema))
         except Exception as e:
             print(f"Outlier Handling failed due to the following issue: {e}")
         
         return result
 
+    def is_row_local(self) -> bool:
+        return self.stats is not None
+
 @dataclass
 class Rename(Operations):
     mapping: Any
 
+    def column_types(self, schema: pl.Schema) -> Dict[str, str]:
+        return {column: "any" for column in self.mapping}
+
     def clean(self, result: pl.LazyFrame) -> pl.LazyFrame:
         return result.rename(self.mapping)
 
+    def is_row_local(self) -> bool:
+        return True
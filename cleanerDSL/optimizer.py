@@ -0,0 +1,146 @@
+from dataclasses import dataclass, field
+from functools import reduce
+import polars as pl
+from typing import Dict, List, Set
+from operations import Operations, WithColumns, FilterRows, Rename
+
+@dataclass
+class _Step:
+    kind: str
+    sources: List[Operations]
+    exprs: List[pl.Expr] = field(default_factory = list)
+    reads: Set[str] = field(default_factory = set)
+    writes: Set[str] = field(default_factory = set)
+    row_local: bool = False
+
+    def merge(self, other: "_Step"):
+        self.sources.extend(other.sources)
+        self.exprs.extend(other.exprs)
+        self.reads |= other.reads
+        self.writes |= other.writes
+        self.row_local = self.row_local and other.row_local
+
+    def to_operation(self) -> Operations:
+        if len(self.sources) == 1:
+            return self.sources[0]
+        if self.kind == "columns":
+            return WithColumns(self.exprs, self.sources)
+        return FilterRows(reduce(lambda left, right: left & right, self.exprs), self.sources)
+
+# Rewrites the operation list before it becomes a query plan: adjacent
+# independent column expressions share one with_columns, adjacent row filters
+# are AND-ed together and filters move ahead of row-local column operations
+# that do not write the columns they read.
+class PlanOptimizer:
+
+    def optimize(self, operations: List[Operations], schema: pl.Schema) -> List[Operations]:
+        steps = self._lower(operations, schema)
+        steps = self._hoist_filters(steps)
+        steps = self._fuse(steps)
+        return [step.to_operation() for step in steps]
+
+    def _lower(self, operations: List[Operations], schema: pl.Schema) -> List[_Step]:
+        steps = []
+        for idx, op in enumerate(operations):
+            try:
+                step = self._lower_one(op, schema)
+                if step.kind == "columns":
+                    schema = pl.LazyFrame(schema = schema).with_columns(step.exprs).collect_schema()
+                elif step.kind == "opaque":
+                    schema = op.clean(pl.LazyFrame(schema = schema)).collect_schema()
+            except Exception:
+                # the schema can no longer be tracked, leave the rest of the
+                # plan as it was written so errors surface at execution
+                steps.extend(_Step("opaque", [rest]) for rest in operations[idx:])
+                break
+            steps.append(step)
+        return steps
+
+    def _lower_one(self, op: Operations, schema: pl.Schema) -> _Step:
+        try:
+            exprs = op.expressions(schema)
+            if exprs is not None:
+                return _Step("columns", [op], list(exprs),
+                             reads = {name for e in exprs for name in e.meta.root_names()},
+                             writes = {e.meta.output_name() for e in exprs},
+                             row_local = op.is_row_local())
+
+            predicate = op.predicate(schema)
+            if predicate is not None:
+                return _Step("filter", [op], [predicate],
+                             reads = set(predicate.meta.root_names()),
+                             row_local = op.is_row_local())
+        except Exception:
+            pass
+        return _Step("opaque", [op])
+
+    def _hoist_filters(self, steps: List[_Step]) -> List[_Step]:
+        steps = list(steps)
+        moved = True
+        while moved:
+            moved = False
+            for idx in range(1, len(steps)):
+                prev, step = steps[idx - 1], steps[idx]
+                if (step.kind == "filter" and prev.kind == "columns" and prev.row_local
+                        and not step.reads & prev.writes):
+                    steps[idx - 1], steps[idx] = step, prev
+                    moved = True
+        return steps
+
+    def _fuse(self, steps: List[_Step]) -> List[_Step]:
+        fused = []
+        for step in steps:
+            step = _Step(step.kind, list(step.sources), list(step.exprs),
+                         set(step.reads), set(step.writes), step.row_local)
+            last = fused[-1] if fused else None
+            if last is not None and last.kind == step.kind == "columns":
+                if not step.reads & last.writes and not step.writes & last.writes:
+                    last.merge(step)
+                    continue
+            if last is not None and last.kind == step.kind == "filter" and step.row_local:
+                last.merge(step)
+                continue
+            fused.append(step)
+        return fused
+
+# Input columns the operations read, following renames and derived outputs
+# (age_t, salary_z-score) back to the columns they were computed from, and
+# the columns the operations add. Operations that can not be analysed read
+# every column.
+def referenced_columns(operations: List[Operations], schema: pl.Schema) -> Dict[str, List[str]]:
+    inputs = list(schema.keys())
+    origin = {name: {name} for name in inputs}
+    reads, produced = set(), []
+
+    def read(names):
+        for name in names:
+            reads.update(origin.get(name, ()))
+
+    for op in operations:
+        try:
+            if isinstance(op, Rename):
+                read(op.mapping)
+                for old, new in op.mapping.items():
+                    origin[new] = origin.pop(old)
+                    produced = [new if name == old else name for name in produced]
+            elif (exprs := op.expressions(schema)) is not None:
+                for expr in exprs:
+                    roots = expr.meta.root_names()
+                    read(roots)
+                    name = expr.meta.output_name()
+                    if name not in origin:
+                        produced.append(name)
+                    origin[name] = set().union(*(origin.get(root, set()) for root in roots))
+            elif (predicate := op.predicate(schema)) is not None:
+                read(predicate.meta.root_names())
+            else:
+                read(schema.keys())
+            schema = op.clean(pl.LazyFrame(schema = schema)).collect_schema()
+        except Exception:
+            read(schema.keys())
+            break
+    return {
+        "inputs": [name for name in inputs if name in reads],
+        "produced": produced,
+        "pruned": [name for name in inputs if name not in reads],
+    }
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import numpy as np
+import polars as pl
+
+MAGIC = b"DLPYIDX1"
+# magic, stride, total rows, size of the csv it was built from, number of offsets
+HEADER = struct.Struct("<8sIQQQ")
+DEFAULT_STRIDE = 1024
+CHUNK_SIZE = 16 * 1024 * 1024
+QUOTE, NEWLINE = ord('"'), ord("\n")
+
+@dataclass
+class PageIndex:
+    stride: int
+    total_rows: int
+    file_size: int
+    # offsets[i] is the byte offset of row i * stride, offsets[0] is the end of the header
+    offsets: np.ndarray
+
+    def page_count(self, page_size: int) -> int:
+        return -(-self.total_rows // page_size)
+
+def index_path(csv_path: Union[str, Path]) -> Path:
+    return Path(f"{csv_path}.idx")
+
+def _row_starts(path: Path) -> Iterator[np.ndarray]:
+    # Yields the byte offsets right after every newline that is not inside a
+    # quoted field. A newline is a row boundary when the number of quotes
+    # before it is even, escaped quotes ("") come in pairs and keep the parity.
+    quotes_seen = 0
+    position = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            buf = np.frombuffer(chunk, dtype = np.uint8)
+            quotes = np.flatnonzero(buf == QUOTE)
+            newlines = np.flatnonzero(buf == NEWLINE)
+            outside = (np.searchsorted(quotes, newlines) + quotes_seen) % 2 == 0
+            yield newlines[outside] + position + 1
+            quotes_seen += len(quotes)
+            position += len(buf)
+
+def build_index(csv_path: Union[str, Path], stride: int = DEFAULT_STRIDE) -> PageIndex:
+    path = Path(csv_path)
+    file_size = path.stat().st_size
+    # boundary j (the byte after the j-th row-ending newline) is where row j
+    # starts, boundary 0 being the end of the header; keep every stride-th one
+    anchors, boundaries, last = [], 0, None
+    for starts in _row_starts(path):
+        anchors.append(starts[(-boundaries) % stride::stride])
+        boundaries += len(starts)
+        if len(starts):
+            last = int(starts[-1])
+
+    if not boundaries:
+        # header only, without a trailing newline
+        return PageIndex(stride, 0, file_size, np.array([file_size], dtype = np.uint64))
+    offsets = np.concatenate(anchors).astype(np.uint64)
+    total_rows = boundaries
+    if last == file_size:
+        # the newline ending the last row does not start another one
+        total_rows -= 1
+        if total_rows % stride == 0 and total_rows:
+            offsets = offsets[:-1]
+    return PageIndex(stride, total_rows, file_size, offsets)
+
+def write_index(csv_path: Union[str, Path], stride: int = DEFAULT_STRIDE,
+                path: Optional[Union[str, Path]] = None) -> PageIndex:
+    index = build_index(csv_path, stride)
+    target = Path(path or index_path(csv_path))
+    partial = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(partial, "wb") as f:
+        f.write(HEADER.pack(MAGIC, index.stride, index.total_rows, index.file_size, len(index.offsets)))
+        f.write(index.offsets.astype("<u8").tobytes())
+    os.replace(partial, target)
+    return index
+
+def read_index(csv_path: Union[str, Path], path: Optional[Union[str, Path]] = None) -> PageIndex:
+    target = Path(path or index_path(csv_path))
+    with open(target, "rb") as f:
+        magic, stride, total_rows, file_size, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{target} is not a page index")
+        offsets = np.frombuffer(f.read(count * 8), dtype = "<u8")
+    return PageIndex(stride, total_rows, file_size, offsets)
+
+def load_index(csv_path: Union[str, Path], stride: int = DEFAULT_STRIDE) -> PageIndex:
+    # rebuilds the sidecar when it is missing or was built for another version of the file
+    try:
+        index = read_index(csv_path)
+        if index.file_size == Path(csv_path).stat().st_size:
+            return index
+    except (OSError, ValueError, struct.error):
+        pass
+    try:
+        return write_index(csv_path, stride)
+    except OSError:
+        return build_index(csv_path, stride)
+
+# Reads one page of a csv through its sidecar index: only the bytes between
+# the anchors around the page are read and parsed, so the cost depends on
+# the page and stride size and not on how far into the file the page is.
+def read_page(csv_path: Union[str, Path], page_no: int, page_size: int,
+              index: Optional[PageIndex] = None) -> pl.DataFrame:
+    if page_no < 1 or page_size < 1:
+        raise ValueError("page_no and page_size must be positive")
+    index = index or load_index(csv_path)
+    first = (page_no - 1) * page_size
+    last = min(first + page_size, index.total_rows)
+
+    with open(csv_path, "rb") as f:
+        header = f.read(int(index.offsets[0]))
+        if first >= last:
+            return pl.read_csv(header, infer_schema = False).clear()
+        anchor = first // index.stride
+        end_anchor = -(-last // index.stride)
+        start = int(index.offsets[anchor])
+        end = int(index.offsets[end_anchor]) if end_anchor < len(index.offsets) else index.file_size
+        f.seek(start)
+        body = f.read(end - start)
+
+    rows = pl.read_csv(header + body, infer_schema = False)
+    return rows.slice(first - anchor * index.stride, last - first)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Sidecar row index for paging cleaned csv files")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    build = commands.add_parser("build", help = "write <csv>.idx")
+    build.add_argument("csv")
+    build.add_argument("--stride", type = int, default = DEFAULT_STRIDE)
+    page = commands.add_parser("page", help = "print one page as JSON")
+    page.add_argument("csv")
+    page.add_argument("page_no", type = int)
+    page.add_argument("page_size", type = int)
+    args = parser.parse_args(argv)
+
+    match args.command:
+        case "build":
+            index = write_index(args.csv, args.stride)
+            print(json.dumps({"index": str(index_path(args.csv)), "total_rows": index.total_rows}))
+        case "page":
+            index = load_index(args.csv)
+            rows = read_page(args.csv, args.page_no, args.page_size, index)
+            print(json.dumps({
+                "data": rows.to_dicts(),
+                "page_no": args.page_no,
+                "page_size": args.page_size,
+                "total_rows": index.total_rows,
+                "total_pages": index.page_count(args.page_size),
+            }))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import time
+from typing import List, Optional, Tuple
+
+import polars as pl
+from operations import collect_batches
+
+PREVIEW_ROWS = 1000
+PREVIEW_BUDGET_MS = 2000
+BATCH_ROWS = 50_000
+# share of the budget spent reading the input, the rest is left for the script
+SAMPLING_SHARE = 0.5
+SAMPLE_METHODS = ("head", "reservoir", "stratified")
+KEY = "__sample_key"
+
+def _keep(sample: pl.DataFrame, rows: int, stratify_by: Optional[str]) -> pl.DataFrame:
+    sample = sample.sort(KEY)
+    if stratify_by is None:
+        return sample.head(rows)
+    return sample.filter(pl.int_range(pl.len()).over(stratify_by) < rows)
+
+def _allocate(sample: pl.DataFrame, counts: pl.DataFrame, rows: int, seen: int,
+              stratify_by: str) -> pl.DataFrame:
+    # proportional allocation over the strata seen so far, every stratum
+    # keeps at least one row so rare groups still show up in the preview
+    shares = counts.with_columns(
+        (pl.col("count") * rows / seen).round().cast(pl.Int64).clip(lower_bound = 1).alias("__share")
+    ).select(stratify_by, "__share")
+    return (sample.join(shares, on = stratify_by, how = "left", nulls_equal = True)
+                  .filter(pl.int_range(pl.len()).over(stratify_by) < pl.col("__share"))
+                  .drop("__share"))
+
+# Bottom-k sampling: every row gets a uniform random key and the sample is
+# the rows with the smallest keys, which is a uniform reservoir over what was
+# read and merges batch by batch. Stratified samples keep the bottom k of
+# every stratum and cut them down in proportion to the stratum sizes at the end.
+def sample_frame(source: pl.LazyFrame, rows: int = PREVIEW_ROWS, method: str = "head",
+                 stratify_by: Optional[str] = None, budget_ms: Optional[float] = None,
+                 seed: int = 0) -> Tuple[pl.DataFrame, dict]:
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"Unknown sampling method: {method}")
+    if method == "stratified" and stratify_by is None:
+        raise ValueError("Stratified sampling needs a column to stratify by")
+    started = time.perf_counter()
+    if method == "head":
+        sample = source.head(rows).collect()
+        return sample, {"method": method, "rows": sample.height, "rows_scanned": sample.height,
+                        "complete": sample.height < rows}
+
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    stratum = stratify_by if method == "stratified" else None
+    sample, counts, seen, complete = None, None, 0, True
+    for batch in collect_batches(source, BATCH_ROWS):
+        batch = batch.with_columns(pl.Series(KEY, rng.random(batch.height)))
+        sample = _keep(batch if sample is None else pl.concat([sample, batch]), rows, stratum)
+        seen += batch.height
+        if stratum is not None:
+            batch_counts = batch.group_by(stratum).len("count")
+            counts = batch_counts if counts is None else (
+                pl.concat([counts, batch_counts]).group_by(stratum).agg(pl.col("count").sum()))
+        if budget_ms is not None and (time.perf_counter() - started) * 1000 >= budget_ms:
+            complete = False
+            break
+
+    if sample is None:
+        return source.head(0).collect(), {"method": method, "rows": 0, "rows_scanned": 0, "complete": True}
+    if stratum is not None:
+        sample = _allocate(sample, counts, rows, seen, stratum)
+    sample = sample.drop(KEY)
+    return sample, {"method": method, "rows": sample.height, "rows_scanned": seen, "complete": complete}
+
+def estimated_operations(operations: List, schema: pl.Schema) -> List[dict]:
+    # operations whose output depends on statistics of the whole column;
+    # unless they were bound from a fitted artifact, a preview computes
+    # those statistics on the sample, so its values are only estimates
+    estimates = []
+    for idx, op in enumerate(operations):
+        try:
+            wanted = op.required_stats(schema)
+            schema = op.clean(pl.LazyFrame(schema = schema)).collect_schema()
+        except Exception:
+            wanted = []
+        if wanted and not op.stats:
+            estimates.append({
+                "index": idx,
+                "operation": repr(op),
+                "statistics": [f"{stat}({column})" for column, stat in wanted],
+            })
+    return estimates
@@ -0,0 +1,130 @@
+import time
+import warnings
+import polars as pl
+from typing import List, Set, Tuple
+from governor import RssMonitor
+from operations import Operations
+
+# the profile node of a map_batches counter
+COUNTER_NODE = "OPAQUE_PYTHON"
+
+def _profile(result: pl.LazyFrame) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    # profile() is deprecated for the streaming engine and gone in polars 2,
+    # without it the whole run is reported as a single unattributed node
+    if not hasattr(result, "profile"):
+        started = time.perf_counter_ns()
+        output = result.collect()
+        elapsed = (time.perf_counter_ns() - started) // 1000
+        return output, pl.DataFrame({"node": ["collect"], "start": [0], "end": [elapsed]})
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        return result.profile()
+
+def _node_labels(op: Operations, schema: pl.Schema) -> List[str]:
+    # the profile nodes an operation produces on its own, read off an empty
+    # frame of the same schema so the labels match the real run
+    try:
+        _, timings = _profile(op.clean(pl.LazyFrame(schema = schema)))
+    except Exception:
+        return []
+    return [node for node in timings["node"].to_list() if node != "optimization"]
+
+def _with_column_names(label: str) -> Set[str]:
+    if label.startswith("with_column(") and label.endswith(")"):
+        return {name.strip() for name in label[len("with_column("):-1].split(",")}
+    return set()
+
+def _merged_into(label: str, node: str) -> bool:
+    # Polars combines adjacent with_columns and pushes filters together, a
+    # merged node carries the outputs or the predicate of each original one
+    produced = _with_column_names(node)
+    if produced:
+        return bool(produced & _with_column_names(label))
+    if label.startswith(".filter(") and node.startswith(".filter("):
+        return label[len(".filter("):-1] in node
+    return False
+
+def plan_report(operations: List[Operations], result: pl.LazyFrame) -> dict:
+    return {
+        "operations": [repr(op) for op in operations],
+        "polars_plan": result.explain(),
+    }
+
+def _counted(result: pl.LazyFrame, counts: List[Tuple[int, float]]) -> pl.LazyFrame:
+    # passes the frame through unchanged, recording its rows and size
+    def count(df: pl.DataFrame) -> pl.DataFrame:
+        counts.append((df.height, df.estimated_size("mb")))
+        return df
+    return result.map_batches(count, schema = result.collect_schema(), streamable = False,
+                              validate_output_schema = False)
+
+# Runs the plan through LazyFrame.profile() and attributes every node to the
+# operation that produced it: exact label matches first, then nodes Polars
+# merged across operations are split between the operations they came from.
+#
+# A counter after the source and after every operation records the rows and
+# in-memory size of the frame passing it, so rows in and out and the output
+# size of each operation come from the same single run. The counters keep
+# Polars from merging nodes or pushing filters across operations, so the
+# profiled plan runs each operation as written. Peak RSS is for the whole
+# run, not per operation.
+def profile_plan(source: pl.LazyFrame, operations: List[Operations]) -> Tuple[pl.DataFrame, dict]:
+    labels, counts = [], []
+    result = _counted(source, counts)
+    for op in operations:
+        labels.append(_node_labels(op, result.collect_schema()))
+        result = _counted(op.clean(result), counts)
+
+    started = time.perf_counter()
+    with RssMonitor() as monitor:
+        output, timings = _profile(result)
+    total_ms = (time.perf_counter() - started) * 1000
+    rows = [height for height, _ in counts]
+
+    report = [
+        {
+            "index": idx,
+            "operation": repr(op),
+            "time_ms": 0.0,
+            "rows_in": rows[idx],
+            "rows_out": rows[idx + 1],
+            "output_mb": round(counts[idx + 1][1], 3),
+            "nodes": [],
+        }
+        for idx, op in enumerate(operations)
+    ]
+    unattributed = []
+    optimization_ms = 0.0
+    remaining = [list(nodes) for nodes in labels]
+    for node, start, end in timings.iter_rows():
+        elapsed = (end - start) / 1000
+        if node == "optimization":
+            optimization_ms += elapsed
+            continue
+        if node == COUNTER_NODE:
+            continue
+        owner = next((idx for idx, nodes in enumerate(remaining) if node in nodes), None)
+        if owner is not None:
+            remaining[owner].remove(node)
+            owners = [owner]
+        else:
+            owners = [idx for idx, nodes in enumerate(labels)
+                      if any(_merged_into(label, node) for label in nodes)]
+        if not owners:
+            unattributed.append({"node": node, "time_ms": round(elapsed, 3)})
+            continue
+        for owner in owners:
+            report[owner]["time_ms"] += elapsed / len(owners)
+            report[owner]["nodes"].append(node)
+
+    for entry in report:
+        entry["time_ms"] = round(entry["time_ms"], 3)
+    return output, {
+        "total_ms": round(total_ms, 3),
+        "optimization_ms": round(optimization_ms, 3),
+        "rows_in": rows[0],
+        "rows_out": output.height,
+        "peak_rss_mb": monitor.peak_mb,
+        "operations": report,
+        "unattributed": unattributed,
+    }
@@ -358,3 +358,1492 @@ class TestIntegration:
         assert result is not None
         assert "years" in result.columns
         assert result["years"].null_count() == 0
+
+
+# ---------------------------------------------------------------------------
+# Streaming execution (scan source -> sink)
+# ---------------------------------------------------------------------------
+
+class TestStreaming:
+
+    @pytest.fixture
+    def csv_path(self, tmp_path, basic_df):
+        path = tmp_path / "input.csv"
+        basic_df.write_csv(path)
+        return path
+
+    def test_scan_and_sink_csv(self, csv_path, tmp_path):
+        from cleanerpl import CleanerPipeline
+        out = tmp_path / "out.csv"
+        CleanerPipeline.scan(csv_path).drop_na(columns=["age"]).sink(out)
+        result = pl.read_csv(out)
+        assert result.shape[0] == 4
+        assert result["age"].null_count() == 0
+
+    def test_sink_parquet_matches_execute(self, csv_path, tmp_path):
+        from cleanerpl import CleanerPipeline
+        out = tmp_path / "out.parquet"
+        pipeline = CleanerPipeline.scan(csv_path).string_normalize(["name"], "lower")
+        pipeline.sink(out)
+        assert pl.read_parquet(out).equals(pipeline.execute(streaming=True))
+
+    def test_interpreter_from_path(self, csv_path, tmp_path):
+        from DSLInterpreter import DSLInterpreter
+        out = tmp_path / "out.csv"
+        DSLInterpreter.from_path(csv_path).sink(yaml.dump(["RENAME age TO years"]), out)
+        assert "years" in pl.read_csv(out).columns
+
+    def test_streaming_report_lists_blockers(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        pipeline = (CleanerPipeline(basic_df)
+                    .impute_na(["age"], strategy="mode")
+                    .transform(["salary"], "yeojohnson-transform")
+                    .drop_na())
+        report = pipeline.streaming_report()
+        assert [entry["index"] for entry in report] == [0, 1]
+        assert all(entry["fallback"] == "in-memory" for entry in report)
+
+
+# ---------------------------------------------------------------------------
+# Plan optimizer
+# ---------------------------------------------------------------------------
+
+class TestPlanOptimizer:
+
+    def build(self, df, **options):
+        from cleanerpl import CleanerPipeline
+        return (CleanerPipeline(df, **options)
+                .string_normalize(["name"], "strip")
+                .transform(["salary"], "log-transform")
+                .filter("age gt 20")
+                .impute_na(["age"], strategy="mean")
+                .standardize(["age"], "z-score")
+                .drop_na(["name"])
+                .filter("salary lt 70000"))
+
+    def test_optimized_result_matches_unoptimized(self, basic_df):
+        optimized = self.build(basic_df).execute()
+        plain = self.build(basic_df, optimize=False).execute()
+        assert optimized.equals(plain)
+
+    def test_plan_is_rewritten(self, basic_df):
+        from operations import Filter, FilterRows, Standardize, WithColumns
+        plan = self.build(basic_df, shared_stats=False).plan()
+        assert [type(op) for op in plan] == [Filter, WithColumns, Standardize, FilterRows]
+        assert len(plan[1].sources) == 3
+        assert len(plan[3].sources) == 2
+
+    def test_filter_not_hoisted_past_global_statistics(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        from operations import Standardize
+        pipeline = (CleanerPipeline(basic_df, shared_stats=False)
+                    .standardize(["age"])
+                    .filter("age gt 0"))
+        assert isinstance(pipeline.plan()[0], Standardize)
+
+    def test_dependent_columns_are_not_fused(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        pipeline = (CleanerPipeline(basic_df)
+                    .impute_na(["age"], value=0)
+                    .transform(["age"], "log-transform"))
+        assert len(pipeline.plan()) == 2
+
+    def test_debug_prints_both_plans(self, basic_df, capsys):
+        self.build(basic_df, debug=True).execute()
+        out = capsys.readouterr().out
+        assert "Plan before optimization" in out
+        assert "Plan after optimization" in out
+
+
+# ---------------------------------------------------------------------------
+# Shared statistics engine
+# ---------------------------------------------------------------------------
+
+class TestSharedStatistics:
+
+    def test_independent_statistics_share_one_pass(self, basic_df):
+        from operations import bind_statistics
+        from cleanerpl import CleanerPipeline
+        pipeline = (CleanerPipeline(basic_df)
+                    .impute_na(["age"], strategy="median")
+                    .standardize(["salary"], "z-score")
+                    .handle_outlier("salary", "cap"))
+        bound, passes = bind_statistics(pipeline.operations, basic_df.lazy())
+        assert passes == 1
+        assert bound[1].stats.get("salary", "mean") == pytest.approx(60_000)
+
+    def test_rewritten_column_needs_a_second_pass(self, basic_df):
+        from operations import bind_statistics
+        from cleanerpl import CleanerPipeline
+        pipeline = (CleanerPipeline(basic_df)
+                    .impute_na(["age"], strategy="mean")
+                    .standardize(["age"], "z-score"))
+        bound, passes = bind_statistics(pipeline.operations, basic_df.lazy())
+        assert passes == 2
+        assert bound[1].stats.get("age", "std") < basic_df["age"].std()
+
+    def test_statistics_after_filter_see_filtered_rows(self, basic_df):
+        from cleanerpl import CleanerPipeline
+
+        def build(**options):
+            return (CleanerPipeline(basic_df, **options)
+                    .filter("age lt 100")
+                    .impute_na(["salary"], strategy="mean")
+                    .standardize(["age", "salary"], "robust"))
+
+        assert build().execute().equals(build(shared_stats=False).execute())
+
+
+# ---------------------------------------------------------------------------
+# Fit / apply with persisted statistics
+# ---------------------------------------------------------------------------
+
+class TestFitApply:
+
+    def build(self, df, **options):
+        from cleanerpl import CleanerPipeline
+        return (CleanerPipeline(df, **options)
+                .impute_na(["age"], strategy="median")
+                .standardize(["salary"], "z-score")
+                .handle_outlier("age", "cap")
+                .string_normalize(["city"], "label encoding"))
+
+    def test_artifact_round_trip(self, basic_df, tmp_path):
+        path = tmp_path / "stats.json"
+        artifact = self.build(basic_df).fit(path)
+        assert artifact["version"] == 1
+        expected = self.build(basic_df).execute()
+        assert self.build(basic_df, artifact=path).execute().equals(expected)
+
+    def test_apply_skips_aggregations(self, basic_df, monkeypatch):
+        import operations.statistics as statistics
+        artifact = self.build(basic_df).fit()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("statistics recomputed")
+        monkeypatch.setattr(statistics, "compute_stats", fail)
+
+        chunk = basic_df.slice(2, 3)
+        result = self.build(chunk).apply(artifact).execute()
+        full = self.build(basic_df).apply(artifact).execute()
+        assert result.equals(full.slice(2, 3))
+
+    def test_temporal_statistics_keep_their_dtype(self, tmp_path):
+        import datetime as dt
+        from cleanerpl import CleanerPipeline
+        df = make_df(
+            day=[dt.date(2024, 1, 1), None, dt.date(2024, 1, 1), dt.date(2024, 3, 5)],
+            at=[dt.datetime(2024, 1, 1, 10), dt.datetime(2024, 1, 2), None, dt.datetime(2024, 1, 9)],
+        ).with_columns(pl.col("at").dt.replace_time_zone("UTC"))
+        build = lambda **options: (CleanerPipeline(df, **options)
+                                   .impute_na(["day"], strategy="mode")
+                                   .impute_na(["at"], strategy="median"))
+        build().fit(tmp_path / "stats.json")
+        expected = build().execute()
+        applied = build(artifact=tmp_path / "stats.json").execute()
+        assert applied.schema == expected.schema == df.schema
+        assert applied.equals(expected)
+
+    def test_artifact_from_other_script_rejected(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        artifact = self.build(basic_df).fit()
+        other = CleanerPipeline(basic_df, artifact=artifact).standardize(["age"])
+        with pytest.raises(ValueError):
+            other.execute()
+
+
+# ---------------------------------------------------------------------------
+# Native power transforms
+# ---------------------------------------------------------------------------
+
+class TestPowerTransform:
+
+    @pytest.fixture
+    def skewed(self):
+        import random
+        rng = random.Random(7)
+        return pl.Series("x", [rng.lognormvariate(0, 1) for _ in range(2_000)])
+
+    def test_yeojohnson_matches_scipy(self, skewed):
+        stats = pytest.importorskip("scipy.stats")
+        from operations.powertransform import estimate_lambda, power_transform
+        expected_lambda = stats.yeojohnson_normmax(skewed.to_numpy())
+        assert estimate_lambda(skewed) == pytest.approx(expected_lambda, abs=1e-6)
+        expected = stats.yeojohnson(skewed.to_numpy(), lmbda=expected_lambda)
+        assert power_transform(skewed).to_list() == pytest.approx(list(expected), rel=1e-6)
+
+    def test_boxcox_matches_scipy(self, skewed):
+        stats = pytest.importorskip("scipy.stats")
+        from operations.powertransform import estimate_lambda
+        expected = stats.boxcox_normmax(skewed.to_numpy(), method="mle")
+        assert estimate_lambda(skewed, "boxcox") == pytest.approx(expected, abs=1e-6)
+
+    def test_small_sample_matches_scipy(self, basic_df):
+        stats = pytest.importorskip("scipy.stats")
+        from operations.powertransform import estimate_lambda
+        salary = basic_df["salary"].drop_nulls()
+        expected = stats.boxcox_normmax(salary.to_numpy(), method="mle")
+        assert estimate_lambda(salary, "boxcox") == pytest.approx(expected, abs=1e-4)
+        # on non-negative data Yeo-Johnson is Box-Cox of x + 1; scipy's own
+        # Yeo-Johnson likelihood loses precision at this scale
+        expected = stats.boxcox_normmax(salary.to_numpy() + 1, method="mle")
+        assert estimate_lambda(salary) == pytest.approx(expected, abs=1e-4)
+        assert estimate_lambda(salary) == pytest.approx(stats.yeojohnson_normmax(salary.to_numpy()), abs=0.15)
+
+    def test_boxcox_rejects_non_positive(self):
+        from operations.powertransform import estimate_lambda
+        with pytest.raises(ValueError):
+            estimate_lambda(pl.Series([1.0, 0.0, 2.0]), "boxcox")
+
+    def test_sampled_lambda_is_close(self, skewed):
+        from operations.powertransform import estimate_lambda
+        assert estimate_lambda(skewed, sample_size=500) == pytest.approx(estimate_lambda(skewed), abs=0.2)
+
+    def test_pipeline_transform_keeps_nulls(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        result = CleanerPipeline(basic_df).transform(["salary"], "yeojohnson-transform").execute()
+        assert result["salary_t"].null_count() == 1
+        assert CleanerPipeline(basic_df).transform(["salary"], "yeojohnson-transform").streaming_report() != []
+
+
+# ---------------------------------------------------------------------------
+# Cleaner worker
+# ---------------------------------------------------------------------------
+
+class TestCleanerWorker:
+
+    @pytest.fixture
+    def job_files(self, tmp_path, basic_df):
+        basic_df.write_csv(tmp_path / "input.csv")
+        (tmp_path / "script.yml").write_text(yaml.dump(["DROP ANY NULL ROWS"]))
+        return tmp_path
+
+    def test_run_job_reports_timings(self, job_files):
+        from jobs import run_job
+        result = run_job(job_files / "input.csv", job_files / "script.yml", job_files / "out")
+        assert pl.read_csv(job_files / "out").shape[0] == 1
+        assert set(result["timings"]) == {"load_ms", "execute_ms", "index_ms", "total_ms"}
+        assert result["total_rows"] == 1
+
+    def test_json_lines_protocol(self, job_files):
+        import io
+        import json
+        from worker import CleanerWorker
+        requests = [
+            {"id": "ok", "csv": str(job_files / "input.csv"),
+             "instructions": str(job_files / "script.yml"), "output": str(job_files / "out.csv")},
+            {"id": "missing", "csv": str(job_files / "nope.csv"),
+             "instructions": str(job_files / "script.yml"), "output": str(job_files / "x.csv")},
+            {"id": "bad"},
+        ]
+        stdout = io.StringIO()
+        worker = CleanerWorker(workers=1, max_pending=2)
+        try:
+            worker.serve_lines(io.StringIO("\n".join(json.dumps(r) for r in requests)), stdout)
+            status = worker.status()
+        finally:
+            worker.shutdown()
+
+        responses = {r["id"]: r for r in map(json.loads, stdout.getvalue().splitlines())}
+        assert responses["ok"]["status"] == "ok"
+        assert "queue_ms" in responses["ok"]["timings"]
+        assert responses["missing"]["status"] == "error"
+        assert responses["bad"]["status"] == "error"
+        assert status["completed"] == 1 and status["failed"] == 1
+
+
+class TestStartup:
+
+    def _modules_after(self, script):
+        import subprocess
+        import sys
+        probe = subprocess.run(
+            [sys.executable, "-c", f"import sys\n{script}\nprint(' '.join(sys.modules))"],
+            capture_output=True, text=True, check=True,
+        )
+        return set(probe.stdout.split())
+
+    def test_import_defers_heavy_dependencies(self):
+        from benchmarks.startup import DEFERRED
+        modules = self._modules_after("import DSLInterpreter")
+        assert not modules & set(DEFERRED)
+
+    def test_filter_job_skips_pydantic(self):
+        modules = self._modules_after(
+            "import polars as pl\n"
+            "from DSLInterpreter import DSLInterpreter\n"
+            "DSLInterpreter(pl.DataFrame({'age': [1, 30]})).run('[\"FILTER WHERE age > 20\"]')"
+        )
+        assert "pydantic" not in modules
+
+    def test_pipeline_loads_sketches_only_when_approximate(self):
+        assert "operations.sketches" not in self._modules_after("import cleanerpl")
+        modules = self._modules_after(
+            "import polars as pl\n"
+            "from cleanerpl import CleanerPipeline\n"
+            "CleanerPipeline(pl.DataFrame({'age': [1, 30]}), approximate=True)"
+        )
+        assert "operations.sketches" in modules
+
+    def test_column_command_still_validates(self, basic_df):
+        from DSLInterpreter import DSLInterpreter
+        with pytest.raises(ValueError, match="not present"):
+            DSLInterpreter(basic_df).load(yaml.dump(["DROP ROWS WHERE missing IS NULL"]))
+
+    def test_startup_budget(self):
+        from benchmarks.startup import check, measure
+        report = measure(repeat=1)
+        assert not check(report, budget_ms=5000)
+
+
+class TestCompiler:
+
+    def test_commands_compile_to_pipeline_calls(self, basic_df):
+        from compiler import Command, compile_script
+        program = compile_script(yaml.dump([
+            "drop rows where age IS null",
+            "NORMALISE COLUMNS name USING label  encoding",
+            "TRANSFORM COLUMNS salary USING log INPLACE",
+        ]), basic_df.schema)
+        assert program == (
+            Command("drop_na", kwargs=(("columns", ("age",)), ("strategy", "drop-null")), columns=("age",)),
+            Command("string_normalize", (("name",), "label encoding"), columns=("name",)),
+            Command("transform", (("salary",), "log", True), columns=("salary",)),
+        )
+
+    def test_repeated_script_skips_validation(self, basic_df):
+        import compiler
+        compiler.clear_cache()
+        script = yaml.dump(["FILL NULL IN COLUMN age USING mean", "RENAME age TO years"])
+        with patch.object(compiler, "_validate", wraps=compiler._validate) as validate:
+            first = compiler.compile_script(script, basic_df.schema)
+            second = compiler.compile_script(script + "\n", basic_df.schema)
+        assert first is second
+        assert validate.call_count == 1
+        assert compiler.cache_info()["scripts"].hits == 1
+
+    def test_schema_is_part_of_the_key(self, basic_df):
+        from compiler import compile_script
+        script = yaml.dump(["RENAME age TO years"])
+        compile_script(script, basic_df.schema)
+        with pytest.raises(ValueError, match="not present"):
+            compile_script(script, basic_df.drop("age").schema)
+
+    @pytest.mark.parametrize("cmd", [
+        "NORMALISE COLUMNS age USING nonsense",
+        "RENAME age, salary TO years",
+        "DROP ANY NULL ROWS PLEASE",
+    ])
+    def test_invalid_commands_raise(self, basic_df, cmd):
+        from compiler import compile_script
+        with pytest.raises(ValueError):
+            compile_script(yaml.dump([cmd]), basic_df.schema)
+
+    def test_short_transform_name_runs(self, basic_df):
+        from DSLInterpreter import DSLInterpreter
+        result = run_yml(DSLInterpreter(basic_df), "TRANSFORM COLUMNS salary USING sqrt INPLACE")
+        assert result["salary"][0] == pytest.approx(math.sqrt(50_000))
+
+
+class TestFilterParser:
+
+    @pytest.fixture
+    def people(self):
+        return make_df(
+            age=[25, None, 35, 1000, 28],
+            name=["Alice", "BOB", "gt x", None, "dave"],
+            city=["london", "paris", "berlin", "madrid", None],
+        )
+
+    def ages(self, df, query):
+        from operations.filterparser import FilterParser
+        return df.filter(FilterParser().parse(query, df.schema))["age"].to_list()
+
+    @pytest.mark.parametrize("query, expected", [
+        ("age gt 30", [35, 1000]),
+        ("age gt 30 and city eq london or city eq paris", [None]),
+        ("(age gt 30 and city neq berlin) or city eq paris", [None, 1000]),
+        ("not (age gt 30)", [25, 28]),
+        ("age >= 35 & city != madrid", [35]),
+        ("name eq 'gt x'", [35]),
+        ("city in (london, paris)", [25, None]),
+        ("city not in [london]", [None, 35, 1000]),
+        ("age between 26 and 40 and city eq berlin", [35]),
+        ("age is null", [None]),
+        ("age is not null", [25, 35, 1000, 28]),
+        ("name contains li", [25]),
+        ("name not startswith A", [None, 35, 28]),
+    ])
+    def test_predicates(self, people, query, expected):
+        assert self.ages(people, query) == expected
+
+    @pytest.mark.parametrize("query", ["age gt", "age gt 30 city", "height gt 3", "city in london"])
+    def test_malformed_filters_raise(self, people, query):
+        with pytest.raises(ValueError):
+            self.ages(people, query)
+
+    def test_parse_is_cached_per_schema(self, people):
+        from operations.filterparser import FilterParser
+        parser = FilterParser()
+        parser.parse("age lt 99", people.schema)
+        hits = parser.cache_info().hits
+        parser.parse("age lt 99 ", people.schema)
+        parser.parse("age lt 99", people.drop("name").schema)
+        assert parser.cache_info().hits == hits + 1
+
+
+class TestBenchmarks:
+
+    def test_datasets_are_seeded(self):
+        from benchmarks.datasets import SHAPES, generate
+        for shape in SHAPES:
+            df = generate(shape, 200, seed=1)
+            assert {"num_0", "num_1", "str_0", "str_1"} <= set(df.columns)
+            assert df.equals(generate(shape, 200, seed=1))
+        assert generate("nulls", 1000)["num_0"].null_count() > 200
+
+    def test_every_dsl_rule_is_benchmarked(self):
+        from benchmarks.cases import COMMANDS
+        from compiler import RULES
+        covered = {
+            pattern.pattern
+            for cmd in COMMANDS
+            for pattern, _ in RULES[cmd.split()[0].upper()]
+            if pattern.fullmatch(cmd)
+        }
+        assert covered == {pattern.pattern for rules in RULES.values() for pattern, _ in rules}
+
+    def test_report_and_compare(self, tmp_path):
+        from benchmarks.run import compare, run
+        report = run([500], ["long"], ["command:filter", "pipeline:rename"], repeat=1,
+                     isolated=False, cache_dir=tmp_path)
+        results = report["results"]
+        assert len(results) == 2 and not any("error" in r for r in results)
+        assert results[0]["compile_ms"] is not None and results[0]["rows_per_s"] > 0
+
+        slower = {"results": [dict(r, rows_per_s=r["rows_per_s"] // 2) for r in results]}
+        assert compare(report, report) == []
+        assert len(compare(report, slower)) == 2
+
+
+class TestProfiling:
+
+    SCRIPT = [
+        "PROFILE",
+        "DROP ROWS WHERE age IS NULL",
+        "FILTER WHERE salary gt 55000",
+        "NORMALISE COLUMNS name USING lower",
+        "RENAME age TO years",
+    ]
+
+    def test_profile_attributes_rows_and_nodes(self, basic_df):
+        from DSLInterpreter import DSLInterpreter
+        interp = DSLInterpreter(basic_df, optimize=False)
+        result = run_yml(interp, *self.SCRIPT)
+        profile = interp.dsl_engine.report["profile"]
+
+        assert result.shape[0] == 1
+        assert (profile["rows_in"], profile["rows_out"]) == (5, 1)
+        assert [(op["rows_in"], op["rows_out"]) for op in profile["operations"]] == [
+            (5, 4), (4, 1), (1, 1), (1, 1)
+        ]
+        assert all(op["nodes"] and op["time_ms"] >= 0 and op["output_mb"] >= 0 for op in profile["operations"])
+        assert profile["unattributed"] == []
+
+    def test_profile_reads_the_input_once(self, basic_df):
+        from profiling import profile_plan
+        from operations import Drop, StringNormalize
+        reads = []
+        source = basic_df.lazy().map_batches(lambda df: reads.append(df.height) or df, streamable=False)
+        output, profile = profile_plan(source, [
+            Drop(["age"], "drop-null"), StringNormalize(["name"], "upper"),
+        ])
+        assert reads == [5] and output.height == 4
+        assert [(op["rows_in"], op["rows_out"]) for op in profile["operations"]] == [(5, 4), (4, 4)]
+
+    def test_merged_with_columns_are_split(self, basic_df):
+        from profiling import profile_plan
+        from operations import Standardize, StringNormalize
+        _, profile = profile_plan(basic_df.lazy(), [
+            StringNormalize(["name"], "upper"), Standardize(["age"], "min-max"),
+        ])
+        assert all(op["nodes"] for op in profile["operations"])
+
+    def test_explain_command_and_api(self, basic_df):
+        from DSLInterpreter import DSLInterpreter
+        interp = DSLInterpreter(basic_df)
+        run_yml(interp, "EXPLAIN", "FILTER WHERE age gt 30")
+        explain = interp.dsl_engine.report["explain"]
+        assert explain["operations"] == ["Filter(expression='age gt 30')"]
+        assert "FILTER" in explain["polars_plan"]
+        assert "profile" not in interp.dsl_engine.report
+
+        plan = DSLInterpreter(basic_df).explain(yaml.dump(["FILTER WHERE age gt 30"]))
+        assert plan == explain
+
+    def test_job_response_carries_report(self, tmp_path, basic_df):
+        import json
+        from jobs import run_job
+        basic_df.write_csv(tmp_path / "input.csv")
+        (tmp_path / "script.yml").write_text(yaml.dump(["PROFILE", "DROP ANY NULL ROWS"]))
+        response = run_job(tmp_path / "input.csv", tmp_path / "script.yml", tmp_path / "out.csv")
+        assert response["report"]["profile"]["rows_out"] == 1
+        assert pl.read_csv(tmp_path / "out.csv").shape[0] == 1
+        json.dumps(response)
+
+
+class TestBatch:
+
+    SCRIPT = yaml.dump(["DROP ROWS WHERE x IS NULL", "NORMALISE COLUMNS x USING min-max"])
+
+    @pytest.fixture
+    def drops(self, tmp_path):
+        make_df(x=[0.0, 5.0, None, 10.0]).write_csv(tmp_path / "a.csv")
+        make_df(x=[10.0, 20.0]).write_csv(tmp_path / "b.csv")
+        make_df(y=[1.0]).write_csv(tmp_path / "broken.csv")
+        return tmp_path
+
+    def test_outputs_written_side_by_side(self, drops):
+        import os
+        from batch import run_batch
+        report = run_batch(self.SCRIPT, str(drops / "*.csv"), concurrency=2)
+        status = {os.path.basename(f["input"]): f["status"] for f in report["files"]}
+        assert status == {"a.csv": "ok", "b.csv": "ok", "broken.csv": "error"}
+        assert report["failed"] == 1
+        assert pl.read_csv(drops / "a_cleaned.csv")["x_min-max"].to_list() == [0.0, 0.5, 1.0]
+
+        # rerunning over the same directory does not pick up its own outputs
+        again = run_batch(self.SCRIPT, str(drops / "*.csv"))
+        assert len(again["files"]) == 3
+
+    def test_global_statistics(self, drops):
+        from batch import run_batch
+        run_batch(self.SCRIPT, [drops / "a.csv", drops / "b.csv"], output_dir=drops / "out",
+                  global_stats=True)
+        assert pl.read_csv(drops / "out" / "a_cleaned.csv")["x_min-max"].to_list() == [0.0, 0.25, 0.5]
+        assert pl.read_csv(drops / "out" / "b_cleaned.csv")["x_min-max"].to_list() == [0.5, 1.0]
+
+    def test_statistics_of_a_group_run_together(self, drops):
+        import os
+        import batch
+        from batch import run_batch
+        (drops / "broken.csv").unlink()
+        # parses as floats from the first rows, fails at the last one
+        (drops / "late.csv").write_text("x\n" + "1.0\n" * 200 + "oops\n")
+        with patch.object(pl, "collect_all", wraps=pl.collect_all) as collect_all, \
+             patch.object(batch, "_sink_file", wraps=batch._sink_file) as sink_file:
+            report = run_batch(self.SCRIPT, str(drops / "*.csv"))
+        assert [len(call.args[0]) for call in collect_all.call_args_list] == [3]
+        assert sink_file.call_count == 3
+        status = {os.path.basename(f["input"]): f["status"] for f in report["files"]}
+        assert status == {"a.csv": "ok", "b.csv": "ok", "late.csv": "error"}
+        assert pl.read_csv(drops / "b_cleaned.csv")["x_min-max"].to_list() == [0.0, 1.0]
+
+    def test_process_pool(self, drops):
+        from batch import run_batch
+        report = run_batch(self.SCRIPT, [drops / "a.csv", drops / "b.csv"], mode="processes",
+                           concurrency=2, file_format="parquet")
+        assert report["failed"] == 0
+        assert pl.read_parquet(drops / "b_cleaned.parquet")["x_min-max"].to_list() == [0.0, 1.0]
+
+
+class TestPageIndex:
+
+    @pytest.fixture
+    def tricky_csv(self, tmp_path):
+        # quoted delimiters, quotes and newlines inside fields
+        values = ["plain", 'say "hi"', "two\nlines", "a,b", ""]
+        df = make_df(i=list(range(53)), s=[values[i % len(values)] for i in range(53)])
+        df.write_csv(tmp_path / "out.csv")
+        return tmp_path / "out.csv", pl.read_csv(tmp_path / "out.csv", infer_schema=False)
+
+    @pytest.mark.parametrize("stride", [1, 4, 1024])
+    def test_pages_match_full_read(self, tricky_csv, stride):
+        from pageindex import read_page, write_index
+        path, full = tricky_csv
+        index = write_index(path, stride)
+        assert index.total_rows == 53
+        for page_size in (1, 5, 20):
+            for page_no in range(1, index.page_count(page_size) + 2):
+                page = read_page(path, page_no, page_size, index)
+                assert page.equals(full.slice((page_no - 1) * page_size, page_size))
+
+    def test_sidecar_round_trip_and_rebuild(self, tricky_csv):
+        from pageindex import index_path, load_index, read_index, write_index
+        path, _ = tricky_csv
+        written = write_index(path, 8)
+        assert index_path(path).exists()
+        assert (read_index(path).offsets == written.offsets).all()
+
+        make_df(i=[1, 2]).write_csv(path)
+        assert load_index(path).total_rows == 2
+
+    def test_unterminated_last_row(self, tmp_path):
+        from pageindex import read_page
+        (tmp_path / "x.csv").write_text("a,b\n1,2\n3,4")
+        assert read_page(tmp_path / "x.csv", 1, 10)["a"].to_list() == ["1", "3"]
+
+
+class TestCheckpoints:
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        make_df(x=[4.0, None, 1.0, 9.0, 3.0], name=[" A", "b ", "C", None, "d"]).write_csv(tmp_path / "in.csv")
+        return tmp_path / "in.csv"
+
+    def build(self, source, store, *steps, every=False):
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline.scan(source, checkpoints=store, checkpoint_every=every)
+        for step in steps:
+            step(pipeline)
+        return pipeline
+
+    STEPS = [
+        lambda p: p.drop_na(["x"], strategy="drop-null"),
+        lambda p: p.standardize(["x"], strategy="min-max"),
+        lambda p: p.string_normalize(["name"], strategy="lower"),
+    ]
+
+    def test_appending_resumes_from_previous_prefix(self, source):
+        from checkpoints import MemoryCheckpoints
+        store = MemoryCheckpoints()
+        self.build(source, store, *self.STEPS[:2]).execute()
+        pipeline = self.build(source, store, *self.STEPS)
+        result = pipeline.execute()
+        assert pipeline.report["checkpoint"] == {"resumed_from": 2, "operations": 3}
+        assert result.equals(self.build(source, None, *self.STEPS).execute())
+
+    def test_editing_a_command_reruns_from_it(self, source):
+        from checkpoints import MemoryCheckpoints
+        store = MemoryCheckpoints()
+        self.build(source, store, *self.STEPS, every=True).execute()
+        edited = self.STEPS[:2] + [lambda p: p.string_normalize(["name"], strategy="upper")]
+        pipeline = self.build(source, store, *edited, every=True)
+        assert pipeline.execute()["name"].to_list() == [" A", "C", None, "D"]
+        assert pipeline.report["checkpoint"]["resumed_from"] == 2
+
+    def test_changed_file_is_not_reused(self, source):
+        from checkpoints import MemoryCheckpoints
+        store = MemoryCheckpoints()
+        self.build(source, store, *self.STEPS).execute()
+        make_df(x=[1.0, 2.0], name=["a", "b"]).write_csv(source)
+        pipeline = self.build(source, store, *self.STEPS)
+        assert pipeline.execute()["x_min-max"].to_list() == [0.0, 1.0]
+        assert pipeline.report["checkpoint"]["resumed_from"] == 0
+
+    def test_disk_store_round_trip_and_eviction(self, tmp_path):
+        from checkpoints import DiskCheckpoints
+        frame = make_df(x=list(range(1000)))
+        store = DiskCheckpoints(tmp_path / "ckpt")
+        store.put("a", frame)
+        assert "a" in store and store.get("a").equals(frame)
+
+        size = (tmp_path / "ckpt" / "a.arrow").stat().st_size
+        small = DiskCheckpoints(tmp_path / "ckpt", max_bytes=size * 2)
+        small.put("b", frame)
+        small.get("a")
+        small.put("c", frame)
+        assert "a" in small and "c" in small and "b" not in small
+        assert small.get("missing") is None
+
+    def test_disk_eviction_order_survives_equal_timestamps(self, tmp_path):
+        import time
+        from checkpoints import DiskCheckpoints
+        frame = make_df(x=list(range(1000)))
+        store = DiskCheckpoints(tmp_path / "ckpt")
+        store.put("a", frame)
+        size = (tmp_path / "ckpt" / "a.arrow").stat().st_size
+        small = DiskCheckpoints(tmp_path / "ckpt", max_bytes=size * 2)
+        # a filesystem clock that never moves
+        with patch.object(time, "time_ns", return_value=1_000_000_000):
+            small.put("b", frame)
+            small.get("a")
+            small.put("c", frame)
+        assert "a" in small and "c" in small and "b" not in small
+
+        # the frame fits, its file a little over the limit is still kept
+        tiny = DiskCheckpoints(tmp_path / "ckpt", max_bytes=frame.estimated_size())
+        tiny.put("d", frame)
+        assert "d" in tiny and "a" not in tiny
+
+    def test_memory_store_is_bounded(self):
+        from checkpoints import MemoryCheckpoints
+        frame = make_df(x=list(range(1000)))
+        store = MemoryCheckpoints(max_bytes=frame.estimated_size() * 2)
+        for key in "abc":
+            store.put(key, frame)
+        assert "a" not in store and store.size <= store.max_bytes
+
+
+class TestPreview:
+
+    @pytest.fixture
+    def skewed(self):
+        return make_df(g=["a"] * 900 + ["b"] * 100, x=[float(i) for i in range(1000)])
+
+    def test_head_labels_statistics_as_estimates(self, skewed):
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline(skewed.lazy())
+        pipeline.filter("x lt 500")
+        pipeline.standardize(["x"], strategy="min-max")
+        result = pipeline.preview(rows=10)
+        assert result["x_min-max"].to_list()[-1] == 1.0
+        preview = pipeline.report["preview"]
+        assert preview["sample"] == {"method": "head", "rows": 10, "rows_scanned": 10, "complete": False}
+        assert [(e["index"], e["statistics"]) for e in preview["estimates"]] == [(1, ["min(x)", "max(x)"])]
+        assert preview["within_budget"]
+
+    def test_whole_input_and_artifact_are_exact(self, skewed):
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline(skewed.lazy())
+        pipeline.standardize(["x"], strategy="min-max")
+        pipeline.preview(rows=5000)
+        assert pipeline.report["preview"]["estimates"] == []
+
+        fitted = pipeline.fit()
+        pipeline = CleanerPipeline(skewed.lazy(), artifact=fitted)
+        pipeline.standardize(["x"], strategy="min-max")
+        assert pipeline.preview(rows=10)["x_min-max"].max() < 0.01
+        assert pipeline.report["preview"]["estimates"] == []
+
+    @pytest.mark.parametrize("method", ["reservoir", "stratified"])
+    def test_samples_are_proportional_and_seeded(self, skewed, method):
+        from preview import sample_frame
+        sample, info = sample_frame(skewed.lazy(), 50, method, stratify_by="g", seed=3)
+        assert info == {"method": method, "rows": 50, "rows_scanned": 1000, "complete": True}
+        assert sample.columns == ["g", "x"]
+        assert sample.equals(sample_frame(skewed.lazy(), 50, method, stratify_by="g", seed=3)[0])
+        if method == "stratified":
+            assert sample["g"].value_counts().sort("g")["count"].to_list() == [45, 5]
+        assert sample["x"].max() > 100
+
+    def test_budget_stops_reading(self, monkeypatch):
+        import preview
+        from preview import sample_frame
+        monkeypatch.setattr(preview, "BATCH_ROWS", 100)
+        frame = make_df(x=list(range(10_000)))
+        sample, info = sample_frame(frame.lazy(), 10, "reservoir", budget_ms=0)
+        assert not info["complete"] and info["rows_scanned"] < 10_000 and sample.height == 10
+
+    def test_full_job_only_queued_on_confirm(self, tmp_path, skewed):
+        from worker import CleanerWorker
+        skewed.write_csv(tmp_path / "in.csv")
+        (tmp_path / "script.yml").write_text(yaml.dump(["NORMALISE COLUMNS x USING z-score"]))
+        job = {"csv": str(tmp_path / "in.csv"), "instructions": str(tmp_path / "script.yml"),
+               "output": str(tmp_path / "out.csv")}
+        worker = CleanerWorker(workers=1)
+        try:
+            preview = worker.submit({"id": "p", "op": "preview", "rows": 20, **job}).result()
+            assert preview["status"] == "ok" and len(preview["data"]) == 20
+            assert preview["report"]["preview"]["estimates"][0]["statistics"] == ["mean(x)", "std(x)"]
+            assert not (tmp_path / "out.csv").exists()
+
+            done = worker.submit({"id": "c", "op": "confirm", "preview_id": preview["preview_id"]}).result()
+            assert done["status"] == "ok" and pl.read_csv(tmp_path / "out.csv").height == 1000
+            again = worker.submit({"op": "confirm", "preview_id": preview["preview_id"]}).result()
+            assert again["status"] == "error"
+        finally:
+            worker.shutdown()
+
+
+class TestLabelDictionary:
+
+    def encode(self, df, **options):
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline(df, **options)
+        pipeline.string_normalize(["c"], "label encoding")
+        return pipeline.execute()["c"].to_list(), pipeline
+
+    def test_codes_do_not_depend_on_row_order(self):
+        df = make_df(c=["z", "b", None, "a", "b"])
+        reversed_df = df.reverse()
+        assert self.encode(df)[0] == [2, 1, None, 0, 1]
+        assert self.encode(df, shared_stats=False)[0] == [2, 1, None, 0, 1]
+        assert self.encode(reversed_df)[0] == [1, 0, None, 1, 2]
+
+    def test_existing_dictionary_and_extension(self, tmp_path):
+        from operations import LabelDictionary
+        dictionary = LabelDictionary()
+        self.encode(make_df(c=["z", "b", "a"]), dictionary=dictionary)
+        dictionary.save(tmp_path / "labels.json")
+
+        loaded = LabelDictionary.load(tmp_path / "labels.json")
+        assert loaded.columns == {"c": ["a", "b", "z"]}
+        assert self.encode(make_df(c=["a", "q", "z"]), dictionary=loaded)[0] == [0, None, 2]
+        codes, pipeline = self.encode(make_df(c=["a", "q", "z"]), dictionary=loaded, extend_dictionary=True)
+        assert codes == [0, 3, 2]
+        assert pipeline.dictionary["c"] == ["a", "b", "z", "q"]
+        assert make_df(c=codes).select(loaded.decode("c"))["c"].to_list() == ["a", "q", "z"]
+
+    def test_learns_values_after_earlier_rewrites(self):
+        from cleanerpl import CleanerPipeline
+        from operations import LabelDictionary
+        pipeline = CleanerPipeline(make_df(c=["b", "a"]), dictionary=LabelDictionary())
+        pipeline.string_normalize(["c"], "upper").string_normalize(["c"], "label encoding")
+        assert pipeline.execute()["c"].to_list() == [1, 0]
+        assert pipeline.dictionary["c"] == ["A", "B"]
+
+    def test_known_columns_stay_fixed_next_to_new_ones(self):
+        from cleanerpl import CleanerPipeline
+        from operations import LabelDictionary
+        dictionary = LabelDictionary({"a": ["x", "y"]})
+        pipeline = CleanerPipeline(make_df(a=["y", "q", "x"], b=["k", "j", "k"]), dictionary=dictionary)
+        result = pipeline.string_normalize(["a", "b"], "label encoding").execute()
+        assert result["a"].to_list() == [1, None, 0] and result["b"].to_list() == [1, 0, 1]
+        assert dictionary.columns == {"a": ["x", "y"], "b": ["j", "k"]}
+
+    def test_numeric_labels_are_keyed_as_text(self, tmp_path):
+        from operations import LabelDictionary
+        extended = LabelDictionary().extend(make_df(n=[10, 2, 30]).lazy(), ["n"])
+        codes, pipeline = self.encode(make_df(c=[30, 2, 10]), dictionary=LabelDictionary())
+        assert extended.columns["n"] == pipeline.dictionary["c"] == ["2", "10", "30"]
+        extended.save(tmp_path / "labels.json")
+        loaded = LabelDictionary.load(tmp_path / "labels.json")
+        assert self.encode(make_df(c=[30, 2, 10, 5]), dictionary=LabelDictionary({"c": loaded["n"]}))[0] == [2, 0, 1, None]
+        assert codes == [2, 0, 1]
+
+    def test_batch_files_share_codes(self, tmp_path):
+        from batch import run_batch
+        make_df(c=["x", "y"]).write_csv(tmp_path / "a.csv")
+        make_df(c=["y", "w"]).write_csv(tmp_path / "b.csv")
+        script = yaml.dump(["NORMALISE COLUMNS c USING label encoding"])
+        report = run_batch(script, [tmp_path / "a.csv", tmp_path / "b.csv"], output_dir=tmp_path / "out",
+                           mode="processes", dictionary=tmp_path / "labels.json")
+        assert report["failed"] == 0
+        assert pl.read_csv(tmp_path / "out" / "a_cleaned.csv")["c"].to_list() == [1, 2]
+        assert pl.read_csv(tmp_path / "out" / "b_cleaned.csv")["c"].to_list() == [2, 0]
+        assert "w" in (tmp_path / "labels.json").read_text()
+
+
+class TestDtypeOptimizer:
+
+    @pytest.fixture
+    def wide_types(self):
+        n = 2000
+        return make_df(
+            small=[i % 100 for i in range(n)],
+            halves=[(i % 7) / 2 for i in range(n)],
+            thirds=[i / 3 for i in range(n)],
+            city=[["London", "Paris", "Berlin"][i % 3] for i in range(n)],
+            day=[f"2021-03-{i % 28 + 1:02d}" for i in range(n)],
+            ident=[f"id{i}" for i in range(n)],
+        )
+
+    def test_infers_narrow_safe_dtypes(self, wide_types):
+        from operations import infer_dtypes
+        dtypes, report = infer_dtypes(wide_types.lazy(), sample_rows=100)
+        assert {column: target for column, (target, _) in dtypes.items()} == {
+            "small": pl.Int8, "halves": pl.Float32, "city": pl.Categorical, "day": pl.Date,
+        }
+        assert report["rows"] == 2000 and report["saved_mb"] > 0
+
+    def test_values_outside_the_sample_are_kept(self, wide_types):
+        from operations import infer_dtypes
+        df = wide_types.with_columns(
+            pl.when(pl.int_range(pl.len()) == 1999).then(10 ** 6).otherwise(pl.col("small")).alias("small"),
+            pl.when(pl.int_range(pl.len()) == 1999).then(pl.lit("soon")).otherwise(pl.col("day")).alias("day"),
+        )
+        dtypes, _ = infer_dtypes(df.lazy(), pinned=["city"], sample_rows=100)
+        assert dtypes["small"][0] == pl.Int32
+        assert "day" not in dtypes and "city" not in dtypes
+
+    def test_script_results_match_unoptimized(self, wide_types):
+        from DSLInterpreter import DSLInterpreter
+        script = [
+            "cast columns small to int64",
+            "normalise columns city using lower",
+            "filter where city startswith par and day between 2021-03-02 and 2021-03-10",
+            "transform columns small using square",
+            "normalise columns city using label encoding",
+        ]
+        optimized = DSLInterpreter(wide_types)
+        result = optimized.run(yaml.dump(["optimise dtypes"] + script))
+        plain = DSLInterpreter(wide_types).run(yaml.dump(script))
+        assert result.schema["day"] == pl.Date and result.schema["small"] == pl.Int64
+        assert result.drop("day").equals(plain.drop("day"))
+        assert "small" not in optimized.dsl_engine.report["dtypes"]["columns"]
+
+    @pytest.mark.parametrize("shared_stats", [True, False])
+    def test_min_max_on_narrowed_column(self, shared_stats):
+        from cleanerpl import CleanerPipeline
+        df = make_df(a=[[-100, 0, 100, 50][i % 4] for i in range(2000)])
+        pipeline = CleanerPipeline(df, optimize_dtypes=True, shared_stats=shared_stats)
+        result = pipeline.standardize(["a"], "min-max").execute()
+        assert result.schema["a"] == pl.Int8
+        assert result["a_min-max"].head(4).to_list() == [0, 0.5, 1, 0.75]
+
+    def test_cast_command(self):
+        from compiler import compile_command, Command
+        assert compile_command("CAST COLUMN a, b TO Float32") == Command(
+            "cast", kwargs=(("a", "float32"), ("b", "float32")), columns=("a", "b"))
+        with pytest.raises(ValueError, match="unknown dtype"):
+            compile_command("cast columns a to decimal")
+
+
+class TestColumnPruning:
+
+    SCRIPT = [
+        "fill null in column c1 using mean",
+        "normalise columns c2 using z-score",
+        "rename c3 to x",
+        "filter where x gt 5",
+        "transform columns c4 using log",
+    ]
+
+    @pytest.fixture
+    def wide_csv(self, tmp_path):
+        make_df(**{f"c{i}": list(range(20)) for i in range(12)}).write_csv(tmp_path / "wide.csv")
+        return tmp_path / "wide.csv"
+
+    def test_referenced_columns_follow_renames_and_outputs(self, wide_csv):
+        from cleanerpl import CleanerPipeline
+        from compiler import compile_script
+        pipeline = CleanerPipeline.scan(wide_csv)
+        for command in compile_script(yaml.dump(self.SCRIPT), pipeline.df.collect_schema()):
+            command.apply(pipeline)
+        pipeline.filter("c2_z-score gt 0")
+        referenced = pipeline.referenced()
+        assert referenced["inputs"] == ["c1", "c2", "c3", "c4"]
+        assert referenced["produced"] == ["c2_z-score", "c4_t"]
+        assert len(referenced["pruned"]) == 8
+
+    def test_keep_referenced_prunes_the_scan(self, wide_csv):
+        from DSLInterpreter import DSLInterpreter
+        pruned = DSLInterpreter(wide_csv)
+        pruned.load(yaml.dump(["keep referenced columns"] + self.SCRIPT))
+        plan = pruned.dsl_engine.explain()["polars_plan"]
+        assert "PROJECT 4/12 COLUMNS" in plan
+        # the filter on the renamed column is applied while the csv is parsed
+        assert 'SELECTION: col("c3") > 5' in plan
+
+        result = pruned.dsl_engine.execute()
+        full = DSLInterpreter(wide_csv).run(yaml.dump(self.SCRIPT))
+        assert result.columns == ["c1", "c2", "x", "c4", "c2_z-score", "c4_t"]
+        assert result.equals(full.select(result.columns))
+        assert full.width == 14
+
+    def test_checkpoints_follow_the_pruned_columns(self, wide_csv):
+        from cleanerpl import CleanerPipeline
+        from checkpoints import MemoryCheckpoints
+        store = MemoryCheckpoints(max_bytes=10 ** 9)
+        build = lambda: CleanerPipeline.scan(wide_csv, checkpoints=store, checkpoint_every=True,
+                                             keep="referenced").filter("c0 gt 1")
+        build().execute()
+        pipeline = build().rename(c1="b")
+        result = pipeline.execute()
+        assert result.columns == ["c0", "b"] and result.height == 18
+        assert pipeline.report["checkpoint"]["resumed_from"] == 0
+
+
+class TestColumnarCache:
+
+    @pytest.fixture
+    def upload(self, tmp_path):
+        make_df(a=[3, 1, 2], b=["x", "y", None]).write_csv(tmp_path / "upload.csv")
+        return tmp_path / "upload.csv"
+
+    def test_converts_once_and_invalidates(self, tmp_path, upload):
+        import os
+        import shutil
+        from columnar import ColumnarCache
+        cache = ColumnarCache(tmp_path / "cache")
+        with patch.object(ColumnarCache, "_convert", wraps=cache._convert) as convert:
+            first = cache.scan(upload).collect()
+            assert cache.scan(upload).collect().equals(first)
+            assert first.equals(pl.read_csv(upload))
+            assert convert.call_count == 1
+
+            # same content under another name is the same file
+            shutil.copy(upload, tmp_path / "again.csv")
+            cache.scan(tmp_path / "again.csv")
+            assert convert.call_count == 1
+
+            make_df(a=[9], b=["z"]).write_csv(upload)
+            os.utime(upload, ns=(1, 1))
+            assert cache.scan(upload).collect()["a"].to_list() == [9]
+            assert convert.call_count == 2
+
+    def test_size_eviction(self, tmp_path, upload):
+        from columnar import ColumnarCache
+        cache = ColumnarCache(tmp_path / "cache", max_bytes=1)
+        cache.scan(upload).collect()
+        make_df(a=[1]).write_csv(tmp_path / "other.csv")
+        cache.scan(tmp_path / "other.csv").collect()
+        assert len(list((tmp_path / "cache").glob("*.arrow"))) == 1
+
+    def test_pipeline_reads_the_columnar_copy(self, tmp_path, upload):
+        from columnar import ColumnarCache
+        from DSLInterpreter import DSLInterpreter
+        script = yaml.dump(["drop any null rows", "normalise columns a using min-max"])
+        cache = ColumnarCache(tmp_path / "cache", file_format="parquet")
+        cached = DSLInterpreter.from_path(upload, columnar_cache=cache)
+        assert "Parquet SCAN" in cached.explain(script)["polars_plan"]
+        assert DSLInterpreter.from_path(upload, columnar_cache=cache).run(script).equals(
+            DSLInterpreter.from_path(upload).run(script))
+
+
+class TestApproximateStats:
+
+    @pytest.fixture
+    def values(self):
+        import numpy as np
+        rng = np.random.default_rng(0)
+        return pl.DataFrame({
+            "x": rng.lognormal(3, 1, 200_000),
+            "y": rng.normal(0, 10, 200_000),
+            "c": rng.choice(["a", "b", "c", "d"], 200_000, p=[0.4, 0.3, 0.2, 0.1]),
+        })
+
+    def test_quantiles_within_relative_error(self, values):
+        from operations.sketches import QuantileSketch, SketchOptions
+        for column in ["x", "y"]:
+            sketch = QuantileSketch(SketchOptions(relative_error=0.01)).add(values[column].to_numpy())
+            for q in [0.25, 0.5, 0.75]:
+                exact = values[column].quantile(q, "nearest")
+                assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-9
+
+    def test_merged_chunks_match_a_single_pass(self, values):
+        from operations.sketches import HeavyHitters, QuantileSketch
+        whole = QuantileSketch().add(values["y"].to_numpy())
+        merged = QuantileSketch()
+        modes = HeavyHitters()
+        for chunk in values.iter_slices(30_000):
+            merged.merge(QuantileSketch().add(chunk["y"].to_numpy()))
+            modes.merge(HeavyHitters().add(chunk["c"]))
+        assert merged.positive == whole.positive and merged.negative == whole.negative
+        assert merged.quantile(0.5) == whole.quantile(0.5)
+        assert modes.mode() == "a"
+
+    def test_heavy_hitters_keep_frequent_values(self):
+        from operations.sketches import HeavyHitters, SketchOptions
+        column = pl.Series("v", ["hot"] * 300 + [f"cold{i}" for i in range(700)])
+        sketch = HeavyHitters(SketchOptions(heavy_hitters=4)).add(column)
+        assert len(sketch.counters) <= 4
+        assert sketch.mode() == "hot"
+        assert sketch.counters["hot"] >= 300 - sketch.error_bound()
+
+    def test_pipeline_results_close_to_exact(self, values):
+        from cleanerpl import CleanerPipeline
+        results = []
+        for approximate in [False, True]:
+            pipeline = CleanerPipeline(values.with_columns(
+                pl.when(pl.int_range(pl.len()) % 7 == 0).then(None).otherwise(pl.col("c")).alias("c")
+            ).lazy(), approximate=approximate)
+            pipeline.standardize(["x"], "robust")
+            pipeline.impute_na(["c"], strategy="mode")
+            results.append(pipeline.execute())
+        exact, approximate = results
+        assert approximate["c"].equals(exact["c"])
+        # the median and quartiles each move by at most 1%
+        error = (approximate["x_robust"] - exact["x_robust"]).abs() / (exact["x_robust"].abs() + 1)
+        assert error.max() < 0.05
+
+    def test_dsl_command_reports_the_error_bound(self, values):
+        from DSLInterpreter import DSLInterpreter
+        interpreter = DSLInterpreter(values)
+        interpreter.run(yaml.dump(["approximate statistics", "fill null in column x using median"]))
+        assert interpreter.dsl_engine.report["approximate"]["relative_error"] == 0.01
+
+
+class TestOutlierHandling:
+
+    @pytest.fixture
+    def spiky_df(self):
+        values = [float(v) for v in range(1, 21)]
+        return make_df(a=values + [500.0], b=[-400.0] + values, c=values + [10.0])
+
+    def test_bounds_for_every_column_in_one_pass(self, spiky_df):
+        from operations import bind_statistics
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline(spiky_df).handle_outlier(["a", "b", "c"], "cap", "mad")
+        bound, passes = bind_statistics(pipeline.operations, spiky_df.lazy())
+        assert passes == 1
+        assert set(bound[0].stats.values) == {(column, stat) for column in "abc" for stat in ("median", "mad")}
+
+    @pytest.mark.parametrize("method", ["iqr", "z-score", "mad"])
+    def test_remove_drops_rows_outlying_in_any_column(self, spiky_df, method):
+        from cleanerpl import CleanerPipeline
+        result = CleanerPipeline(spiky_df).handle_outlier(["a", "b"], "remove", method).execute()
+        assert result.height == spiky_df.height - 2
+        assert result["a"].max() < 500 and result["b"].min() > -400
+
+    def test_matches_one_column_at_a_time(self, spiky_df):
+        from cleanerpl import CleanerPipeline
+        together = CleanerPipeline(spiky_df).handle_outlier(["a", "b", "c"], "median replace").execute()
+        one_by_one = CleanerPipeline(spiky_df)
+        for column in ["a", "b", "c"]:
+            one_by_one.handle_outlier(column, "median replace")
+        assert together.equals(one_by_one.execute())
+        assert together["a"][-1] == spiky_df["a"].median()
+
+    def test_dsl_command(self, spiky_df):
+        from DSLInterpreter import DSLInterpreter
+        from compiler import compile_command
+        command = compile_command("handle outliers in columns a, b using null replace by z-score")
+        assert command.args == (("a", "b"), "null replace", "z-score")
+        assert compile_command("handle outliers in column a using cap").args == (("a",), "cap", "iqr")
+        with pytest.raises(ValueError):
+            compile_command("handle outliers in column a using shrink")
+
+        result = DSLInterpreter(spiky_df).run(yaml.dump(["handle outliers in columns a, b using null replace"]))
+        assert result["a"].null_count() == 1 and result["b"].null_count() == 1
+
+    @pytest.mark.parametrize("strategy", ["remove", "cap"])
+    def test_unknown_method_is_reported(self, spiky_df, strategy):
+        from cleanerpl import CleanerPipeline
+        from validation import PlanValidationError
+        pipeline = CleanerPipeline(spiky_df).handle_outlier(["a"], strategy, "foo")
+        assert pipeline.operations[0].required_stats(spiky_df.schema) == []
+        with pytest.raises(PlanValidationError, match="Unknown outlier method: foo"):
+            pipeline.validate()
+
+
+class TestPlanValidation:
+
+    def compile(self, df, script):
+        from compiler import compile_script
+        return compile_script(yaml.dump(script), df.schema)
+
+    def test_columns_follow_renames_and_derived_outputs(self, basic_df):
+        self.compile(basic_df, [
+            "rename age to years",
+            "transform columns years using log",
+            "normalise columns years_t using z-score",
+            "normalise columns city using label encoding",
+            "handle outliers in columns city, salary using cap",
+            "filter where years_t_z-score gt 0",
+        ])
+
+    def test_reports_the_failing_step(self, basic_df):
+        from validation import PlanValidationError
+        with pytest.raises(PlanValidationError, match="not present") as error:
+            self.compile(basic_df, ["rename age to years", "fill null in column age using mean"])
+        assert [problem["step"] for problem in error.value.problems] == [2]
+
+    def test_dtype_changes_are_checked(self, basic_df):
+        from validation import PlanValidationError
+        with pytest.raises(PlanValidationError) as error:
+            self.compile(basic_df, [
+                "normalise columns age using lower",
+                "normalise columns name using z-score",
+                "cast columns name to float64",
+                "normalise columns name using z-score",
+                "transform columns city using log",
+            ])
+        assert [problem["step"] for problem in error.value.problems] == [1, 2, 5]
+        assert "expected a string column" in error.value.problems[0]["error"]
+
+    def test_unscoped_mean_fill_skips_string_columns(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        self.compile(basic_df, ["fill null using mean"])
+        result = CleanerPipeline(basic_df.lazy()).impute_na(strategy = "mean").execute()
+        assert result["age"].null_count() == 0 and result["salary"][2] == 60_000
+        assert result["name"].to_list() == basic_df["name"].to_list()
+        assert result["city"].to_list() == basic_df["city"].to_list()
+
+    def test_pipeline_validate_returns_the_result_schema(self, basic_df):
+        from cleanerpl import CleanerPipeline
+        schema = (CleanerPipeline(basic_df.lazy())
+                  .string_normalize(["city"], "label encoding")
+                  .transform(["age"], "log")
+                  .rename(age="years")
+                  .validate())
+        assert schema["city"] == pl.UInt32
+        assert list(schema) == ["years", "salary", "name", "city", "age_t"]
+
+    def test_worker_rejects_before_queueing(self, tmp_path, basic_df):
+        from worker import CleanerWorker
+        basic_df.write_csv(tmp_path / "input.csv")
+        (tmp_path / "script.yml").write_text(yaml.dump(["rename age to years", "normalise columns age using z-score"]))
+        worker = CleanerWorker(workers=1)
+        try:
+            with patch.object(worker.pool, "submit") as submit:
+                response = worker.submit({"id": "bad", "csv": str(tmp_path / "input.csv"),
+                                          "instructions": str(tmp_path / "script.yml"),
+                                          "output": str(tmp_path / "out.csv")}).result(timeout=10)
+            status = worker.status()
+        finally:
+            worker.shutdown()
+        assert response["status"] == "error" and "step 2" in response["error"]
+        assert not submit.called
+        assert status["rejected"] == 1 and status["pending"] == 0
+
+
+class TestJobExecutor:
+
+    def blocked(self, **options):
+        import threading
+        from executor import JobExecutor
+        executor = JobExecutor(**options)
+        release = threading.Event()
+        for _ in range(executor.concurrency):
+            executor.submit(release.wait)
+        return executor, release
+
+    def test_threads_split_the_polars_pool(self):
+        from executor import JobExecutor
+        executor = JobExecutor(threads_per_job=1)
+        try:
+            assert executor.concurrency == pl.thread_pool_size()
+        finally:
+            executor.shutdown()
+
+    def test_clients_are_served_round_robin(self):
+        executor, release = self.blocked()
+        order = []
+        jobs = [executor.submit(order.append, name, client=name[0]) for name in ["a1", "a2", "a3", "b1", "c1", "b2"]]
+        release.set()
+        for job in jobs:
+            job.result(timeout=10)
+        executor.shutdown()
+        assert order == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+    def test_bounded_queue(self):
+        import queue
+        executor, release = self.blocked(max_pending=1)
+        with pytest.raises(queue.Full):
+            executor.submit(print, block=False)
+        release.set()
+        assert executor.submit(lambda: 1).result(timeout=10) == 1
+        executor.shutdown()
+
+    def test_errors_come_back_on_the_future(self):
+        from executor import JobExecutor
+        executor = JobExecutor()
+        with pytest.raises(ZeroDivisionError):
+            executor.submit(lambda: 1 / 0).result(timeout=10)
+        assert executor.status()["running"] == 0
+        executor.shutdown()
+
+    def test_concurrent_jobs_match_sequential_runs(self, tmp_path):
+        from DSLInterpreter import DSLInterpreter
+        from worker import CleanerWorker
+        scripts = [
+            ["fill null in column a using mean", "normalise columns a using z-score"],
+            ["rename a to x", "filter where x gt 3", "normalise columns s using upper"],
+            ["normalise columns s using label encoding", "handle outliers in column a using cap by mad"],
+            ["transform columns a using log inplace", "drop any null rows"],
+        ]
+        requests = []
+        for idx, script in enumerate(scripts):
+            csv = tmp_path / f"in{idx}.csv"
+            make_df(a=[1.0, None, 3.0, 4.0, 50.0 + idx], s=["p", "q", None, "r", "p"]).write_csv(csv)
+            (tmp_path / f"s{idx}.yml").write_text(yaml.dump(script))
+            for copy in range(3):
+                requests.append({"id": idx, "client": idx % 2, "csv": str(csv),
+                                 "instructions": str(tmp_path / f"s{idx}.yml"),
+                                 "output": str(tmp_path / f"out{idx}_{copy}.csv")})
+
+        worker = CleanerWorker(threads_per_job=1)
+        try:
+            responses = [worker.submit(request) for request in requests]
+            assert all(response.result(timeout=60)["status"] == "ok" for response in responses)
+            status = worker.status()
+        finally:
+            worker.shutdown()
+        assert status["completed"] == 12 and status["executor"]["running"] == 0
+        for idx, script in enumerate(scripts):
+            expected = DSLInterpreter(pl.read_csv(tmp_path / f"in{idx}.csv")).run(yaml.dump(script))
+            expected = pl.read_csv(expected.write_csv().encode())
+            for copy in range(3):
+                assert pl.read_csv(tmp_path / f"out{idx}_{copy}.csv").equals(expected)
+
+
+class TestMemoryGovernor:
+
+    @pytest.fixture
+    def big_csv(self, tmp_path):
+        import numpy as np
+        rng = np.random.default_rng(0)
+        values = rng.normal(10, 3, 5_000)
+        make_df(
+            a=values,
+            b=[None if idx % 100 == 3 else float(idx) for idx in range(5_000)],
+            c=rng.choice(["x", "y", "z"], 5_000),
+        ).write_csv(tmp_path / "big.csv")
+        return tmp_path / "big.csv"
+
+    def build(self, path, fill="median", **options):
+        from cleanerpl import CleanerPipeline
+        return (CleanerPipeline.scan(path, **options)
+                .standardize(["a"], "robust")
+                .impute_na(["b"], strategy=fill)
+                .string_normalize(["c"], "label encoding"))
+
+    def test_parse_bytes(self):
+        from governor import parse_bytes
+        assert parse_bytes("512MB") == 512 * 1024 ** 2
+        assert parse_bytes("1.5 gb") == int(1.5 * 1024 ** 3)
+        assert parse_bytes(1000) == 1000
+        with pytest.raises(ValueError):
+            parse_bytes("lots")
+
+    def test_modes(self, big_csv):
+        expected = self.build(big_csv).execute()
+        for budget, mode in [("1GB", "eager"), ("1KB", "streaming")]:
+            pipeline = self.build(big_csv, memory_budget=budget)
+            assert pipeline.execute().equals(expected)
+            assert pipeline.report["memory"]["mode"] == mode
+            assert pipeline.report["memory"]["peak_rss_mb"] > 0
+
+    def test_chunked_when_an_operation_needs_whole_columns(self, big_csv, tmp_path):
+        import governor
+        with patch.object(governor, "MIN_CHUNK_ROWS", 1_000):
+            pipeline = self.build(big_csv, fill="forward", memory_budget="1KB")
+            result = pipeline.execute()
+            memory = pipeline.report["memory"]
+            assert memory["mode"] == "chunked" and memory["chunk_rows"] == 1_000
+            assert memory["carried"] == ["ImputeNa(columns=['b'], value=None, strategy='forward')"]
+            assert result.equals(self.build(big_csv, fill="forward").execute())
+
+            for output in ["out.csv", "out.parquet"]:
+                sunk = self.build(big_csv, fill="forward", memory_budget="1KB")
+                sunk.sink(tmp_path / output)
+                assert sunk.report["memory"]["mode"] == "chunked"
+                read = pl.read_csv if output.endswith("csv") else pl.read_parquet
+                assert read(tmp_path / output).cast(result.schema).equals(result)
+
+    def test_forward_fill_crosses_chunk_boundaries(self, tmp_path):
+        import governor
+        from cleanerpl import CleanerPipeline
+        # every chunk of 1000 rows starts with a run of nulls, one chunk is all null
+        make_df(b=[None if idx % 1000 < 5 or 2000 <= idx < 3000 else idx for idx in range(5_000)],
+                c=[None if idx % 1000 == 0 else "v" for idx in range(5_000)]).write_csv(tmp_path / "gaps.csv")
+        build = lambda **options: (CleanerPipeline.scan(tmp_path / "gaps.csv", **options)
+                                   .impute_na(strategy="forward")
+                                   .filter("b > 10"))
+        with patch.object(governor, "MIN_CHUNK_ROWS", 1_000):
+            chunked = build(memory_budget="1KB")
+            result = chunked.execute()
+        assert chunked.report["memory"]["mode"] == "chunked"
+        assert result.equals(build().execute())
+        assert result.filter(pl.col("b") == 1999).height == 1_006
+
+    def test_row_local_steps_do_not_block_chunking(self, big_csv):
+        import governor
+        with patch.object(governor, "MIN_CHUNK_ROWS", 1_000):
+            pipeline = (self.build(big_csv, fill="forward", memory_budget="1KB")
+                        .rename(b="filled").cast(a="float32").filter("filled gt 10")
+                        .string_normalize(None, "upper").drop_na(["a"]))
+            result = pipeline.execute()
+        assert pipeline.report["memory"]["mode"] == "chunked"
+        assert len(pipeline.report["memory"]["carried"]) == 1
+        expected = (self.build(big_csv, fill="forward").rename(b="filled").cast(a="float32")
+                    .filter("filled gt 10").string_normalize(None, "upper").drop_na(["a"]).execute())
+        assert result.equals(expected)
+
+    def test_backward_fill_streams_instead_of_chunking(self, big_csv):
+        pipeline = self.build(big_csv, fill="backward", memory_budget="1KB")
+        result = pipeline.execute()
+        assert pipeline.report["memory"]["mode"] == "streaming"
+        assert "can not run in chunks" in pipeline.report["memory"]["reason"]
+        assert result.equals(self.build(big_csv, fill="backward").execute())
+
+    def test_job_reports_memory(self, big_csv, tmp_path, monkeypatch):
+        from jobs import run_job
+        (tmp_path / "script.yml").write_text(yaml.dump(["normalise columns a using z-score"]))
+        monkeypatch.setenv("DOLPHY_MEMORY_BUDGET", "1KB")
+        result = run_job(big_csv, tmp_path / "script.yml", tmp_path / "out.csv")
+        assert result["report"]["memory"]["mode"] == "streaming"
+        assert result["total_rows"] == 5_000
+
+
+class TestAsyncAPI:
+
+    SCRIPT = ["fill null in column age using median", "normalise columns salary using robust",
+              "normalise columns city using label encoding", "filter where age lt 100"]
+
+    def test_run_async_matches_run(self, basic_df):
+        import asyncio
+        from DSLInterpreter import DSLInterpreter
+        script = yaml.dump(self.SCRIPT)
+
+        async def main():
+            return await asyncio.gather(*[DSLInterpreter(basic_df).run_async(script) for _ in range(4)])
+
+        expected = DSLInterpreter(basic_df).run(script)
+        assert all(result.equals(expected) for result in asyncio.run(main()))
+
+    def test_statistics_are_awaited(self, basic_df):
+        import asyncio
+        from cleanerpl import CleanerPipeline
+        pipeline = CleanerPipeline(basic_df).impute_na(["age"], strategy="mean").standardize(["age"], "z-score")
+        with patch.object(pl.LazyFrame, "collect", side_effect=AssertionError("blocking collect")):
+            operations = asyncio.run(pipeline.plan_async())
+        assert operations == pipeline.plan()
+        assert [op.stats.values for op in operations] == [op.stats.values for op in pipeline.plan()]
+
+    def test_stream_and_sink(self, basic_df, tmp_path):
+        import asyncio
+        from DSLInterpreter import DSLInterpreter
+        script = yaml.dump(self.SCRIPT)
+
+        async def main():
+            batches = [batch async for batch in DSLInterpreter(basic_df).stream_async(script, rows=2)]
+            await DSLInterpreter(basic_df).sink_async(script, tmp_path / "out.parquet")
+            return batches
+
+        expected = DSLInterpreter(basic_df).run(script)
+        assert pl.concat(asyncio.run(main())).equals(expected)
+        assert pl.read_parquet(tmp_path / "out.parquet").equals(expected)
+
+    def test_cancellation(self, tmp_path):
+        import asyncio
+        from DSLInterpreter import DSLInterpreter
+        make_df(a=list(range(200_000))).write_csv(tmp_path / "rows.csv")
+        script = yaml.dump(["normalise columns a using robust"])
+
+        async def main():
+            job = asyncio.create_task(DSLInterpreter(tmp_path / "rows.csv").run_async(script))
+            await asyncio.sleep(0)
+            job.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await job
+
+            stream = DSLInterpreter(tmp_path / "rows.csv").stream_async(script, rows=1_000)
+            first = await anext(stream)
+            await stream.aclose()
+            return first
+
+        assert asyncio.run(main()).height <= 1_000
+
+    def test_stream_closes_after_the_batch_in_flight(self, basic_df, monkeypatch):
+        import asyncio
+        import time
+        import cleanerpl
+        from cleanerpl import CleanerPipeline
+        events = []
+
+        def slow_batches(result, rows=None):
+            try:
+                events.append("reading")
+                time.sleep(0.2)
+                events.append("read")
+                yield result.collect()
+            finally:
+                events.append("closed")
+
+        monkeypatch.setattr(cleanerpl, "collect_batches", slow_batches)
+
+        async def main():
+            stream = CleanerPipeline(basic_df).stream_async()
+            first = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            await asyncio.sleep(0.4)
+
+        asyncio.run(main())
+        assert events == ["reading", "read", "closed"]
+
+    def test_stream_without_collect_batches(self, basic_df, monkeypatch):
+        import asyncio
+        from cleanerpl import CleanerPipeline
+        monkeypatch.delattr(pl.LazyFrame, "collect_batches")
+
+        async def main():
+            return [batch async for batch in CleanerPipeline(basic_df).stream_async(rows=2)]
+
+        batches = asyncio.run(main())
+        assert len(batches) == 1 and batches[0].equals(basic_df)
@@ -0,0 +1,63 @@
+from typing import Dict, List
+
+import polars as pl
+
+from operations import Operations
+
+# dtype kinds an operation can ask for in column_types
+KINDS = {
+    "any": lambda dtype: True,
+    "numeric": lambda dtype: dtype.is_numeric(),
+    "string": lambda dtype: dtype in (pl.String, pl.Categorical, pl.Enum),
+}
+
+class PlanValidationError(ValueError):
+    def __init__(self, problems: List[Dict]):
+        self.problems = problems
+        super().__init__("Invalid script: " + "; ".join(
+            f"step {problem['step']} ({problem['operation']}): {problem['error']}" for problem in problems))
+
+def _check_types(op: Operations, schema: pl.Schema):
+    for column, kind in op.column_types(schema).items():
+        if column not in schema:
+            raise ValueError(f"column {column} is not present at this step")
+        if not KINDS[kind](schema[column]):
+            raise TypeError(f"column {column} is {schema[column]}, expected a {kind} column")
+
+def _apply(op: Operations, frame: pl.LazyFrame, schema: pl.Schema) -> pl.LazyFrame:
+    # expressions and predicates are used directly, because clean() reports
+    # most errors and carries on
+    exprs = op.expressions(schema)
+    if exprs is not None:
+        return frame.with_columns(exprs)
+    predicate = op.predicate(schema)
+    if predicate is not None:
+        return frame.filter(predicate)
+    return op.clean(frame)
+
+def _message(error: Exception) -> str:
+    message = str(error).splitlines()[0] if str(error) else type(error).__name__
+    if isinstance(error, pl.exceptions.ColumnNotFoundError):
+        return f"column is not present at this step, {message}"
+    return message
+
+# Walks the operations with the schema each one will see: renames, derived
+# columns (age_t, salary_z-score), casts and encodings change it as the
+# script goes. Every step is checked, a failing step leaves the schema as it
+# was so the steps after it are still checked, and all problems are raised
+# together. Returns the schema of the result.
+def validate_plan(operations: List[Operations], schema: pl.Schema) -> pl.Schema:
+    # an empty frame, polars resolves the schema of every step without data
+    frame = pl.LazyFrame(schema = schema)
+    schema = frame.collect_schema()
+    problems = []
+    for step, op in enumerate(operations, start = 1):
+        try:
+            _check_types(op, schema)
+            applied = _apply(op, frame, schema)
+            schema, frame = applied.collect_schema(), applied
+        except Exception as e:
+            problems.append({"step": step, "operation": repr(op), "error": _message(e)})
+    if problems:
+        raise PlanValidationError(problems)
+    return schema
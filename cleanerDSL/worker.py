@@ -0,0 +1,269 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, TextIO
+
+DEFAULT_SOCKET = os.environ.get("DOLPHY_CLEANER_SOCKET", "/tmp/dolphy-cleaner.sock")
+# previews waiting for the user to confirm the full job, oldest are forgotten first
+MAX_PREVIEWS = 256
+PREVIEW_OPTIONS = ("rows", "method", "stratify_by", "budget_ms")
+
+def _warm_up():
+    # loaded once per pool process instead of once per job
+    import jobs  # noqa: F401
+
+def _execute(request: dict) -> dict:
+    from jobs import run_job
+    return run_job(request["csv"], request["instructions"], request["output"],
+                   dictionary = request.get("dictionary"),
+                   memory_budget = request.get("memory_budget"))
+
+def _validate(request: dict) -> dict:
+    from jobs import validate_job
+    return validate_job(request["csv"], request["instructions"])
+
+def _preview(request: dict) -> dict:
+    from jobs import run_preview
+    options = {key: request[key] for key in PREVIEW_OPTIONS if key in request}
+    return run_preview(request["csv"], request["instructions"], **options)
+
+class CleanerWorker:
+    def __init__(self, workers: Optional[int] = None,
+                 max_pending: int = 64,
+                 max_jobs_per_process: Optional[int] = None,
+                 threads_per_job: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs_per_process = max_jobs_per_process
+        # with threads_per_job, jobs run on threads of this process and split
+        # its polars thread pool instead of running in a process pool
+        self.threads_per_job = threads_per_job
+        self.max_pending = max_pending
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.counters = {"pending": 0, "completed": 0, "failed": 0, "rejected": 0, "previews": 0}
+        self.started = time.time()
+        self.pool = self._start_pool()
+        # previews run in this process next to the job pool, so they never
+        # wait behind full jobs and stay within their latency budget
+        self.preview_pool = ThreadPoolExecutor(max_workers = 2, thread_name_prefix = "preview")
+        self.previews = OrderedDict()
+
+    def _start_pool(self):
+        if self.threads_per_job is not None:
+            from executor import JobExecutor
+            return JobExecutor(self.threads_per_job, self.max_pending)
+        # polars' thread pool does not survive fork, always start fresh interpreters
+        return ProcessPoolExecutor(max_workers = self.workers,
+                                   mp_context = multiprocessing.get_context("spawn"),
+                                   initializer = _warm_up,
+                                   max_tasks_per_child = self.max_jobs_per_process)
+
+    def _count(self, **deltas):
+        with self.lock:
+            for key, delta in deltas.items():
+                self.counters[key] += delta
+
+    def status(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+        status = {
+            "status": "ok",
+            "workers": self.workers,
+            "uptime_s": round(time.time() - self.started, 3),
+            **counters,
+        }
+        if self.threads_per_job is not None:
+            status["executor"] = self.pool.status()
+        return status
+
+    def preview(self, request: dict) -> Future:
+        response = Future()
+
+        def finished(job: Future):
+            result = {"id": request.get("id")}
+            try:
+                result.update(status = "ok", **job.result())
+                preview_id = uuid.uuid4().hex
+                with self.lock:
+                    self.previews[preview_id] = {key: request[key] for key in ("csv", "instructions", "output",
+                                                                               "dictionary", "memory_budget")
+                                                 if key in request}
+                    while len(self.previews) > MAX_PREVIEWS:
+                        self.previews.popitem(last = False)
+                result["preview_id"] = preview_id
+            except Exception as e:
+                result.update(status = "error", error = str(e))
+            self._count(previews = 1)
+            response.set_result(result)
+
+        self.preview_pool.submit(_preview, request).add_done_callback(finished)
+        return response
+
+    def confirm(self, request: dict) -> Future:
+        # queues the full job of an earlier preview
+        with self.lock:
+            job = self.previews.pop(request.get("preview_id"), None)
+        if job is None:
+            response = Future()
+            response.set_result({"id": request.get("id"), "status": "error",
+                                 "error": f"Unknown or expired preview: {request.get('preview_id')}"})
+            return response
+        return self.submit({"id": request.get("id"), **job})
+
+    def _run(self, request: dict) -> Future:
+        if self.threads_per_job is not None:
+            # queued per client, so one busy client does not starve the others
+            return self.pool.submit(_execute, request, client = request.get("client"))
+        return self.pool.submit(_execute, request)
+
+    def submit(self, request: dict) -> Future:
+        response = Future()
+        if request.get("op") == "status":
+            response.set_result({"id": request.get("id"), **self.status()})
+            return response
+        if request.get("op") == "confirm":
+            return self.confirm(request)
+
+        missing = [key for key in ("csv", "instructions", "output") if key not in request]
+        if missing:
+            response.set_result({"id": request.get("id"), "status": "error",
+                                 "error": f"Missing fields in job request: {missing}"})
+            return response
+        # invalid scripts are answered here instead of failing in a pool process;
+        # other errors (a missing file) are left to the job to report
+        try:
+            _validate(request)
+        except ValueError as e:
+            response.set_result({"id": request.get("id"), "status": "error", "error": str(e)})
+            self._count(rejected = 1)
+            return response
+        except Exception:
+            pass
+        if request.get("op") == "preview":
+            return self.preview(request)
+
+        self.slots.acquire()
+        self._count(pending = 1)
+        queued = time.perf_counter()
+        try:
+            job = self._run(request)
+        except BrokenProcessPool:
+            self.pool = self._start_pool()
+            job = self._run(request)
+
+        def finished(job: Future):
+            self.slots.release()
+            elapsed_ms = (time.perf_counter() - queued) * 1000
+            result = {"id": request.get("id")}
+            try:
+                result.update(status = "ok", **job.result())
+                result["timings"]["queue_ms"] = round(elapsed_ms - result["timings"]["total_ms"], 3)
+                self._count(pending = -1, completed = 1)
+            except BrokenProcessPool as e:
+                # the job took its process down, later jobs get a fresh pool
+                self.pool = self._start_pool()
+                result.update(status = "error", error = f"Cleaner process crashed: {e}")
+                self._count(pending = -1, failed = 1)
+            except Exception as e:
+                result.update(status = "error", error = str(e))
+                self._count(pending = -1, failed = 1)
+            response.set_result(result)
+
+        job.add_done_callback(finished)
+        return response
+
+    def handle_line(self, line: str) -> Future:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = Future()
+            response.set_result({"status": "error", "error": f"Invalid request: {e}"})
+            return response
+        return self.submit(request)
+
+    def serve_lines(self, stdin: TextIO, stdout: TextIO):
+        write_lock = threading.Lock()
+        outstanding = []
+
+        def write(response: Future):
+            with write_lock:
+                stdout.write(json.dumps(response.result()) + "\n")
+                stdout.flush()
+
+        for line in stdin:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            response.add_done_callback(write)
+            outstanding.append(response)
+        for response in outstanding:
+            response.result()
+
+    def serve_socket(self, path: str = DEFAULT_SOCKET):
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = worker.handle_line(line.decode()).result()
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+            server.daemon_threads = True
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(path)
+
+    def shutdown(self):
+        self.preview_pool.shutdown(wait = True)
+        self.pool.shutdown(wait = True)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Long-lived cleaner worker")
+    parser.add_argument("--socket", default = DEFAULT_SOCKET, help = "unix socket to listen on")
+    parser.add_argument("--stdio", action = "store_true", help = "read JSON-lines jobs from stdin")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--max-pending", type = int, default = 64)
+    parser.add_argument("--max-jobs-per-process", type = int, default = None)
+    parser.add_argument("--threads-per-job", type = int, default = None,
+                        help = "run jobs on threads of this process, each with this many polars threads")
+    parser.add_argument("--memory-budget", default = None,
+                        help = "memory a job may use (e.g. 4GB), picks eager, streaming or chunked execution")
+    args = parser.parse_args(argv)
+    if args.memory_budget is not None:
+        # set before the pool starts, so its processes inherit it
+        os.environ["DOLPHY_MEMORY_BUDGET"] = args.memory_budget
+
+    worker = CleanerWorker(args.workers, args.max_pending, args.max_jobs_per_process, args.threads_per_job)
+    try:
+        if args.stdio:
+            worker.serve_lines(sys.stdin, sys.stdout)
+        else:
+            worker.serve_socket(args.socket)
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        worker.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())